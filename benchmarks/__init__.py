@@ -0,0 +1,3 @@
+"""
+Offline scraping benchmarks and a local stand-in Xiaohongshu server.
+"""
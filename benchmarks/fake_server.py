@@ -0,0 +1,351 @@
+"""
+Local stand-in for Xiaohongshu.
+
+Serves a search results page and note detail pages shaped like the real
+ones: the data lives in an inline ``window.__INITIAL_STATE__`` script, and
+the DOM carries the title, og:image and comment items the DOM fallback
+reads. The note images are small generated JPEGs served from /img/. Pages
+are synthetic (deterministic for a given seed) or read from a directory of
+recorded pages. Every response can be delayed and a share of them answered
+with a 503 to exercise retries.
+
+Point the scraper at it with REDNOTE_BASE_URL, e.g.:
+
+    python -m benchmarks.fake_server --port 8765 --latency-ms 80 --error-rate 0.02
+    REDNOTE_BASE_URL=http://127.0.0.1:8765 python -m src.main "护肤"
+
+Recorded pages are looked up as ``<fixture_dir>/search_result.html`` and
+``<fixture_dir>/explore/<note_id>.html``.
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import urlparse
+
+from PIL import Image, ImageDraw
+
+
+_TITLE_WORDS = (
+    '护肤', '早八', '通勤', '平价', '好物', '分享', '学生党', '必备', '油皮', '干皮', '敏感肌',
+    '保姆级', '教程', '合集', '测评', '避雷', '宝藏', '小众', '氛围感', '妆容', '春夏', '秋冬',
+    '一周', '打卡', '清单', '攻略', '省钱', '懒人', '新手', '进阶',
+)
+_COMMENT_PHRASES = (
+    '好喜欢这个', '学到了谢谢', '求链接', '已经收藏了', '踩雷了不推荐', '真的绝了',
+    '有点贵啊', '蹲一个后续', '太实用了', '这个色号是多少', '感觉一般般', '姐妹冲',
+)
+
+
+def synthetic_note_id(index: int) -> str:
+    """
+    Note id of the index-th synthetic note (24 hex digits, like real ids).
+    """
+    return f"{index + 1:024x}"
+
+
+class FakeRednoteServer:
+    """
+    Threaded HTTP server for synthetic or recorded Xiaohongshu pages.
+
+    Args:
+        num_notes: Notes returned by the search page.
+        comments_per_note: Comments in each note's state and DOM.
+        page_kb: Approximate size of each note page, padded with markup.
+        latency_ms / jitter_ms: Each response is delayed by latency_ms
+            plus a uniform random 0..jitter_ms.
+        error_rate: Share of responses answered with a 503.
+        fixture_dir: Serve recorded pages from this directory instead.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, num_notes: int = 200,
+                 comments_per_note: int = 20, page_kb: int = 256, latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 fixture_dir: Optional[str] = None, seed: int = 0):
+        self.num_notes = num_notes
+        self.comments_per_note = comments_per_note
+        self.page_kb = page_kb
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.fixture_dir = fixture_dir
+        self.seed = seed
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        # Rendered note pages and images; only ids of served notes are kept
+        self._note_pages = {}
+        self._images = {}
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeRednoteServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='fake-rednote', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """
+        Serve on the calling thread until interrupted.
+        """
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def respond(self, path: str):
+        """
+        Return (status, body) for a request path, after the configured delay.
+        The body is text for pages and bytes for images.
+        """
+        with self._lock:
+            self.requests += 1
+            delay = self.latency_ms + self._rng.uniform(0, self.jitter_ms)
+            failed = self._rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        if delay:
+            time.sleep(delay / 1000)
+        if failed:
+            return 503, "<html><body>Service temporarily unavailable</body></html>"
+
+        parsed = urlparse(path)
+        if parsed.path.rstrip('/') == '/search_result':
+            body = self._fixture('search_result.html') if self.fixture_dir else self.search_page()
+        elif parsed.path.startswith('/explore/'):
+            note_id = parsed.path[len('/explore/'):].strip('/')
+            if self.fixture_dir:
+                body = self._fixture(os.path.join('explore', f"{note_id}.html"))
+            else:
+                body = self.note_page(note_id)
+        elif parsed.path.startswith('/img/') and parsed.path.endswith('.jpg'):
+            note_id, _, index = parsed.path[len('/img/'):-len('.jpg')].rpartition('-')
+            body = self.image(note_id, int(index)) if index.isdigit() else None
+        else:
+            body = None
+        if body is None:
+            return 404, "<html><body>Not found</body></html>"
+        return 200, body
+
+    def _fixture(self, name: str) -> Optional[str]:
+        path = os.path.join(self.fixture_dir, name)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def image(self, note_id: str, index: int) -> Optional[bytes]:
+        """
+        A small JPEG for a note's index-th image, the same on every request.
+        """
+        key = (note_id, index)
+        if key not in self._images:
+            image = self._render_image(note_id, index)
+            if image is None:
+                return None
+            self._images[key] = image
+        return self._images[key]
+
+    def _render_image(self, note_id: str, index: int) -> Optional[bytes]:
+        try:
+            note_index = int(note_id, 16) - 1
+        except ValueError:
+            return None
+        if not 0 <= note_index < self.num_notes:
+            return None
+        rng = random.Random(f"{self.seed}:{note_id}:{index}")
+        image = Image.new('RGB', (96, 128), tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(6):
+            x, y = rng.randrange(80), rng.randrange(112)
+            draw.rectangle((x, y, x + rng.randint(8, 48), y + rng.randint(8, 48)),
+                           fill=tuple(rng.randrange(256) for _ in range(3)))
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=80)
+        return buffer.getvalue()
+
+    def _title(self, index: int) -> str:
+        rng = random.Random(self.seed * 1_000_003 + index)
+        words = rng.sample(_TITLE_WORDS, 4)
+        return f"【{words[0]}】{words[1]}{words[2]}{words[3]}第{index + 1}期✨"
+
+    def _engagement(self, index: int) -> dict:
+        rng = random.Random(self.seed * 1_000_003 + index)
+        likes = int(rng.paretovariate(1.2) * 200)
+        return {
+            'likedCount': f"{likes / 10000:.1f}万" if likes >= 10000 else str(likes),
+            'collectedCount': str(likes // rng.randint(2, 6)),
+            'commentCount': str(likes // rng.randint(10, 40)),
+            'shareCount': str(likes // rng.randint(20, 80)),
+        }
+
+    def search_page(self) -> str:
+        feeds = []
+        links = []
+        for index in range(self.num_notes):
+            note_id = synthetic_note_id(index)
+            token = f"tok{index}"
+            feeds.append({
+                'id': note_id,
+                'xsecToken': token,
+                'noteCard': {
+                    'displayTitle': self._title(index),
+                    'cover': {'urlDefault': f"{self.url}/img/{note_id}-0.jpg"},
+                    'interactInfo': self._engagement(index),
+                    'time': int(time.time() * 1000) - index * 3_600_000,
+                },
+            })
+            links.append(
+                f'<section class="note-item"><a href="/explore/{note_id}?xsec_token={token}&xsec_source=pc_search">'
+                f'<span class="title">{self._title(index)}</span></a></section>'
+            )
+        state = json.dumps({'search': {'feeds': feeds}}, ensure_ascii=False).replace('<', '\\u003c')
+        return (
+            "<!DOCTYPE html><html><head><title>搜索 - 小红书</title></head><body>"
+            f"<div class=\"feeds-container\">{''.join(links)}</div>"
+            f"<script>window.__INITIAL_STATE__={state}</script>"
+            "</body></html>"
+        )
+
+    def note_page(self, note_id: str) -> Optional[str]:
+        if note_id not in self._note_pages:
+            page = self._render_note_page(note_id)
+            if page is None:
+                return None
+            self._note_pages[note_id] = page
+        return self._note_pages[note_id]
+
+    def _render_note_page(self, note_id: str) -> Optional[str]:
+        try:
+            index = int(note_id, 16) - 1
+        except ValueError:
+            return None
+        if not 0 <= index < self.num_notes:
+            return None
+
+        rng = random.Random(self.seed * 1_000_003 + index)
+        title = self._title(index)
+        images = [{'urlDefault': f"{self.url}/img/{note_id}-{i}.jpg"} for i in range(rng.randint(1, 6))]
+        comments = [
+            {
+                'id': f"{note_id}c{i}",
+                'content': f"{rng.choice(_COMMENT_PHRASES)} {i}",
+                'likeCount': str(rng.randint(0, 500)),
+                'userInfo': {'nickname': f"user{rng.randint(1, 99999)}"},
+                'createTime': int(time.time() * 1000) - i * 60_000,
+                'subComments': [],
+            }
+            for i in range(self.comments_per_note)
+        ]
+        note = {
+            'noteId': note_id,
+            'title': title,
+            'desc': f"{title} 今天来分享一下我的心得 #{_TITLE_WORDS[index % len(_TITLE_WORDS)]}[话题]#",
+            'imageList': images,
+            'interactInfo': self._engagement(index),
+            'time': int(time.time() * 1000) - index * 3_600_000,
+        }
+        state = {
+            'note': {
+                'currentNoteId': note_id,
+                'noteDetailMap': {note_id: {'note': note, 'comments': {'list': comments, 'hasMore': False}}},
+            }
+        }
+        state_js = json.dumps(state, ensure_ascii=False).replace('<', '\\u003c')
+        comment_dom = ''.join(
+            f'<div class="parent-comment"><div class="comment-item" id="comment-{c["id"]}">'
+            f'<div class="author"><span class="name">{c["userInfo"]["nickname"]}</span></div>'
+            f'<span class="content">{c["content"]}</span>'
+            f'<span class="date">{i + 1}天前</span><span class="like"><span class="count">{c["likeCount"]}</span></span>'
+            f'</div></div>'
+            for i, c in enumerate(comments)
+        )
+        head = (
+            "<!DOCTYPE html><html><head>"
+            f"<title>{title} - 小红书</title>"
+            f'<meta property="og:title" content="{title}">'
+            f'<meta property="og:image" content="{images[0]["urlDefault"]}">'
+            "</head><body><div id=\"app\"><div class=\"note-scroller\">"
+            f'<div id="detail-title" class="title">{title}</div>'
+            f'<div class="desc">{note["desc"]}</div>'
+            f'<div class="comments-container">{comment_dom}</div>'
+        )
+        tail = f"</div></div><script>window.__INITIAL_STATE__={state_js}</script></body></html>"
+        # Pad with nested markup to the requested size, like the real app shell
+        block = '<div class="feeds-page"><section class="note-item"><span class="footer">推荐</span></section></div>'
+        padding = block * max(0, (self.page_kb * 1024 - len(head) - len(tail)) // len(block))
+        return head + padding + tail
+
+
+def _make_handler(app: FakeRednoteServer):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status, body = app.respond(self.path)
+            if isinstance(body, bytes):
+                data, content_type = body, 'image/jpeg'
+            else:
+                data, content_type = body.encode('utf-8'), 'text/html; charset=utf-8'
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve stand-in Xiaohongshu pages locally.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--notes', type=int, default=200, help="Notes on the search page (default: 200)")
+    parser.add_argument('--comments', type=int, default=20, help="Comments per note (default: 20)")
+    parser.add_argument('--page-kb', type=int, default=256, help="Approximate note page size (default: 256)")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Delay added to every response")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="Random extra delay, up to this much")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of responses answered with a 503")
+    parser.add_argument('--fixtures', help="Directory of recorded pages to serve instead of synthetic ones")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    server = FakeRednoteServer(
+        args.host, args.port, args.notes, args.comments, args.page_kb, args.latency_ms,
+        args.jitter_ms, args.error_rate, args.fixtures, args.seed,
+    )
+    print(f"Serving stand-in Xiaohongshu at {server.url} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+"""
+Offline scraping benchmarks against the local stand-in server.
+
+Two benchmarks, each printing (or writing with --output) one JSON document
+so results can be compared between versions:
+
+    parse    extraction alone over synthetic pages, no browser needed:
+             per-page latency, CPU time and pages/sec
+    scrape   the full scraping pipeline (src.scraper) in a real browser against
+             benchmarks/fake_server.py, for every combination of --posts
+             and --concurrency: posts/sec, p50/p95 page latency, parse CPU
+             time and peak RSS
+
+Examples:
+    python -m benchmarks.run parse --pages 100 --page-kb 512
+    python -m benchmarks.run scrape --posts 5 20 --concurrency 1 3 6 \\
+        --latency-ms 80 --jitter-ms 40 --error-rate 0.02 --output bench.json
+
+Each scrape configuration runs in its own subprocess, so peak RSS and the
+browser start are measured per configuration, with a throwaway post store
+and dedup index and the page cache off. The rate limit is lifted unless
+REDNOTE_RATE_LIMIT is set. The scraper's CSV goes to the same throwaway
+directory (REDNOTE_OUTPUT_DIR), never into the repository.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.fake_server import FakeRednoteServer, synthetic_note_id
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BENCHMARK_TOPIC = 'benchmark'
+
+
+def _peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _latency_summary(seconds: list) -> dict:
+    if not seconds:
+        return {'p50': None, 'p95': None, 'mean': None}
+    ms = np.asarray(seconds) * 1000
+    return {
+        'p50': round(float(np.percentile(ms, 50)), 2),
+        'p95': round(float(np.percentile(ms, 95)), 2),
+        'mean': round(float(ms.mean()), 2),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _document(benchmark: str, config: dict, results: list, **extra) -> dict:
+    return {
+        'benchmark': benchmark,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'config': config,
+        'results': results,
+        **extra,
+    }
+
+
+def bench_parse(args) -> dict:
+    """
+    Time the extraction functions on synthetic search and note pages.
+    """
+    from src.extraction import extract_post, extract_search_cards
+
+    server = FakeRednoteServer(num_notes=args.pages, comments_per_note=args.comments, page_kb=args.page_kb)
+    try:
+        search_html = server.search_page()
+        pages = [server.note_page(synthetic_note_id(i)) for i in range(args.pages)]
+    finally:
+        server.stop()
+
+    results = []
+    for name, fn, inputs in (
+        ('search_cards', lambda html: extract_search_cards(html, args.pages), [search_html]),
+        ('post', lambda html: extract_post(html, 3), pages),
+    ):
+        latencies = []
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        for _ in range(args.repeat):
+            for html in inputs:
+                start = time.perf_counter()
+                fn(html)
+                latencies.append(time.perf_counter() - start)
+        wall = time.perf_counter() - wall_start
+        results.append({
+            'extractor': name,
+            'pages': len(latencies),
+            'avg_page_kb': round(sum(len(html) for html in inputs) / len(inputs) / 1024, 1),
+            'pages_per_sec': round(len(latencies) / wall, 2),
+            'latency_ms': _latency_summary(latencies),
+            'cpu_seconds': round(time.process_time() - cpu_start, 4),
+        })
+    config = {'pages': args.pages, 'page_kb': args.page_kb, 'comments': args.comments, 'repeat': args.repeat}
+    return _document('parse', config, results, peak_rss_mb=round(_peak_rss_mb(), 1))
+
+
+def time_page_fetches(service) -> list:
+    """
+    Record the latency of every page ``service`` fetches from now on and
+    return the list the latencies (in seconds) are appended to.
+
+    CrawlerService.fetch without a session borrows one and calls
+    self.fetch again with it, so only calls that carry a session are timed:
+    each page is counted once, and the time spent waiting for a free
+    session is left out.
+    """
+    latencies = []
+    fetch = service.fetch
+
+    async def timed_fetch(url, session=None, **options):
+        if session is None:
+            return await fetch(url, **options)
+        start = time.perf_counter()
+        try:
+            return await fetch(url, session=session, **options)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    service.fetch = timed_fetch
+    return latencies
+
+
+def scrape_once(args) -> dict:
+    """
+    One scrape of the stand-in server in this process (run by bench_scrape
+    in a subprocess, with REDNOTE_BASE_URL pointing at the server).
+    """
+    import pandas as pd
+
+    from src.crawler import CrawlerService
+    from src.extraction import BASE_URL
+    from src.parsing import parse_stats
+    from src.scraper import scrape_rednote
+    from src.throttle import get_fetch_scheduler
+
+    output_dir = os.environ.get('REDNOTE_OUTPUT_DIR') or tempfile.mkdtemp(prefix='rednote-bench-')
+    os.environ['REDNOTE_OUTPUT_DIR'] = output_dir
+    csv_path = os.path.join(output_dir, f"scraped_data_{BENCHMARK_TOPIC}.csv")
+    if os.path.exists(csv_path):
+        os.remove(csv_path)
+    cookies_path = os.path.join(tempfile.mkdtemp(prefix='rednote-bench-'), 'cookies.json')
+    with open(cookies_path, 'w', encoding='utf-8') as f:
+        json.dump([{'name': 'benchmark', 'value': '1'}], f)
+
+    service = CrawlerService(pool_size=args.concurrency, cookies_path=cookies_path)
+    try:
+        # Start the browser outside the measurement
+        try:
+            service.run(service.fetch(f"{BASE_URL}/"))
+        except Exception:
+            pass
+
+        latencies = time_page_fetches(service)
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        summary = service.run(scrape_rednote(
+            service, BENCHMARK_TOPIC, args.posts[0], 3, args.candidates, args.concurrency
+        ))
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+    finally:
+        service.close()
+
+    scraped = len(pd.read_csv(csv_path)) if os.path.exists(csv_path) else 0
+    stats = parse_stats()
+    scheduler = get_fetch_scheduler()
+    return {
+        'posts': args.posts[0],
+        'concurrency': args.concurrency,
+        'posts_scraped': scraped,
+        'wall_seconds': round(wall, 3),
+        'posts_per_sec': round(scraped / wall, 3) if wall else None,
+        'pages_fetched': len(latencies),
+        'page_latency_ms': _latency_summary(latencies),
+        'parse_calls': stats['calls'],
+        'parse_cpu_seconds': round(stats['cpu_seconds'], 4),
+        'main_process_cpu_seconds': round(cpu, 3),
+        'retries': scheduler.retries,
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+        'peak_children_rss_mb': round(_peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+        'error': None if summary.startswith('Successfully') else summary[:200],
+    }
+
+
+def bench_scrape(args) -> dict:
+    """
+    Run scrape_once for every posts x concurrency combination against one
+    stand-in server.
+    """
+    results = []
+    with FakeRednoteServer(num_notes=args.candidates, comments_per_note=args.comments,
+                           page_kb=args.page_kb, latency_ms=args.latency_ms,
+                           jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                           fixture_dir=args.fixtures) as server:
+        for posts in args.posts:
+            for concurrency in args.concurrency:
+                workdir = tempfile.mkdtemp(prefix='rednote-bench-')
+                env = dict(os.environ)
+                env.update({
+                    'REDNOTE_BASE_URL': server.url,
+                    'REDNOTE_CACHE': 'off',
+                    'REDNOTE_STORE_PATH': os.path.join(workdir, 'posts.db'),
+                    'REDNOTE_DEDUP_PATH': os.path.join(workdir, 'dedup.db'),
+                    'REDNOTE_OUTPUT_DIR': workdir,
+                    'CRAWL4_AI_BASE_DIRECTORY': workdir,
+                })
+                env.setdefault('REDNOTE_RATE_LIMIT', '1000')
+                env.setdefault('REDNOTE_RATE_BURST', '1000')
+                requests, errors = server.requests, server.errors
+                proc = subprocess.run(
+                    [sys.executable, '-m', 'benchmarks.run', '_scrape_once',
+                     '--posts', str(posts), '--concurrency', str(concurrency),
+                     '--candidates', str(args.candidates)],
+                    cwd=ROOT, env=env, capture_output=True, text=True,
+                )
+                lines = proc.stdout.strip().splitlines()
+                try:
+                    result = json.loads(lines[-1])
+                except (IndexError, ValueError):
+                    result = {'posts': posts, 'concurrency': concurrency,
+                              'error': (proc.stderr or proc.stdout).strip()[-500:]}
+                result['server_requests'] = server.requests - requests
+                result['server_errors'] = server.errors - errors
+                results.append(result)
+                print(f"posts={posts} concurrency={concurrency}: "
+                      f"{result.get('posts_per_sec')} posts/sec", file=sys.stderr)
+
+    config = {
+        'posts': args.posts, 'concurrency': args.concurrency, 'candidates': args.candidates,
+        'comments': args.comments, 'page_kb': args.page_kb, 'latency_ms': args.latency_ms,
+        'jitter_ms': args.jitter_ms, 'error_rate': args.error_rate, 'fixtures': args.fixtures,
+    }
+    return _document('scrape', config, results)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline Rednote scraping benchmarks.")
+    sub = parser.add_subparsers(dest='benchmark', required=True)
+
+    parse = sub.add_parser('parse', help="Benchmark extraction on synthetic pages")
+    parse.add_argument('--pages', type=int, default=50, help="Note pages to parse (default: 50)")
+    parse.add_argument('--repeat', type=int, default=3, help="Passes over the pages (default: 3)")
+
+    scrape = sub.add_parser('scrape', help="Benchmark the full scraper against the stand-in server")
+    scrape.add_argument('--posts', type=int, nargs='+', default=[5, 20], help="Post counts (default: 5 20)")
+    scrape.add_argument('--concurrency', type=int, nargs='+', default=[1, 3, 6],
+                        help="Concurrency levels (default: 1 3 6)")
+    scrape.add_argument('--candidates', type=int, default=200, help="Search results served (default: 200)")
+    scrape.add_argument('--latency-ms', type=float, default=50.0, help="Server delay per response (default: 50)")
+    scrape.add_argument('--jitter-ms', type=float, default=25.0, help="Random extra delay (default: 25)")
+    scrape.add_argument('--error-rate', type=float, default=0.0, help="Share of 503 responses (default: 0)")
+    scrape.add_argument('--fixtures', help="Serve recorded pages from this directory")
+
+    for p in (parse, scrape):
+        p.add_argument('--page-kb', type=int, default=256, help="Synthetic note page size (default: 256)")
+        p.add_argument('--comments', type=int, default=20, help="Comments per note (default: 20)")
+        p.add_argument('--output', help="Write the JSON results here instead of stdout")
+
+    once = sub.add_parser('_scrape_once')
+    once.add_argument('--posts', type=int, nargs=1, required=True)
+    once.add_argument('--concurrency', type=int, required=True)
+    once.add_argument('--candidates', type=int, required=True)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.benchmark == '_scrape_once':
+        print(json.dumps(scrape_once(args)))
+        return
+
+    document = bench_parse(args) if args.benchmark == 'parse' else bench_scrape(args)
+    text = json.dumps(document, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        print(f"Results saved to: {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
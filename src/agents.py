@@ -4,6 +4,7 @@ Agent definitions for the Rednote Virality Agents crew.
 
 from crewai import Agent
 from src.tools import RednoteScraperTool
+from src.variations import CREATOR_BACKSTORY
 
 
 def create_trend_scout(llm) -> Agent:
@@ -14,7 +15,7 @@ def create_trend_scout(llm) -> Agent:
     return Agent(
         role='Trend Scout',
         goal='Search Xiaohongshu (Rednote) for viral posts related to the given topic, '
-             'scrape the top 5 posts including titles, images, and top 3 comments, '
+             'scrape the top posts including titles, images, and top comments, '
              'and save the data to a CSV file.',
         backstory=(
             "You are an expert researcher specializing in social media trend analysis, "
@@ -62,13 +63,7 @@ def create_creator(llm) -> Agent:
         goal='Write 3 new post variations based on the Strategist\'s insights, '
              'following the authentic Xiaohongshu (Little Red Book) style with heavy emojis, '
              'clickbait titles, and proper hashtag usage.',
-        backstory=(
-            "You are a master copywriter specializing in Xiaohongshu (Little Red Book) content. "
-            "You understand the unique aesthetic and style of Rednote posts: bullet points, "
-            "emojis like ✨🔥👇💕, bracketed titles like [Must See], and the perfect balance "
-            "of informative and engaging content. You create content that feels authentic to "
-            "the platform and has high viral potential."
-        ),
+        backstory=CREATOR_BACKSTORY,
         tools=[],
         verbose=True,
         allow_delegation=False,
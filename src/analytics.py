@@ -0,0 +1,226 @@
+"""
+Deterministic pre-analysis of scraped posts.
+
+Computes keyword n-grams, emoji and hashtag usage, title structure and
+lexicon-based comment sentiment over the scraped DataFrame with pandas and
+NumPy, and renders them as a compact text brief. The brief is what the
+Strategist receives instead of every post's raw text, so its prompt stays
+small however many posts were scraped. Harvested comment files are
+summarised in chunks, so they are never loaded whole.
+"""
+
+import re
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+
+CJK_RE = re.compile(r'[一-鿿]+')
+LATIN_WORD_RE = re.compile(r'[A-Za-z][A-Za-z0-9\'-]+')
+EMOJI_RE = re.compile(
+    '[\U0001F300-\U0001FAFF\U00002600-\U000027BF\U0001F000-\U0001F2FF\U00002B00-\U00002BFF]'
+)
+# Xiaohongshu topics look like "#护肤[话题]#"; plain "#tag" is accepted too
+HASHTAG_RE = re.compile(r'#([^#\s\[\]]+)(?:\[话题\])?#?')
+BRACKET_RE = re.compile(r'[【\[「『（(]([^】\]」』）)]{1,20})[】\]」』）)]')
+
+COMMENT_SEPARATOR = ' | '
+
+# Fillers that would otherwise top every n-gram list
+STOP_NGRAMS = {
+    '一个', '我们', '你们', '他们', '这个', '那个', '就是', '真的', '什么', '自己',
+    '没有', '可以', '还是', '因为', '所以', '但是', '如果', '已经', '这样', '怎么',
+}
+STOP_WORDS = {'the', 'and', 'for', 'you', 'with', 'this', 'that', 'are', 'was', 'but'}
+
+POSITIVE_WORDS = (
+    '喜欢', '好看', '好用', '好吃', '推荐', '爱了', '绝了', '太棒', '不错', '好喜欢', '种草',
+    '学到了', '有用', '感谢', '谢谢', '实用', '赞', '美', '可爱', '惊艳', '收藏了', '冲',
+    'love', 'great', 'amazing', 'nice', 'good', 'cute', 'thanks',
+    '❤', '😍', '👍', '🥰', '💕', '✨', '🔥', '💯',
+)
+NEGATIVE_WORDS = (
+    '难看', '难用', '难吃', '踩雷', '避雷', '失望', '后悔', '垃圾', '智商税', '不好',
+    '不行', '差评', '坑', '骗', '假', '贵', '恶心', '无语', '翻车', '过敏',
+    'bad', 'worst', 'fake', 'scam', 'hate',
+    '😡', '👎', '😤', '🙄', '💔',
+)
+
+_POSITIVE_RE = '|'.join(re.escape(w) for w in POSITIVE_WORDS)
+_NEGATIVE_RE = '|'.join(re.escape(w) for w in NEGATIVE_WORDS)
+
+# Comment values that are placeholders rather than comments
+_NO_COMMENTS = {'No comments found', 'Content unavailable', ''}
+
+
+def keyword_frequencies(texts: pd.Series, top_n: int = 15) -> pd.Series:
+    """
+    Most frequent Chinese bigrams/trigrams and Latin words in ``texts``,
+    counted at most once per text and kept only if they occur more than once.
+    """
+    texts = texts.fillna('').astype(str).reset_index(drop=True)
+
+    # (text index, term) pairs; explode keeps each run's text index
+    runs = texts.str.findall(CJK_RE).explode().dropna()
+    grams = pd.DataFrame(
+        [(doc, run[i:i + n]) for doc, run in runs.items()
+         for n in (2, 3) for i in range(len(run) - n + 1)],
+        columns=['doc', 'term'],
+    )
+    words = texts.str.lower().str.findall(LATIN_WORD_RE).explode().dropna()
+    words = pd.DataFrame({'doc': words.index, 'term': words.to_numpy()})
+
+    terms = pd.concat([grams, words], ignore_index=True).drop_duplicates()
+    terms = terms[~terms['term'].isin(STOP_NGRAMS | STOP_WORDS)]
+    counts = terms['term'].value_counts()
+    counts = counts[counts > 1]
+    if counts.empty:
+        return counts
+
+    # Most Chinese words are two characters: drop trigrams that never occur
+    # without one of their bigrams, they only extend it into the next word
+    redundant = [
+        term for term, count in counts.items()
+        if len(term) == 3 and CJK_RE.fullmatch(term)
+        and (counts.get(term[:2]) == count or counts.get(term[1:]) == count)
+    ]
+    return counts.drop(redundant).head(top_n)
+
+
+def split_comments(comments: pd.Series) -> pd.Series:
+    """
+    One row per individual comment from the ' | '-joined comments column.
+    """
+    exploded = comments.fillna('').astype(str).str.split(COMMENT_SEPARATOR, regex=False).explode()
+    exploded = exploded.str.strip()
+    return exploded[~exploded.isin(_NO_COMMENTS)]
+
+
+def comment_sentiment(comments: pd.Series) -> pd.DataFrame:
+    """
+    Lexicon sentiment per comment: positive and negative hit counts and a
+    label of 'positive', 'negative' or 'neutral'.
+    """
+    lowered = comments.str.lower()
+    positive = lowered.str.count(_POSITIVE_RE).to_numpy()
+    negative = lowered.str.count(_NEGATIVE_RE).to_numpy()
+    score = positive - negative
+    label = np.select([score > 0, score < 0], ['positive', 'negative'], default='neutral')
+    return pd.DataFrame(
+        {'comment': comments.to_numpy(), 'positive': positive, 'negative': negative, 'label': label}
+    )
+
+
+def _format_counts(counts: pd.Series, limit: int) -> str:
+    return ', '.join(f"{term} ({count})" for term, count in counts.head(limit).items()) or 'none'
+
+
+def build_stats_brief(df: pd.DataFrame, top_n: int = 15) -> str:
+    """
+    Render the pre-analysis of scraped posts as a compact text brief.
+
+    Expects the scraper's columns: 'title', 'comments' (' | '-joined) and,
+    when available, 'likes', 'collects' and 'comment_count'.
+    """
+    if df.empty:
+        return "No posts to analyze."
+
+    titles = df['title'].fillna('').astype(str)
+    comments = split_comments(df['comments']) if 'comments' in df else pd.Series(dtype=object)
+    lines: List[str] = [f"Pre-analysis of {len(df)} posts and {len(comments)} comments:"]
+
+    # Engagement
+    if 'likes' in df:
+        engagement = df[['likes', 'collects', 'comment_count']].apply(pd.to_numeric, errors='coerce').fillna(0)
+        medians = engagement.median()
+        lines.append(
+            f"- Engagement (median): {medians['likes']:.0f} likes, "
+            f"{medians['collects']:.0f} collects, {medians['comment_count']:.0f} comments"
+        )
+
+    # Titles
+    lengths = titles.str.len()
+    bracket_phrases = titles.str.replace('[话题]', '', regex=False).str.findall(BRACKET_RE)
+    bracketed = bracket_phrases.str.len() > 0
+    numbers = titles.str.contains(r'\d')
+    exclamations = titles.str.contains('[!！]')
+    questions = titles.str.contains('[?？]')
+    lines.append(
+        f"- Title length: mean {lengths.mean():.1f}, median {lengths.median():.0f}, "
+        f"range {lengths.min()}-{lengths.max()} characters"
+    )
+    lines.append(
+        f"- Title patterns: {bracketed.mean():.0%} use brackets, "
+        f"{numbers.mean():.0%} contain numbers, "
+        f"{exclamations.mean():.0%} exclamations, {questions.mean():.0%} questions"
+    )
+    bracket_words = bracket_phrases.explode().dropna().value_counts()
+    if not bracket_words.empty:
+        lines.append(f"- Bracketed phrases: {_format_counts(bracket_words, 8)}")
+
+    # Keywords
+    keywords = keyword_frequencies(pd.concat([titles, comments], ignore_index=True), top_n)
+    lines.append(f"- Top keywords: {_format_counts(keywords, top_n)}")
+
+    # Emojis and hashtags
+    all_text = pd.concat([titles, comments], ignore_index=True)
+    emojis = all_text.str.findall(EMOJI_RE).explode().dropna().value_counts()
+    lines.append(
+        f"- Emojis: {titles.str.count(EMOJI_RE).mean():.1f} per title; "
+        f"most used: {_format_counts(emojis, 10)}"
+    )
+    hashtags = all_text.str.findall(HASHTAG_RE).explode().dropna().value_counts()
+    if not hashtags.empty:
+        lines.append(f"- Hashtags: {_format_counts(hashtags, 10)}")
+
+    # Sentiment
+    if not comments.empty:
+        sentiment = comment_sentiment(comments)
+        shares = sentiment['label'].value_counts(normalize=True)
+        lines.append(
+            f"- Comment sentiment: {shares.get('positive', 0):.0%} positive, "
+            f"{shares.get('negative', 0):.0%} negative, {shares.get('neutral', 0):.0%} neutral"
+        )
+        strongest = sentiment.assign(net=sentiment['positive'] - sentiment['negative'])
+        for label, row in (('Most positive', strongest['net'].idxmax()),
+                           ('Most negative', strongest['net'].idxmin())):
+            if strongest.loc[row, 'net'] != 0:
+                lines.append(f"  {label}: \"{strongest.loc[row, 'comment'][:80]}\"")
+
+    return '\n'.join(lines)
+
+
+def build_comment_brief(path: str, chunksize: int = 5000) -> str:
+    """
+    Summarise a harvested comments JSONL file (see src/comments.py):
+    comment and post counts, sentiment shares and the most liked comment.
+    The file is read ``chunksize`` rows at a time.
+    """
+    total = 0
+    notes = set()
+    labels = pd.Series(0, index=['positive', 'negative', 'neutral'])
+    top_likes, top_comment = -1, ''
+    for chunk in pd.read_json(path, lines=True, chunksize=chunksize, dtype={'note_id': str}):
+        chunk = chunk[chunk['content'].fillna('').astype(str).str.strip() != '']
+        if chunk.empty:
+            continue
+        total += len(chunk)
+        notes.update(chunk['note_id'].dropna().unique())
+        sentiment = comment_sentiment(chunk['content'].astype(str))
+        labels = labels.add(sentiment['label'].value_counts(), fill_value=0)
+        likes = pd.to_numeric(chunk['likes'], errors='coerce').fillna(0).to_numpy()
+        best = int(np.argmax(likes))
+        if likes[best] > top_likes:
+            top_likes, top_comment = likes[best], chunk['content'].iloc[best]
+
+    if not total:
+        return "No comments harvested."
+    shares = labels / total
+    lines = [
+        f"Harvested {total} comments across {len(notes)} posts:",
+        f"- Comment sentiment: {shares['positive']:.0%} positive, "
+        f"{shares['negative']:.0%} negative, {shares['neutral']:.0%} neutral",
+        f"- Most liked ({top_likes:.0f} likes): \"{top_comment[:80]}\"",
+    ]
+    return '\n'.join(lines)
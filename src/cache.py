@@ -0,0 +1,215 @@
+"""
+On-disk cache for crawled HTML.
+
+Pages are stored zlib-compressed in a SQLite file, keyed by URL plus the crawl
+options that affect the rendered HTML. Every entry has its own TTL, and the
+least recently used entries are evicted once the cache grows past its size cap.
+The SQLite table behind it (TTLStore) also backs the LLM cache.
+
+Configuration (environment variables):
+    REDNOTE_CACHE            set to "off" to disable the cache
+    REDNOTE_CACHE_DIR        cache directory (default: output/cache)
+    REDNOTE_CACHE_MAX_MB     size cap for compressed pages (default: 500)
+    REDNOTE_SEARCH_TTL       TTL in seconds for search pages (default: 900)
+    REDNOTE_POST_TTL         TTL in seconds for post pages (default: 604800)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Optional, Tuple
+
+from src.tracing import count
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "output", "cache")
+
+SEARCH_TTL = int(os.getenv('REDNOTE_SEARCH_TTL', 15 * 60))
+POST_TTL = int(os.getenv('REDNOTE_POST_TTL', 7 * 24 * 60 * 60))
+
+
+class TTLStore:
+    """
+    A SQLite table of values keyed by a string, each with its own TTL.
+    Reads refresh an entry's last access time, and the least recently used
+    entries are evicted once the stored sizes add up to more than
+    ``max_bytes``. Shared by the page cache and the LLM cache
+    (src/llm_cache.py). Safe to share between threads.
+
+    ``columns`` are extra column definitions (e.g. "url TEXT NOT NULL")
+    filled from the keyword arguments of put().
+    """
+
+    def __init__(self, path: str, table: str, max_bytes: int, body_type: str = 'BLOB',
+                 columns: Tuple[str, ...] = ()):
+        self.path = path
+        self.table = table
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,
+                {''.join(column + ', ' for column in columns)}body {body_type} NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_last_access ON {table} (last_access)")
+        self._conn.commit()
+
+    def get(self, key: str):
+        """
+        Return the stored value, or None when it is missing or expired.
+        Expired entries are deleted.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT body, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                    self._conn.commit()
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return row[0]
+
+    def put(self, key: str, body, size: int, ttl: float, **columns) -> None:
+        """
+        Store a value of ``size`` bytes for ``ttl`` seconds, evicting expired
+        and then least recently used entries if the store grows past its cap.
+        """
+        now = time.time()
+        names = ('key', *columns, 'body', 'size', 'expires_at', 'last_access')
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} ({', '.join(names)}) "
+                f"VALUES ({','.join('?' * len(names))})",
+                (key, *columns.values(), body, size, now + ttl, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (now,))
+        total = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(f"SELECT key, size FROM {self.table} ORDER BY last_access").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            total -= size
+
+    def totals(self) -> Tuple[int, int]:
+        """
+        The number of stored entries and the sum of their sizes.
+        """
+        with self._lock:
+            entries, size = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+            ).fetchone()
+        return entries, size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+
+class PageCache:
+    """
+    HTML cache with per-entry TTL and LRU size eviction, on a TTLStore.
+    Safe to share between threads.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = 500 * 1024 * 1024):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "pages.db")
+        self.hits = 0
+        self.misses = 0
+        self._store = TTLStore(self.path, 'pages', max_bytes, columns=('url TEXT NOT NULL',))
+
+    @property
+    def max_bytes(self) -> int:
+        return self._store.max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value: int) -> None:
+        self._store.max_bytes = value
+
+    @staticmethod
+    def make_key(url: str, options: Optional[dict] = None) -> str:
+        """
+        Cache key for a URL and the crawl options that change its HTML.
+        """
+        payload = json.dumps({'url': url, 'options': options or {}}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, url: str, options: Optional[dict] = None) -> Optional[str]:
+        """
+        Return the cached HTML, or None on a miss or an expired entry.
+        """
+        body = self._store.get(self.make_key(url, options))
+        if body is None:
+            self.misses += 1
+            count('page_cache.misses')
+            return None
+        self.hits += 1
+        count('page_cache.hits')
+        return zlib.decompress(body).decode('utf-8')
+
+    def put(self, url: str, html: str, ttl: float, options: Optional[dict] = None) -> None:
+        """
+        Store HTML for ``ttl`` seconds, evicting least recently used pages
+        if the cache grows past its size cap.
+        """
+        body = zlib.compress(html.encode('utf-8'), 6)
+        self._store.put(self.make_key(url, options), body, len(body), ttl, url=url)
+
+    def stats(self) -> dict:
+        """
+        Hit/miss counters plus the number and compressed size of stored pages.
+        """
+        entries, size = self._store.totals()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'bytes': size}
+
+    def clear(self) -> None:
+        self._store.clear()
+
+
+_page_cache = None
+_page_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> Optional[PageCache]:
+    """
+    Return the shared page cache, or None when REDNOTE_CACHE=off.
+    """
+    global _page_cache
+    if os.getenv('REDNOTE_CACHE', 'on').lower() in ('off', '0', 'false'):
+        return None
+    with _page_cache_lock:
+        if _page_cache is None:
+            _page_cache = PageCache(
+                cache_dir=os.getenv('REDNOTE_CACHE_DIR', DEFAULT_CACHE_DIR),
+                max_bytes=int(float(os.getenv('REDNOTE_CACHE_MAX_MB', 500)) * 1024 * 1024),
+            )
+        return _page_cache
@@ -0,0 +1,107 @@
+"""
+Stage checkpoints for the scrape -> analyze -> create pipeline.
+
+Each task's output is saved under output/checkpoints (in REDNOTE_OUTPUT_DIR
+when set, like the other run outputs), keyed by the topic and the inputs
+that shaped it, so a rerun can skip stages that already finished (--resume)
+or redo only the later ones (--from-stage).
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Iterable, Optional
+
+
+STAGES = ('scrape', 'analyze', 'create')
+
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "output")
+
+
+class CheckpointError(Exception):
+    """Raised when a stage to be restored has no checkpoint."""
+
+
+def task_output_text(output) -> str:
+    """
+    Plain text of a CrewAI task output across CrewAI versions.
+    """
+    for attr in ('raw', 'raw_output'):
+        text = getattr(output, attr, None)
+        if isinstance(text, str):
+            return text
+    return str(output)
+
+
+class CheckpointStore:
+    """
+    Stores one JSON file per (topic, inputs, stage), under ``root`` or
+    else <REDNOTE_OUTPUT_DIR>/checkpoints.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.path.join(os.getenv('REDNOTE_OUTPUT_DIR', DEFAULT_OUTPUT_DIR), "checkpoints")
+
+    def _run_dir(self, topic: str, inputs: dict) -> str:
+        digest = hashlib.sha256(
+            json.dumps({'topic': topic, 'inputs': inputs}, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        ).hexdigest()[:12]
+        slug = re.sub(r'[^\w-]+', '_', topic).strip('_')[:40] or 'topic'
+        return os.path.join(self.root, f"{slug}-{digest}")
+
+    def _path(self, topic: str, inputs: dict, stage: str) -> str:
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage '{stage}'. Expected one of: {', '.join(STAGES)}")
+        return os.path.join(self._run_dir(topic, inputs), f"{stage}.json")
+
+    def load(self, topic: str, inputs: dict, stage: str) -> Optional[str]:
+        """
+        Return the saved output of a stage, or None if there is no checkpoint.
+        """
+        path = self._path(topic, inputs, stage)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)['output']
+        except (ValueError, KeyError, OSError):
+            return None
+
+    def save(self, topic: str, inputs: dict, stage: str, output: str) -> str:
+        """
+        Save a stage's output atomically and return the checkpoint path.
+        """
+        path = self._path(topic, inputs, stage)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(
+                {'topic': topic, 'inputs': inputs, 'stage': stage,
+                 'saved_at': time.time(), 'output': output},
+                f, ensure_ascii=False, indent=2,
+            )
+        os.replace(tmp_path, path)
+        return path
+
+    def discard(self, topic: str, inputs: dict, stages: Iterable[str]) -> None:
+        """
+        Remove checkpoints that a re-run stage is about to invalidate.
+        """
+        for stage in stages:
+            path = self._path(topic, inputs, stage)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def first_missing(self, topic: str, inputs: dict, stage_inputs: dict = None) -> int:
+        """
+        Index in STAGES of the first stage without a checkpoint
+        (len(STAGES) when every stage is done). ``stage_inputs`` maps
+        stages whose checkpoints are keyed by other inputs to those inputs.
+        """
+        stage_inputs = stage_inputs or {}
+        for i, stage in enumerate(STAGES):
+            if self.load(topic, stage_inputs.get(stage, inputs), stage) is None:
+                return i
+        return len(STAGES)
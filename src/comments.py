@@ -0,0 +1,225 @@
+"""
+Streaming comment harvester.
+
+A post's comments are loaded page by page as its comment panel is scrolled.
+iter_comments() keeps one browser session on the post and, in each round,
+runs a script in the open page that hands over the next batch of comments
+(from the live note store, or the rendered comment items when the store is
+unavailable) and scrolls the panel to load more. Comments are yielded as
+each batch arrives, so a post with thousands of comments is never held
+whole in memory; CommentSink appends them to a JSONL file through a small
+bounded buffer shared by every post in the run.
+
+Configuration (environment variables):
+    REDNOTE_COMMENT_BATCH     comments handed over per round (default: 100)
+    REDNOTE_COMMENT_BUFFER    rows buffered before the JSONL file is flushed (default: 500)
+"""
+
+import json
+import os
+from typing import AsyncIterator
+
+from src.crawler import CrawlerService
+from src.extraction import COMMENT_BATCH_ID, extract_comment_batch
+from src.throttle import get_fetch_scheduler
+
+
+COMMENT_BATCH_SIZE = int(os.getenv('REDNOTE_COMMENT_BATCH', 100))
+COMMENT_BUFFER_ROWS = int(os.getenv('REDNOTE_COMMENT_BUFFER', 500))
+
+# How long to wait for the next page of comments after scrolling (ms).
+COMMENT_SETTLE_MS = 2500
+
+# Safety net for panels that keep reporting more comments without loading any
+MAX_COMMENT_ROUNDS = 200
+
+
+def build_comment_js(batch_size: int) -> str:
+    """
+    Build the comment harvesting script.
+
+    Each run writes up to ``batch_size`` comments not handed over before into
+    a JSON script with id COMMENT_BATCH_ID, then scrolls the comment panel so
+    the next page starts loading. When nothing new is ready it waits for the
+    panel to grow, and marks the batch done if it does not.
+    """
+    return f"""
+    const batchSize = {batch_size};
+    const unwrap = v => (v && (v._rawValue || v._value || v.value)) || v;
+    const noteComments = () => {{
+        try {{
+            const note = unwrap(window.__INITIAL_STATE__.note);
+            const map = unwrap(note.noteDetailMap);
+            const id = unwrap(note.currentNoteId) || unwrap(note.firstNoteId);
+            const entry = (id && map[id]) || Object.values(map).find(e => e && e.note);
+            const comments = unwrap(entry.comments);
+            const list = unwrap(comments.list);
+            return Array.isArray(list) ? {{list: list, hasMore: comments.hasMore !== false}} : null;
+        }} catch (e) {{
+            return null;
+        }}
+    }};
+    const unseenItems = () => Array.from(document.querySelectorAll('.comment-item'))
+        .filter(item => !item.dataset.rednoteSeen);
+    const pending = () => {{
+        const state = noteComments();
+        if (state && state.list.length) return state.list.length - (window.__rednoteCommentCursor || 0);
+        return unseenItems().length;
+    }};
+
+    const take = () => {{
+        const batch = [];
+        const state = noteComments();
+        if (state && state.list.length) {{
+            let cursor = window.__rednoteCommentCursor || 0;
+            while (cursor < state.list.length && batch.length < batchSize) {{
+                const c = state.list[cursor++];
+                const row = (x, parent) => ({{
+                    id: x.id, parent_id: parent, content: x.content,
+                    author: x.userInfo && x.userInfo.nickname, likes: x.likeCount, time: x.createTime,
+                }});
+                batch.push(row(c, ''));
+                (c.subComments || []).forEach(s => batch.push(row(s, c.id)));
+            }}
+            window.__rednoteCommentCursor = cursor;
+            return batch;
+        }}
+        for (const item of unseenItems()) {{
+            if (batch.length >= batchSize) break;
+            item.dataset.rednoteSeen = '1';
+            const text = selector => {{
+                const el = item.querySelector(selector);
+                return el ? el.textContent.trim() : '';
+            }};
+            const parent = item.closest('.parent-comment');
+            const top = parent && parent.querySelector('.comment-item');
+            batch.push({{
+                id: (item.id || '').replace(/^comment-/, ''),
+                parent_id: top && top !== item ? (top.id || '').replace(/^comment-/, '') : '',
+                content: text('.content'), author: text('.author .name') || text('.name'),
+                likes: text('.like .count'), time: text('.date'),
+            }});
+        }}
+        return batch;
+    }};
+
+    const loadMore = () => {{
+        const panel = document.querySelector('.note-scroller') || document.scrollingElement;
+        panel.scrollTop = panel.scrollHeight;
+        window.scrollTo(0, document.body.scrollHeight);
+    }};
+
+    let batch = take();
+    let done = false;
+    if (batch.length < batchSize) {{
+        const state = noteComments();
+        const exhausted = state && !state.hasMore;
+        if (!exhausted) loadMore();
+        if (!batch.length) {{
+            let grown = false;
+            for (let waited = 0; !exhausted && waited < {COMMENT_SETTLE_MS}; waited += 200) {{
+                await new Promise(resolve => setTimeout(resolve, 200));
+                if (pending() > 0) {{ grown = true; break; }}
+            }}
+            if (grown) batch = take();
+            else done = true;
+        }}
+    }}
+
+    let script = document.getElementById('{COMMENT_BATCH_ID}');
+    if (!script) {{
+        script = document.createElement('script');
+        script.id = '{COMMENT_BATCH_ID}';
+        script.type = 'application/json';
+        document.body.appendChild(script);
+    }}
+    script.textContent = JSON.stringify({{comments: batch, done: done}}).replace(/</g, '\\\\u003c');
+    """
+
+
+async def iter_comments(service: CrawlerService, url: str, limit: int,
+                        batch_size: int = COMMENT_BATCH_SIZE, slot=None) -> AsyncIterator[dict]:
+    """
+    Yield up to ``limit`` comments of the post at ``url`` as they load.
+
+    The post is opened once in a pooled session; every further round runs
+    the harvesting script in that same page without navigating. Only one
+    batch is held at a time, plus the ids already yielded. ``slot`` is
+    held during each round's request (see FetchScheduler.fetch).
+    """
+    js_code = build_comment_js(min(batch_size, limit))
+    seen = set()
+    async with service.session() as session:
+        options = {'js_code': js_code, 'wait_for': 'body'}
+        for _ in range(MAX_COMMENT_ROUNDS):
+            result = await get_fetch_scheduler().fetch(
+                url, lambda: service.fetch(url, session=session, **options), slot
+            )
+            if not result.success:
+                raise RuntimeError(f"Failed to load comments: {result.error_message}")
+
+            comments, done = extract_comment_batch(result.html)
+            for comment in comments:
+                key = comment['comment_id'] or comment['content']
+                if key in seen:
+                    continue
+                seen.add(key)
+                yield comment
+                if len(seen) >= limit:
+                    return
+            if done:
+                return
+            options = {'js_code': js_code, 'js_only': True}
+
+
+class CommentSink:
+    """
+    Append-only JSONL writer. Rows are buffered and flushed once
+    ``max_buffered`` are pending, so memory stays bounded however many
+    comments are written. One sink can be shared by concurrent harvesters
+    on the same event loop.
+    """
+
+    def __init__(self, path: str, max_buffered: int = COMMENT_BUFFER_ROWS):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.max_buffered = max(1, max_buffered)
+        self.rows_written = 0
+        self._buffer = []
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, row: dict) -> None:
+        self._buffer.append(json.dumps(row, ensure_ascii=False))
+        if len(self._buffer) >= self.max_buffered:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._file.write('\n'.join(self._buffer) + '\n')
+            self._file.flush()
+            self.rows_written += len(self._buffer)
+            self._buffer.clear()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+async def harvest_comments(service: CrawlerService, sink: CommentSink, post: dict,
+                           limit: int, slot=None) -> int:
+    """
+    Stream up to ``limit`` comments of a scraped post into ``sink``, tagged
+    with its note id. Returns the number of comments written.
+    """
+    count = 0
+    async for comment in iter_comments(service, post['url'], limit, slot=slot):
+        sink.write({'note_id': post['note_id'], **comment})
+        count += 1
+    return count
@@ -0,0 +1,294 @@
+"""
+Shared crawler service.
+
+Launching Chromium is the largest fixed cost of a scrape, so instead of
+opening a new event loop and AsyncWebCrawler on every tool call, a single
+crawler runs on a background event loop for the life of the process. Tool
+calls submit coroutines to that loop and borrow browser sessions (tabs with
+their own page state) from a pool. Sessions are recycled after a number of
+fetched pages, or straight away when a block using them fails.
+
+Configuration (environment variables):
+    REDNOTE_BROWSER_POOL        number of browser sessions (default: 3)
+    REDNOTE_SESSION_MAX_PAGES   pages fetched in a session before it is recycled (default: 50)
+    REDNOTE_RUN_TIMEOUT         seconds a caller waits for work on the crawler loop (default: 1800)
+"""
+
+import asyncio
+import atexit
+import collections
+import concurrent.futures
+import itertools
+import json
+import os
+import threading
+from contextlib import asynccontextmanager
+
+from crawl4ai import AsyncWebCrawler
+
+from src.tracing import count, span
+
+
+COOKIES_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "xhs_cookies.json")
+
+# Consecutive failed fetches after which the browser itself is restarted.
+MAX_CONSECUTIVE_FAILURES = 5
+
+# Longest a caller waits in run() for a coroutine on the service loop (s)
+RUN_TIMEOUT = float(os.getenv('REDNOTE_RUN_TIMEOUT', 1800))
+
+
+def load_cookies(path: str = COOKIES_PATH) -> dict:
+    """
+    Load xhs_cookies.json (EditThisCookie format) into a name -> value dict.
+
+    Raises:
+        FileNotFoundError: If the cookies file does not exist.
+        ValueError: If the file cannot be parsed.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"xhs_cookies.json not found at {path}. "
+            "Please create this file with your Xiaohongshu login cookies. "
+            "See xhs_cookies.json.example for format."
+        )
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cookies = json.load(f)
+        return {cookie['name']: cookie['value'] for cookie in cookies}
+    except Exception as e:
+        raise ValueError(f"Error loading cookies: {str(e)}") from e
+
+
+class CrawlerService:
+    """
+    A long-lived AsyncWebCrawler with a pool of warm browser sessions.
+
+    The pool holds ``pool_size`` slots for the life of the service. A slot is
+    always handed back, with its session or, when the session has to be
+    recycled, with None; the next borrower then opens a fresh session in the
+    current browser. A browser restart therefore never strands a waiting
+    borrower. The old browser is only closed once every session borrowed
+    from it has come back.
+    """
+
+    def __init__(self, pool_size: int = 3, max_pages_per_session: int = 50,
+                 cookies_path: str = COOKIES_PATH):
+        self.cookies = load_cookies(cookies_path)
+        self.pool_size = max(1, pool_size)
+        self.max_pages_per_session = max(1, max_pages_per_session)
+        self.pages_fetched = 0
+
+        self._crawler = None
+        self._session_ids = itertools.count(1)
+        self._generation = 0
+        self._failures = 0
+        self._start_lock = None
+        # Browsers replaced by a restart, by generation, until their sessions are back
+        self._retired = {}
+        self._borrowed = collections.Counter()
+
+        self._sessions = asyncio.Queue()
+        for _ in range(self.pool_size):
+            self._sessions.put_nowait(None)
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="rednote-crawler", daemon=True
+        )
+        self._thread.start()
+
+    def run(self, coro, timeout: float = RUN_TIMEOUT):
+        """
+        Run a coroutine on the service loop from any other thread and wait for it.
+
+        Raises:
+            concurrent.futures.TimeoutError: If it takes longer than ``timeout``
+                seconds; the coroutine is cancelled.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def start(self) -> None:
+        """
+        Launch the browser now rather than on the first fetch.
+        """
+        self.run(self._ensure_started())
+
+    async def _ensure_started(self) -> None:
+        if self._crawler is not None:
+            return
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._crawler is not None:
+                return
+            with span('browser.launch', 'crawler'):
+                crawler = AsyncWebCrawler(verbose=False)
+                # __aenter__ starts the browser on every crawl4ai version we support
+                await crawler.__aenter__()
+            self._crawler = crawler
+            self._generation += 1
+
+    def _new_session(self) -> dict:
+        return {
+            'id': f"rednote-{next(self._session_ids)}",
+            'pages': 0,
+            'crawler': self._crawler,
+            'generation': self._generation,
+        }
+
+    async def _kill_session(self, session: dict) -> None:
+        try:
+            await session['crawler'].crawler_strategy.kill_session(session['id'])
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def session(self):
+        """
+        Borrow a browser session for the duration of the block.
+
+        The session is recycled once it has fetched max_pages_per_session
+        pages, if the block raises, or if the browser was restarted meanwhile.
+        Yields the session dict; its 'crawler' is the browser the session
+        lives in.
+        """
+        session = await self._sessions.get()
+        try:
+            if session is None or session['generation'] != self._generation:
+                await self._ensure_started()
+                session = self._new_session()
+        except BaseException:
+            self._sessions.put_nowait(None)
+            raise
+        self._borrowed[session['generation']] += 1
+
+        healthy = True
+        try:
+            yield session
+        except BaseException:
+            healthy = False
+            raise
+        finally:
+            self._borrowed[session['generation']] -= 1
+            current = session['generation'] == self._generation
+            if current and healthy and session['pages'] < self.max_pages_per_session:
+                self._sessions.put_nowait(session)
+            else:
+                self._sessions.put_nowait(None)
+                if current:
+                    await self._kill_session(session)
+                else:
+                    await self._close_retired()
+
+    async def fetch(self, url: str, session: dict = None, **options):
+        """
+        Crawl a URL in a pooled session with the service cookies.
+        Pass a ``session`` borrowed with session() to keep working in the same
+        tab across calls; otherwise one is borrowed for this fetch only.
+        ``options`` are passed through to AsyncWebCrawler.arun.
+        """
+        if session is None:
+            async with self.session() as session:
+                return await self.fetch(url, session=session, **options)
+
+        session['pages'] += 1
+        try:
+            result = await session['crawler'].arun(
+                url=url, cookies=self.cookies, session_id=session['id'], **options
+            )
+        except Exception:
+            await self._record_failure(session)
+            raise
+        self.pages_fetched += 1
+        count('crawler.pages')
+        count('crawler.bytes', len(result.html or ''))
+        if result.success:
+            self._failures = 0
+        else:
+            await self._record_failure(session)
+        return result
+
+    async def _record_failure(self, session: dict) -> None:
+        """
+        Restart the browser after too many failures in a row; a crashed or
+        disconnected browser fails every request until it is relaunched.
+        Failures of sessions in an already replaced browser don't count.
+        """
+        if session['generation'] != self._generation:
+            return
+        self._failures += 1
+        if self._failures >= MAX_CONSECUTIVE_FAILURES:
+            self._failures = 0
+            await self._restart()
+
+    async def _restart(self) -> None:
+        # Sessions still borrowed from the old browser keep using it until
+        # they come back; the last one to return closes it
+        if self._crawler is not None:
+            self._retired[self._generation] = self._crawler
+            self._crawler = None
+        await self._ensure_started()
+        await self._close_retired()
+
+    async def _close_retired(self) -> None:
+        for generation, crawler in list(self._retired.items()):
+            if self._borrowed[generation] > 0:
+                continue
+            del self._retired[generation]
+            self._borrowed.pop(generation, None)
+            try:
+                await crawler.__aexit__(None, None, None)
+            except Exception:
+                pass
+
+    async def _close(self) -> None:
+        for crawler in [self._crawler, *self._retired.values()]:
+            if crawler is None:
+                continue
+            try:
+                await crawler.__aexit__(None, None, None)
+            except Exception:
+                pass
+        self._crawler = None
+        self._retired.clear()
+
+    def close(self) -> None:
+        """
+        Shut down the browser and stop the service loop.
+        """
+        if not self._loop.is_running():
+            return
+        try:
+            self.run(self._close(), timeout=30)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_crawler_service() -> CrawlerService:
+    """
+    Return the process-wide crawler service, creating it on first use.
+
+    Raises:
+        FileNotFoundError / ValueError: If the cookies cannot be loaded.
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = CrawlerService(
+                pool_size=int(os.getenv('REDNOTE_BROWSER_POOL', 3)),
+                max_pages_per_session=int(os.getenv('REDNOTE_SESSION_MAX_PAGES', 50)),
+            )
+            atexit.register(_service.close)
+        return _service
@@ -0,0 +1,196 @@
+"""
+Near-duplicate detection for posts and comments.
+
+Texts are normalised, split into character shingles (which works for Chinese
+without word segmentation) and summarised with a MinHash signature. Banded
+LSH buckets find candidate pairs without comparing every pair, and the
+fraction of agreeing signature slots estimates their Jaccard similarity.
+
+Post signatures are kept in a SQLite index so later runs (and other topics
+in a batch) can recognise reposts of notes seen before.
+
+Configuration (environment variables):
+    REDNOTE_DEDUP_PATH        index database (default: output/dedup.db)
+    REDNOTE_DEDUP_THRESHOLD   estimated Jaccard similarity treated as a duplicate (default: 0.8)
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "output", "dedup.db")
+
+DEDUP_THRESHOLD = float(os.getenv('REDNOTE_DEDUP_THRESHOLD', 0.8))
+
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+BANDS = 16  # 16 bands x 4 rows: pairs above ~0.5 similarity share a bucket
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, _MERSENNE_PRIME, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, _MERSENNE_PRIME, size=NUM_PERM).astype(np.uint64)
+
+# Everything that isn't a letter, digit or CJK character (punctuation, emoji, spaces)
+_NOISE_RE = re.compile(r'[^0-9a-z一-鿿]+')
+
+
+def normalize(text: str) -> str:
+    return _NOISE_RE.sub('', (text or '').lower())
+
+
+def shingles(text: str, k: int = SHINGLE_SIZE) -> set:
+    """
+    Character k-shingles of the normalised text. Texts shorter than k
+    yield themselves as a single shingle.
+    """
+    text = normalize(text)
+    if len(text) <= k:
+        return {text} if text else set()
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """
+    MinHash signature (NUM_PERM uint64 values), or None for empty text.
+    """
+    grams = shingles(text)
+    if not grams:
+        return None
+    hashes = np.fromiter(
+        (zlib.crc32(g.encode('utf-8')) & _MERSENNE_PRIME for g in grams),
+        dtype=np.uint64, count=len(grams),
+    )
+    # (a * x + b) mod p for every permutation and shingle, then the column minimum
+    permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return permuted.min(axis=1)
+
+
+def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """
+    Estimated Jaccard similarity of two signatures.
+    """
+    return float(np.mean(sig_a == sig_b))
+
+
+def _band_keys(signature: np.ndarray) -> List[str]:
+    rows = NUM_PERM // BANDS
+    return [
+        f"{band}:{zlib.crc32(signature[band * rows:(band + 1) * rows].tobytes()):08x}"
+        for band in range(BANDS)
+    ]
+
+
+class NearDuplicateIndex:
+    """
+    In-memory LSH index over MinHash signatures.
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD):
+        self.threshold = threshold
+        self._signatures = {}
+        self._buckets = {}
+
+    def query(self, signature: np.ndarray) -> List[str]:
+        """
+        Ids of indexed items whose estimated similarity reaches the threshold.
+        """
+        candidates = set()
+        for key in _band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+        return [
+            item_id for item_id in candidates
+            if similarity(signature, self._signatures[item_id]) >= self.threshold
+        ]
+
+    def add(self, item_id: str, signature: np.ndarray) -> None:
+        self._signatures[item_id] = signature
+        for key in _band_keys(signature):
+            self._buckets.setdefault(key, set()).add(item_id)
+
+
+class PersistentNearDuplicateIndex(NearDuplicateIndex):
+    """
+    NearDuplicateIndex backed by SQLite, loaded on open and written through
+    on every add. Safe to share between threads.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH, kind: str = 'post',
+                 threshold: float = DEDUP_THRESHOLD):
+        super().__init__(threshold)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.kind = kind
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS signatures (
+                kind TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                PRIMARY KEY (kind, item_id)
+            )
+            """
+        )
+        self._conn.commit()
+        for item_id, blob in self._conn.execute(
+            "SELECT item_id, signature FROM signatures WHERE kind = ?", (kind,)
+        ):
+            super().add(item_id, np.frombuffer(blob, dtype=np.uint64))
+
+    def query(self, signature: np.ndarray) -> List[str]:
+        with self._lock:
+            return super().query(signature)
+
+    def add(self, item_id: str, signature: np.ndarray) -> None:
+        with self._lock:
+            if item_id in self._signatures:
+                return
+            super().add(item_id, signature)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO signatures (kind, item_id, signature) VALUES (?, ?, ?)",
+                (self.kind, item_id, signature.tobytes()),
+            )
+            self._conn.commit()
+
+
+def dedup_texts(texts: Iterable[str], threshold: float = DEDUP_THRESHOLD) -> List[bool]:
+    """
+    For each text, whether to keep it: False for exact or near duplicates of
+    an earlier text in the sequence. Empty texts are always kept.
+    """
+    index = NearDuplicateIndex(threshold)
+    keep = []
+    for i, text in enumerate(texts):
+        signature = minhash(text)
+        if signature is None:
+            keep.append(True)
+            continue
+        duplicate = bool(index.query(signature))
+        if not duplicate:
+            index.add(str(i), signature)
+        keep.append(not duplicate)
+    return keep
+
+
+_post_index = None
+_post_index_lock = threading.Lock()
+
+
+def get_post_index() -> PersistentNearDuplicateIndex:
+    """
+    Return the shared persistent index of post signatures.
+    """
+    global _post_index
+    with _post_index_lock:
+        if _post_index is None:
+            _post_index = PersistentNearDuplicateIndex(
+                os.getenv('REDNOTE_DEDUP_PATH', DEFAULT_INDEX_PATH), kind='post'
+            )
+        return _post_index
@@ -0,0 +1,490 @@
+"""
+HTML extraction for Xiaohongshu (Rednote) pages.
+
+Every function here is a pure function over an HTML string. Pages ship their
+data in an inline ``window.__INITIAL_STATE__`` script, which is read first.
+When it is missing (or lacks a field), the document is parsed once with lxml
+and walked in a single pass, collecting the first match for every selector
+the scraper cares about. Keeping this free of any crawler state makes it easy
+to benchmark and to run outside the event loop.
+"""
+
+import json
+import os
+import re
+from typing import List, Optional, Tuple
+
+from lxml import etree
+from lxml import html as lxml_html
+
+
+# REDNOTE_BASE_URL points the scraper at another host, such as the local
+# stand-in server in benchmarks/
+BASE_URL = os.getenv('REDNOTE_BASE_URL', "https://www.xiaohongshu.com").rstrip('/')
+
+UNAVAILABLE = 'Content unavailable'
+
+# Title selectors in priority order, mirroring the old BeautifulSoup lookups:
+# '.title', '#detail-title', 'h1', '[class*="title"]', 'title'
+_TITLE_SELECTORS = 5
+
+# Comment selectors in priority order:
+# '[class*="comment"]', '[class*="Comment"]', '.comment-item', '[data-testid*="comment"]'
+_COMMENT_SELECTORS = 4
+
+# How many div/span/p elements the generic comment fallback looks at.
+_FALLBACK_TEXT_ELEMENTS = 20
+
+_STATE_MARKER = 'window.__INITIAL_STATE__'
+
+# Id of the JSON script the search-page scroll script writes the live feed into
+FEED_STATE_ID = 'rednote-feed-state'
+
+# The state is a JS object literal, not strict JSON: bare `undefined` values
+# have to become null before json.loads accepts it.
+_UNDEFINED_RE = re.compile(r'(?<=[:\[,])\s*undefined(?=\s*[,}\]])')
+
+_FEED_STATE_RE = re.compile(
+    r'<script[^>]*id="' + FEED_STATE_ID + r'"[^>]*>(.*?)</script>', re.S
+)
+
+# Id of the JSON script the comment harvesting script writes each batch into
+COMMENT_BATCH_ID = 'rednote-comment-batch'
+
+_COMMENT_BATCH_RE = re.compile(
+    r'<script[^>]*id="' + COMMENT_BATCH_ID + r'"[^>]*>(.*?)</script>', re.S
+)
+
+
+def _parse(html) -> Optional[etree._Element]:
+    """
+    Parse an HTML document or fragment, returning None for empty input.
+    """
+    if not html:
+        return None
+    try:
+        return lxml_html.fromstring(html)
+    except (etree.ParserError, ValueError):
+        return None
+
+
+def _text(elem) -> str:
+    """
+    Equivalent of BeautifulSoup's get_text(strip=True): every text node
+    stripped and concatenated.
+    """
+    return ''.join(piece.strip() for piece in elem.itertext())
+
+
+def _full_url(href: str) -> str:
+    return href if href.startswith('http') else f"{BASE_URL}{href}"
+
+
+def parse_count(value) -> int:
+    """
+    Convert an engagement count such as "1.2万", "3k" or "10w+" into an int.
+    Unparseable values count as 0.
+    """
+    if value is None:
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip().replace(',', '').rstrip('+')
+    multiplier = 1
+    for suffix, factor in (('万', 10_000), ('w', 10_000), ('W', 10_000),
+                           ('亿', 100_000_000), ('k', 1_000), ('K', 1_000)):
+        if text.endswith(suffix):
+            text = text[:-len(suffix)]
+            multiplier = factor
+            break
+    try:
+        return int(float(text) * multiplier)
+    except ValueError:
+        return 0
+
+
+def _unwrap(value):
+    """
+    Unwrap Vue refs serialised into the state ({"_rawValue": ...} / {"_value": ...}).
+    """
+    while isinstance(value, dict):
+        for key in ('_rawValue', '_value'):
+            if key in value:
+                value = value[key]
+                break
+        else:
+            break
+    return value
+
+
+def find_initial_state(html) -> Optional[dict]:
+    """
+    Locate and parse the inline ``window.__INITIAL_STATE__`` blob.
+    Returns None when the page has no (parseable) state.
+    """
+    if not html:
+        return None
+    if isinstance(html, bytes):
+        html = html.decode('utf-8', errors='replace')
+    start = html.find(_STATE_MARKER)
+    if start == -1:
+        return None
+    start = html.find('=', start) + 1
+    end = html.find('</script>', start)
+    if start == 0 or end == -1:
+        return None
+    blob = html[start:end].strip().rstrip(';')
+    try:
+        state = json.loads(_UNDEFINED_RE.sub('null', blob))
+    except ValueError:
+        return None
+    return state if isinstance(state, dict) else None
+
+
+def _image_url(image: dict) -> Optional[str]:
+    for key in ('urlDefault', 'url', 'urlPre'):
+        if image.get(key):
+            return image[key]
+    for info in image.get('infoList') or []:
+        if info.get('url'):
+            return info['url']
+    return None
+
+
+def _engagement(interact: dict) -> dict:
+    interact = interact or {}
+    return {
+        'likes': parse_count(interact.get('likedCount')),
+        'collects': parse_count(interact.get('collectedCount')),
+        'comment_count': parse_count(interact.get('commentCount')),
+        'shares': parse_count(interact.get('shareCount')),
+    }
+
+
+def _note_from_state(state: dict, max_comments: int) -> Optional[dict]:
+    """
+    Read the note shown on a detail page out of its initial state.
+    """
+    note_state = _unwrap(state.get('note')) or {}
+    detail_map = _unwrap(note_state.get('noteDetailMap')) or {}
+    if not isinstance(detail_map, dict) or not detail_map:
+        return None
+
+    note_id = _unwrap(note_state.get('currentNoteId')) or _unwrap(note_state.get('firstNoteId'))
+    entry = detail_map.get(note_id) if note_id else None
+    if entry is None:
+        # Fall back to the first entry that actually carries a note
+        entry = next((e for e in detail_map.values() if isinstance(e, dict) and e.get('note')), None)
+    if not entry:
+        return None
+    note = _unwrap(entry.get('note')) or {}
+    if not note:
+        return None
+
+    image_urls = [url for url in (_image_url(img) for img in note.get('imageList') or []) if url]
+    comment_list = _unwrap((_unwrap(entry.get('comments')) or {}).get('list')) or []
+    comments = []
+    for comment in comment_list:
+        if len(comments) >= max_comments:
+            break
+        text = (comment.get('content') or '').strip()
+        if text:
+            comments.append(text)
+
+    record = {
+        'note_id': note.get('noteId') or note_id or '',
+        'title': (note.get('title') or '').strip() or (note.get('desc') or '').strip()[:100],
+        'image_url': image_urls[0] if image_urls else '',
+        'image_urls': image_urls,
+        'comments': comments,
+        'published_at': note.get('time') or 0,
+    }
+    record.update(_engagement(note.get('interactInfo')))
+    return record
+
+
+def note_id_from_url(url: str) -> str:
+    """
+    Return the note id from an /explore/<id> URL ('' if there is none).
+    """
+    marker = '/explore/'
+    pos = url.find(marker)
+    if pos == -1:
+        return ''
+    return url[pos + len(marker):].split('?')[0].split('#')[0].strip('/')
+
+
+def extract_search_feeds(html) -> List[dict]:
+    """
+    Read the search result cards (note id, URL, title, cover, engagement)
+    from the search page state.
+
+    The scroll script dumps the live feed store into a JSON script with id
+    FEED_STATE_ID, which includes cards loaded while scrolling; the initial
+    state only has the first page and is used when that dump is missing.
+    """
+    if not html:
+        return []
+    if isinstance(html, bytes):
+        html = html.decode('utf-8', errors='replace')
+
+    feeds = None
+    match = _FEED_STATE_RE.search(html)
+    if match:
+        try:
+            feeds = json.loads(match.group(1))
+        except ValueError:
+            feeds = None
+    if feeds is None:
+        state = find_initial_state(html) or {}
+        feeds = (_unwrap(state.get('search')) or {}).get('feeds')
+    feeds = _unwrap(feeds) or []
+
+    cards = []
+    seen = set()
+    for feed in feeds:
+        if not isinstance(feed, dict):
+            continue
+        note_id = feed.get('id') or ''
+        card = feed.get('noteCard') or {}
+        if not note_id or not card or note_id in seen:
+            continue
+        seen.add(note_id)
+        url = f"{BASE_URL}/explore/{note_id}"
+        if feed.get('xsecToken'):
+            url += f"?xsec_token={feed['xsecToken']}&xsec_source=pc_search"
+        cover = card.get('cover') or {}
+        entry = {
+            'note_id': note_id,
+            'url': url,
+            'title': (card.get('displayTitle') or '').strip(),
+            'image_url': _image_url(cover) or '',
+            'published_at': card.get('time') or 0,
+        }
+        entry.update(_engagement(card.get('interactInfo')))
+        cards.append(entry)
+    return cards
+
+
+def extract_page(html, max_comments: int = 3, max_links: int = 0) -> dict:
+    """
+    Extract title, image URL, comments and /explore/ links from a page.
+
+    Args:
+        html: Page HTML (str or bytes).
+        max_comments: Maximum number of comments to return.
+        max_links: Maximum number of /explore/ links to return (0 skips links).
+
+    Returns:
+        A dict with 'title', 'image_url', 'comments' (list of str) and
+        'links' (list of absolute URLs).
+    """
+    record = {'title': UNAVAILABLE, 'image_url': UNAVAILABLE, 'comments': [], 'links': []}
+    root = _parse(html)
+    if root is None:
+        return record
+
+    titles = [None] * _TITLE_SELECTORS
+    comment_elems = [[] for _ in range(_COMMENT_SELECTORS)]
+    fallback_elems = []
+    og_title = None
+    og_image = None
+    first_img = None
+    explore_links = []
+    loose_links = []
+
+    for elem in root.iter():
+        tag = elem.tag
+        if not isinstance(tag, str):
+            # Comments and processing instructions
+            continue
+        tag = tag.lower()
+        cls = elem.get('class') or ''
+
+        # Title candidates: keep only the first element for each selector
+        if cls:
+            if titles[0] is None and 'title' in cls.split():
+                titles[0] = elem
+            if titles[3] is None and 'title' in cls:
+                titles[3] = elem
+        if titles[1] is None and elem.get('id') == 'detail-title':
+            titles[1] = elem
+        if tag == 'h1' and titles[2] is None:
+            titles[2] = elem
+        elif tag == 'title' and titles[4] is None:
+            titles[4] = elem
+
+        # Meta tags and the first image
+        if tag == 'meta':
+            prop = elem.get('property')
+            if prop == 'og:image' and og_image is None:
+                og_image = elem
+            elif prop == 'og:title' and og_title is None:
+                og_title = elem
+        elif tag == 'img' and first_img is None:
+            first_img = elem
+
+        # Comment candidates
+        if max_comments:
+            if cls:
+                if 'comment' in cls and len(comment_elems[0]) < max_comments:
+                    comment_elems[0].append(elem)
+                if 'Comment' in cls and len(comment_elems[1]) < max_comments:
+                    comment_elems[1].append(elem)
+                if 'comment-item' in cls.split() and len(comment_elems[2]) < max_comments:
+                    comment_elems[2].append(elem)
+            testid = elem.get('data-testid')
+            if testid and 'comment' in testid and len(comment_elems[3]) < max_comments:
+                comment_elems[3].append(elem)
+            if tag in ('div', 'span', 'p') and len(fallback_elems) < _FALLBACK_TEXT_ELEMENTS:
+                fallback_elems.append(elem)
+
+        # Post links
+        if max_links and tag == 'a':
+            href = elem.get('href')
+            if href:
+                if '/explore/' in href:
+                    explore_links.append(href)
+                elif 'explore' in href.lower():
+                    loose_links.append(href)
+
+    # Resolve title
+    title = UNAVAILABLE
+    for elem in titles:
+        if elem is not None:
+            title = _text(elem)
+            if title:
+                break
+    if (not title or title == UNAVAILABLE) and og_title is not None:
+        title = og_title.get('content', UNAVAILABLE)
+    record['title'] = title
+
+    # Resolve image
+    if og_image is not None:
+        record['image_url'] = og_image.get('content', UNAVAILABLE)
+    elif first_img is not None and first_img.get('src'):
+        record['image_url'] = _full_url(first_img.get('src'))
+
+    # Resolve comments
+    comments = []
+    for elems in comment_elems:
+        for elem in elems:
+            text = _text(elem)
+            if text and len(text) > 5:
+                comments.append(text)
+        if len(comments) >= max_comments:
+            break
+    if not comments and max_comments:
+        # Generic text extraction when no comment containers matched
+        for elem in fallback_elems:
+            text = _text(elem)
+            if text and 10 < len(text) < 200 and text not in comments:
+                comments.append(text)
+                if len(comments) >= max_comments:
+                    break
+    record['comments'] = comments[:max_comments]
+
+    # Resolve links: '/explore/' matches first, then looser 'explore' matches
+    if max_links:
+        links = []
+        seen = set()
+        for href in explore_links + loose_links:
+            full_url = _full_url(href)
+            if full_url not in seen:
+                seen.add(full_url)
+                links.append(full_url)
+                if len(links) >= max_links:
+                    break
+        record['links'] = links
+
+    return record
+
+
+def extract_post(html, max_comments: int = 3) -> dict:
+    """
+    Extract a post detail page.
+
+    Reads the note from the initial state when it is present. The DOM
+    selectors are only walked when the state is missing, or to fill in a
+    title or image the state does not carry. Comments are never filled in
+    from the DOM when the state is present: an empty list there means the
+    post has no comments, and the generic selectors would return nav text.
+
+    Returns:
+        A dict with 'note_id', 'title', 'image_url', 'image_urls', 'comments'
+        (list of str), 'likes', 'collects', 'comment_count', 'shares' and
+        'published_at' (ms timestamp, 0 if unknown).
+    """
+    state = find_initial_state(html)
+    record = _note_from_state(state, max_comments) if state else None
+
+    if record is None:
+        record = {
+            'note_id': '', 'image_urls': [], 'likes': 0, 'collects': 0,
+            'comment_count': 0, 'shares': 0, 'published_at': 0,
+        }
+        dom = extract_page(html, max_comments=max_comments)
+        record.update(title=dom['title'], image_url=dom['image_url'], comments=dom['comments'])
+    elif not record['title'] or not record['image_url']:
+        dom = extract_page(html, max_comments=0)
+        record['title'] = record['title'] or dom['title']
+        record['image_url'] = record['image_url'] or dom['image_url']
+    return record
+
+
+def extract_search_cards(html, limit: int) -> List[dict]:
+    """
+    Extract up to ``limit`` search result cards, in page order.
+
+    Cards come from the feed state when available (see extract_search_feeds);
+    otherwise they are built from the page's /explore/ links, with no title
+    and zero engagement.
+    """
+    cards = extract_search_feeds(html)[:limit]
+    if cards:
+        return cards
+    return [
+        {
+            'note_id': note_id_from_url(url), 'url': url, 'title': '', 'image_url': '',
+            'published_at': 0, 'likes': 0, 'collects': 0, 'comment_count': 0, 'shares': 0,
+        }
+        for url in extract_page(html, max_comments=0, max_links=limit)['links']
+    ]
+
+
+def extract_comment_batch(html) -> Tuple[List[dict], bool]:
+    """
+    Read the batch of comments the harvesting script (see src/comments.py)
+    left in the page.
+
+    Returns:
+        The comments, as dicts with 'comment_id', 'parent_id', 'content',
+        'author', 'likes' and 'time', and whether the post has no more
+        comments to load. A page without a batch counts as finished.
+    """
+    if not html:
+        return [], True
+    if isinstance(html, bytes):
+        html = html.decode('utf-8', errors='replace')
+    match = _COMMENT_BATCH_RE.search(html)
+    if not match:
+        return [], True
+    try:
+        batch = json.loads(match.group(1))
+    except ValueError:
+        return [], True
+
+    comments = []
+    for comment in batch.get('comments') or []:
+        content = (comment.get('content') or '').strip()
+        if not content:
+            continue
+        comments.append({
+            'comment_id': str(comment.get('id') or ''),
+            'parent_id': str(comment.get('parent_id') or ''),
+            'content': content,
+            'author': (comment.get('author') or '').strip(),
+            'likes': parse_count(comment.get('likes')),
+            'time': comment.get('time') or '',
+        })
+    return comments, bool(batch.get('done'))
@@ -0,0 +1,323 @@
+"""
+Image download stage.
+
+Downloads every image of the scraped notes over one pooled aiohttp client
+and stores each unique image once, named by the SHA-256 of its content, with
+a downscaled JPEG thumbnail and a 64-bit difference hash (dHash) for finding
+near-identical images. A SQLite index maps image URLs to content hashes, so
+a URL downloaded once is never fetched again, and records which images
+belong to which note. Notes whose images repeat those of a higher-ranked
+note are recorded as its duplicates in the post store.
+
+Layout under the image directory:
+    images.db                index of URLs, images and note images
+    full/<ab>/<sha256>.<ext> original bytes
+    thumbs/<sha256>.jpg      thumbnail
+
+Configuration (environment variables):
+    REDNOTE_IMAGE_DIR           image directory (default: output/images)
+    REDNOTE_IMAGE_CONCURRENCY   downloads in flight at once (default: 8)
+    REDNOTE_THUMBNAIL_SIZE      longest thumbnail side in pixels (default: 256)
+"""
+
+import asyncio
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+from PIL import Image
+
+
+DEFAULT_IMAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "output", "images")
+
+IMAGE_CONCURRENCY = int(os.getenv('REDNOTE_IMAGE_CONCURRENCY', 8))
+THUMBNAIL_SIZE = int(os.getenv('REDNOTE_THUMBNAIL_SIZE', 256))
+
+# dHash distance (differing bits out of 64) up to which images count as near-identical
+NEAR_DUPLICATE_DISTANCE = 6
+
+# The image CDN rejects requests that don't look like they come from the site
+REQUEST_HEADERS = {
+    'Referer': 'https://www.xiaohongshu.com/',
+    'User-Agent': (
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+        '(KHTML, like Gecko) Chrome/124.0 Safari/537.36'
+    ),
+}
+
+_HASH_MASK = (1 << 64) - 1
+
+_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif', 'HEIF': 'heic'}
+
+
+def dhash(image: Image.Image, size: int = 8) -> int:
+    """
+    Difference hash: one bit per horizontally adjacent pixel pair of the
+    image shrunk to (size + 1) x size greyscale, set when brightness drops.
+    """
+    pixels = image.convert('L').resize((size + 1, size), Image.LANCZOS).tobytes()
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+def process_image(data: bytes, thumbnail_size: int = THUMBNAIL_SIZE) -> dict:
+    """
+    Decode downloaded bytes and return their format, size, dHash and a
+    JPEG thumbnail (bytes).
+
+    Raises:
+        OSError: If the bytes are not an image Pillow can read.
+        PIL.Image.DecompressionBombError: If the image has far more pixels
+            than Image.MAX_IMAGE_PIXELS.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        thumb = image.convert('RGB')
+        thumb.thumbnail((thumbnail_size, thumbnail_size))
+        buffer = io.BytesIO()
+        thumb.save(buffer, format='JPEG', quality=85)
+        return {
+            'format': image.format or '',
+            'width': image.width,
+            'height': image.height,
+            'dhash': dhash(image),
+            'thumbnail': buffer.getvalue(),
+        }
+
+
+class ImageStore:
+    """
+    Content-addressed image storage with a SQLite index.
+    Safe to share between threads.
+    """
+
+    def __init__(self, root: str = DEFAULT_IMAGE_DIR, thumbnail_size: int = THUMBNAIL_SIZE):
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.thumbnail_size = thumbnail_size
+        self.downloaded = 0
+        self.reused = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "images.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS images (
+                sha256 TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                thumb_path TEXT NOT NULL,
+                dhash INTEGER NOT NULL,
+                width INTEGER,
+                height INTEGER,
+                size INTEGER NOT NULL
+            );
+
+            -- Every URL an image was downloaded from
+            CREATE TABLE IF NOT EXISTS image_urls (
+                url TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS note_images (
+                note_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                PRIMARY KEY (note_id, position)
+            );
+            CREATE INDEX IF NOT EXISTS idx_note_images_sha256 ON note_images (sha256);
+            """
+        )
+        self._conn.commit()
+
+    def lookup_url(self, url: str) -> Optional[str]:
+        """
+        Content hash of the image already downloaded from ``url``, if any.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT sha256 FROM image_urls WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def get(self, sha256: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256, path, thumb_path, dhash, width, height, size FROM images WHERE sha256 = ?",
+                (sha256,),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ('sha256', 'path', 'thumb_path', 'dhash', 'width', 'height', 'size')
+        image = dict(zip(keys, row))
+        image['dhash'] &= _HASH_MASK
+        return image
+
+    def add(self, url: str, data: bytes) -> str:
+        """
+        Store downloaded bytes (once per unique content) and map ``url`` to
+        them. Returns the content hash.
+
+        Raises:
+            OSError: If the bytes are not a readable image.
+        """
+        sha256 = hashlib.sha256(data).hexdigest()
+        if self.get(sha256) is None:
+            info = process_image(data, self.thumbnail_size)
+            ext = _EXTENSIONS.get(info['format'], 'img')
+            path = os.path.join(self.root, 'full', sha256[:2], f"{sha256}.{ext}")
+            thumb_path = os.path.join(self.root, 'thumbs', f"{sha256}.jpg")
+            _write_file(path, data)
+            _write_file(thumb_path, info['thumbnail'])
+            # SQLite integers are signed 64-bit; store the hash bits as such
+            signed = info['dhash'] - (1 << 64) if info['dhash'] >> 63 else info['dhash']
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO images (sha256, path, thumb_path, dhash, width, height, size) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (sha256, path, thumb_path, signed, info['width'], info['height'], len(data)),
+                )
+                self._conn.commit()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO image_urls (url, sha256, fetched_at) VALUES (?, ?, ?)",
+                (url, sha256, time.time()),
+            )
+            self._conn.commit()
+        return sha256
+
+    def set_note_images(self, note_id: str, hashes: List[str]) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM note_images WHERE note_id = ?", (note_id,))
+            self._conn.executemany(
+                "INSERT INTO note_images (note_id, position, sha256) VALUES (?, ?, ?)",
+                [(note_id, position, sha256) for position, sha256 in enumerate(hashes)],
+            )
+            self._conn.commit()
+
+    def near_duplicates(self, hashes: List[str],
+                        max_distance: int = NEAR_DUPLICATE_DISTANCE) -> List[List[str]]:
+        """
+        Group the given images whose dHashes differ in at most
+        ``max_distance`` bits. Only groups of two or more are returned.
+        """
+        images = [image for image in (self.get(h) for h in dict.fromkeys(hashes)) if image]
+        groups = []
+        assigned = set()
+        for i, image in enumerate(images):
+            if image['sha256'] in assigned:
+                continue
+            group = [image['sha256']]
+            for other in images[i + 1:]:
+                if other['sha256'] not in assigned and hamming(image['dhash'], other['dhash']) <= max_distance:
+                    group.append(other['sha256'])
+            if len(group) > 1:
+                assigned.update(group)
+                groups.append(group)
+        return groups
+
+    def duplicate_notes(self, hashes_by_note: Dict[str, List[str]],
+                        max_distance: int = NEAR_DUPLICATE_DISTANCE) -> Dict[str, Optional[str]]:
+        """
+        For each note, in the given order, the first earlier note that shares
+        an identical or near-identical image with it (None if there is none),
+        so reposts with re-encoded or lightly edited photos can be told apart.
+        """
+        unique = list(dict.fromkeys(h for hashes in hashes_by_note.values() for h in hashes))
+        group_of = {h: h for h in unique}
+        for group in self.near_duplicates(unique, max_distance):
+            for h in group:
+                group_of[h] = group[0]
+
+        owner = {}
+        duplicate_of = {}
+        for note_id, hashes in hashes_by_note.items():
+            groups = [group_of[h] for h in hashes]
+            duplicate_of[note_id] = next((owner[g] for g in groups if g in owner), None)
+            for group in groups:
+                owner.setdefault(group, note_id)
+        return duplicate_of
+
+    async def download(self, images_by_note: Dict[str, List[str]],
+                       concurrency: int = IMAGE_CONCURRENCY) -> Dict[str, List[str]]:
+        """
+        Download the images of each note, skipping URLs already in the index.
+
+        Args:
+            images_by_note: Image URLs per note id, cover first.
+
+        Returns:
+            Content hashes per note id, in the same order; images that
+            failed to download are left out.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        loop = asyncio.get_running_loop()
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        timeout = aiohttp.ClientTimeout(total=60)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         headers=REQUEST_HEADERS) as session:
+            async def fetch_one(url: str) -> Optional[str]:
+                sha256 = self.lookup_url(url)
+                if sha256 is not None:
+                    self.reused += 1
+                    return sha256
+                try:
+                    async with semaphore:
+                        async with session.get(url) as response:
+                            response.raise_for_status()
+                            data = await response.read()
+                    # Decoding, hashing and thumbnailing are CPU work; Pillow
+                    # releases the GIL for most of it
+                    sha256 = await loop.run_in_executor(None, self.add, url, data)
+                except (aiohttp.ClientError, asyncio.TimeoutError, OSError, Image.DecompressionBombError):
+                    return None
+                self.downloaded += 1
+                return sha256
+
+            # Each URL is fetched once even if several notes share it
+            urls = list(dict.fromkeys(url for urls in images_by_note.values() for url in urls if url))
+            results = dict(zip(urls, await asyncio.gather(*[fetch_one(url) for url in urls])))
+
+        hashes_by_note = {}
+        for note_id, note_urls in images_by_note.items():
+            hashes = [results[url] for url in dict.fromkeys(note_urls) if url and results.get(url)]
+            if hashes:
+                self.set_note_images(note_id, hashes)
+            hashes_by_note[note_id] = hashes
+        return hashes_by_note
+
+
+def _write_file(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+_image_store = None
+_image_store_lock = threading.Lock()
+
+
+def get_image_store() -> ImageStore:
+    """
+    Return the shared image store, opening it on first use.
+    """
+    global _image_store
+    with _image_store_lock:
+        if _image_store is None:
+            _image_store = ImageStore(os.getenv('REDNOTE_IMAGE_DIR', DEFAULT_IMAGE_DIR))
+        return _image_store
@@ -0,0 +1,116 @@
+"""
+Persistent LLM response cache.
+
+SQLiteLLMCache plugs into LangChain's cache hook (the ``cache`` argument of
+ChatOpenAI / ChatGoogleGenerativeAI). LangChain hands it the serialized
+message list as the prompt and a string describing the model (provider type,
+model name, temperature, ...) as ``llm_string``, so a byte-identical request
+to the same model returns the stored generations instead of calling the API.
+
+Configuration (environment variables):
+    LLM_CACHE           set to "off" to bypass the cache
+    LLM_CACHE_DIR       cache directory (default: output/cache)
+    LLM_CACHE_TTL       entry lifetime in seconds (default: 604800)
+    LLM_CACHE_MAX_MB    size cap; least recently used entries are evicted first (default: 100)
+"""
+
+import hashlib
+import os
+import threading
+from typing import Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+from src.cache import TTLStore
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "output", "cache")
+
+# Separates serialized generations inside one stored value
+_SEPARATOR = '\x1e'
+
+
+class SQLiteLLMCache(BaseCache):
+    """
+    LangChain cache backed by SQLite, with a TTL, LRU size eviction and hit counters.
+    Safe to share between threads.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, ttl: float = 7 * 24 * 60 * 60,
+                 max_bytes: int = 100 * 1024 * 1024):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "llm.db")
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._store = TTLStore(self.path, 'responses', max_bytes, body_type='TEXT')
+
+    @property
+    def max_bytes(self) -> int:
+        return self._store.max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value: int) -> None:
+        self._store.max_bytes = value
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode('utf-8')).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        body = self._store.get(key)
+        if body is not None:
+            try:
+                generations = [loads(part) for part in body.split(_SEPARATOR)]
+            except Exception:
+                # Corrupt, or written by an incompatible LangChain version:
+                # drop the entry and treat it as a miss
+                self._store.delete(key)
+            else:
+                self.hits += 1
+                return generations
+        self.misses += 1
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        body = _SEPARATOR.join(dumps(generation) for generation in return_val)
+        self._store.put(self._key(prompt, llm_string), body, len(body.encode('utf-8')), self.ttl)
+
+    def clear(self, **kwargs) -> None:
+        self._store.clear()
+
+    def stats(self) -> dict:
+        """
+        Hit/miss counters, hit rate and the number of stored responses.
+        """
+        entries, _ = self._store.totals()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries,
+        }
+
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[SQLiteLLMCache]:
+    """
+    Return the shared LLM cache, or None when LLM_CACHE=off.
+    """
+    global _llm_cache
+    if os.getenv('LLM_CACHE', 'on').lower() in ('off', '0', 'false'):
+        return None
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = SQLiteLLMCache(
+                cache_dir=os.getenv('LLM_CACHE_DIR', DEFAULT_CACHE_DIR),
+                ttl=float(os.getenv('LLM_CACHE_TTL', 7 * 24 * 60 * 60)),
+                max_bytes=int(float(os.getenv('LLM_CACHE_MAX_MB', 100)) * 1024 * 1024),
+            )
+        return _llm_cache
@@ -0,0 +1,67 @@
+"""
+LLM call tracing.
+
+TracingCallbackHandler is a LangChain callback handler (attached to the LLM
+with ``callbacks=[...]``) that records every call as an 'llm' span in the
+active tracer, with its latency and token usage. Calls made while tracing
+is disabled are not recorded.
+"""
+
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.tracing import get_tracer
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback that records every LLM call as an 'llm' span with its
+    latency and token usage.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._starts = {}
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+        self._starts[run_id] = time.perf_counter()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        self._starts[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        start = self._starts.pop(run_id, None)
+        tracer = get_tracer()
+        if tracer is None or start is None:
+            return
+        prompt_tokens, completion_tokens = _token_usage(response)
+        tracer.add_span('llm', 'llm', start, time.perf_counter(),
+                        prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        tracer.count('llm.calls')
+        tracer.count('llm.prompt_tokens', prompt_tokens)
+        tracer.count('llm.completion_tokens', completion_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        start = self._starts.pop(run_id, None)
+        tracer = get_tracer()
+        if tracer is not None and start is not None:
+            tracer.add_span('llm', 'llm', start, time.perf_counter(), error=str(error))
+            tracer.count('llm.errors')
+
+
+def _token_usage(response) -> tuple:
+    """
+    (prompt, completion) tokens of an LLMResult: OpenAI reports them in
+    llm_output, Gemini in each message's usage_metadata.
+    """
+    usage = (response.llm_output or {}).get('token_usage') or {}
+    if usage:
+        return usage.get('prompt_tokens', 0) or 0, usage.get('completion_tokens', 0) or 0
+    prompt = completion = 0
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, 'message', None), 'usage_metadata', None) or {}
+            prompt += metadata.get('input_tokens', 0) or 0
+            completion += metadata.get('output_tokens', 0) or 0
+    return prompt, completion
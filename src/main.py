@@ -4,25 +4,52 @@ Orchestrates the CrewAI workflow to scrape, analyze, and create Rednote content.
 
 Note: Import warnings may appear until dependencies are installed via:
     pip install -r requirements.txt
+
+CrewAI, the LLM provider and the scraper stack take seconds to import, so
+they are imported where they are first needed: only the configured
+provider's package, CrewAI once a stage actually has to run, and the
+scraper when the Trend Scout calls its tool. A run restored entirely from
+checkpoints loads none of them. ``--startup-time`` reports what each of
+these costs in a fresh interpreter.
 """
 
+import argparse
+import json
 import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv  
-from crewai import Crew, Process 
-from langchain_openai import ChatOpenAI  
-from langchain_google_genai import ChatGoogleGenerativeAI 
 
-from src.agents import create_trend_scout, create_strategist, create_creator
-from src.tasks import create_scraping_task, create_analysis_task, create_content_creation_task
+from src.checkpoint import STAGES, CheckpointError, CheckpointStore, task_output_text
+from src.tracing import enable as enable_tracing, get_tracer, span
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Where results and traces go unless REDNOTE_OUTPUT_DIR says otherwise
+DEFAULT_OUTPUT_DIR = os.path.join(ROOT, "output")
 
+# Package imported by get_llm() for each LLM_PROVIDER
+PROVIDER_MODULES = {'openai': 'langchain_openai', 'gemini': 'langchain_google_genai'}
 
-def get_llm():
+
+def get_llm(use_cache: bool = True):
     """
     Initialize and return the appropriate LLM based on environment configuration.
+    Responses are served from the persistent LLM cache unless use_cache is
+    False or LLM_CACHE=off. While tracing is on, every call is recorded.
     """
+    from src.llm_cache import get_llm_cache
+    from src.llm_tracing import TracingCallbackHandler
+
     load_dotenv()
     
     provider = os.getenv('LLM_PROVIDER', 'openai').lower()
+    cache = get_llm_cache() if use_cache else None
+    callbacks = [TracingCallbackHandler()] if get_tracer() is not None else None
     
     if provider == 'gemini':
         api_key = os.getenv('GEMINI_API_KEY') or os.getenv('GOOGLE_API_KEY')
@@ -33,9 +60,12 @@ def get_llm():
             )
         # Set environment variable for langchain-google-genai
         os.environ['GOOGLE_API_KEY'] = api_key
+        from langchain_google_genai import ChatGoogleGenerativeAI
         return ChatGoogleGenerativeAI(
             model="gemini-pro",
-            temperature=0.7
+            temperature=0.7,
+            cache=cache,
+            callbacks=callbacks
         )
     else:  # Default to OpenAI
         api_key = os.getenv('OPENAI_API_KEY')
@@ -44,92 +74,481 @@ def get_llm():
                 "OPENAI_API_KEY not found in .env file. "
                 "Please set OPENAI_API_KEY in your .env file."
             )
+        from langchain_openai import ChatOpenAI
         return ChatOpenAI(
             model="gpt-4o",
             temperature=0.7,
-            api_key=api_key
+            api_key=api_key,
+            cache=cache,
+            callbacks=callbacks
         )
 
 
-def main():
+class LazyLLM:
+    """
+    Creates the LLM with get_llm() the first time a topic needs it and
+    shares it from then on, so a run restored entirely from checkpoints
+    never imports a provider. Safe to share between threads.
+    """
+
+    def __init__(self, use_cache: bool = True):
+        self.use_cache = use_cache
+        self.llm = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self.llm is None:
+                self.llm = get_llm(self.use_cache)
+            return self.llm
+
+
+def result_path(topic: str) -> str:
+    """
+    Path of a topic's result file, output/result_<topic>.txt
+    (under REDNOTE_OUTPUT_DIR when set).
+    """
+    output_dir = os.getenv('REDNOTE_OUTPUT_DIR', DEFAULT_OUTPUT_DIR)
+    return os.path.join(output_dir, f"result_{topic.replace(' ', '_')}.txt")
+
+
+def save_result(topic: str, result) -> str:
+    """
+    Write a topic's final crew output to output/result_<topic>.txt and return the path.
+    """
+    result_file = result_path(topic)
+    os.makedirs(os.path.dirname(result_file), exist_ok=True)
+
+    with open(result_file, 'w', encoding='utf-8') as f:
+        f.write(f"Topic: {topic}\n")
+        f.write("=" * 60 + "\n\n")
+        f.write(str(result))
+
+    return result_file
+
+
+def run_crew(topic: str, llm, checkpoints: CheckpointStore, inputs: dict, stages: list,
+             cached: dict, verbose: bool = True, max_posts: int = 5, max_comments: int = 3,
+             harvest_comments: int = 0, download_images: bool = False):
+    """
+    Run the given stages as one sequential crew, checkpointing each task's
+    output as it completes, and return the crew's result. ``cached`` holds
+    the restored outputs of the stages before them.
+    """
+    from crewai import Crew, Process
+    from src.agents import create_trend_scout, create_strategist, create_creator
+    from src.tasks import create_scraping_task, create_analysis_task, create_content_creation_task
+
+    # Each stage is timed from the end of the previous one to its own
+    # task callback; the crew runs its tasks one after another
+    stage_spans = {}
+
+    def start_stage(stage):
+        stage_spans[stage] = span(f"task.{stage}", 'task').begin()
+
+    def checkpoint_callback(stage):
+        def callback(output):
+            checkpoints.save(topic, inputs, stage, task_output_text(output))
+            stage_spans.pop(stage).finish()
+            following = stages.index(stage) + 1
+            if following < len(stages):
+                start_stage(stages[following])
+        return callback
+
+    # Create agents and tasks for the stages that still need to run
+    if verbose:
+        print("Creating agents and tasks...")
+    agents = []
+    tasks = []
+    if 'scrape' in stages:
+        trend_scout = create_trend_scout(llm)
+        agents.append(trend_scout)
+        tasks.append(create_scraping_task(trend_scout, topic, max_posts, max_comments,
+                                          harvest_comments, download_images))
+    if 'analyze' in stages:
+        strategist = create_strategist(llm)
+        agents.append(strategist)
+        tasks.append(create_analysis_task(strategist, topic, cached.get('scrape')))
+    if 'create' in stages:
+        creator = create_creator(llm)
+        agents.append(creator)
+        tasks.append(create_content_creation_task(creator, topic, cached.get('analyze')))
+
+    # Set up task dependencies and checkpointing
+    for stage, task in zip(stages, tasks):
+        task.callback = checkpoint_callback(stage)
+    for previous, task in zip(tasks, tasks[1:]):
+        task.context = [previous]
+
+    # Create crew
+    if verbose:
+        print("Assembling crew...\n")
+    crew = Crew(
+        agents=agents,
+        tasks=tasks,
+        process=Process.sequential,
+        verbose=verbose
+    )
+
+    # Execute crew
+    if verbose:
+        print("=" * 60)
+        print("Starting crew execution...")
+        print("=" * 60)
+        print()
+
+    with span('crew', 'crew', topic=topic):
+        start_stage(stages[0])
+        try:
+            result = crew.kickoff()
+        except Exception as e:
+            for stage_span in stage_spans.values():
+                stage_span.finish(e)
+            raise
+    return result
+
+
+def run_topic(topic: str, llm, max_posts: int = 5, max_comments: int = 3, verbose: bool = True,
+              resume: bool = False, from_stage: str = None, harvest_comments: int = 0,
+              download_images: bool = False, variations: int = 0):
+    """
+    Build the agents, tasks and crew for one topic, run it and save the result.
+    ``llm`` may be a LazyLLM, which is only resolved if a stage has to run.
+    With ``variations`` the create stage writes that many post variations
+    as parallel, streamed LLM requests (src.variations) instead of running
+    the Creator agent.
+
+    Every task's output is checkpointed as soon as it completes. With
+    ``resume`` the run starts at the first stage without a checkpoint; with
+    ``from_stage`` it re-runs that stage and everything after it, reusing
+    the checkpoints of the earlier stages.
+
+    Returns (result, result_file).
+
+    Raises:
+        CheckpointError: If an earlier stage to be reused has no checkpoint.
+    """
+    checkpoints = CheckpointStore()
+    inputs = {'max_posts': max_posts, 'max_comments': max_comments}
+    if harvest_comments:
+        inputs['harvest_comments'] = harvest_comments
+    if download_images:
+        inputs['download_images'] = True
+    # Variations only shape the create stage, so a different count reuses
+    # the scrape and analysis checkpoints
+    stage_inputs = {'create': dict(inputs, variations=variations)} if variations else {}
+    create_inputs = stage_inputs.get('create', inputs)
+
+    if from_stage:
+        start = STAGES.index(from_stage)
+    elif resume:
+        start = checkpoints.first_missing(topic, inputs, stage_inputs)
+    else:
+        start = 0
+
+    cached = {}
+    for stage in STAGES[:start]:
+        cached[stage] = checkpoints.load(topic, stage_inputs.get(stage, inputs), stage)
+        if cached[stage] is None:
+            raise CheckpointError(
+                f"No checkpoint for stage '{stage}' of topic '{topic}'; "
+                "run without --from-stage first."
+            )
+
+    if start == len(STAGES):
+        if verbose:
+            print("All stages restored from checkpoints.\n")
+        result = cached['create']
+        return result, save_result(topic, result)
+
+    if isinstance(llm, LazyLLM):
+        llm = llm.get()
+
+    # Stages from here on are re-run, so their old checkpoints are stale.
+    # When only the variations are rewritten, the crew's own posts still
+    # match the analysis and are kept.
+    if not (variations and STAGES[start:] == ('create',)):
+        checkpoints.discard(topic, inputs, STAGES[start:])
+    if variations:
+        checkpoints.discard(topic, create_inputs, ['create'])
+    if verbose and start:
+        print(f"Restored {', '.join(STAGES[:start])} from checkpoints.")
+
+    # With variations the create stage runs after the crew, outside it
+    crew_stages = [stage for stage in STAGES[start:] if not (variations and stage == 'create')]
+    if crew_stages:
+        result = run_crew(topic, llm, checkpoints, inputs, crew_stages, cached, verbose,
+                          max_posts, max_comments, harvest_comments, download_images)
+
+    if variations:
+        from src.variations import generate_variations
+
+        if verbose:
+            print(f"\nWriting {variations} post variations in parallel...\n")
+        analysis = cached.get('analyze') or checkpoints.load(topic, inputs, 'analyze')
+        label_prefix = '' if verbose else f"{topic} "
+        with span('task.create', 'task', variations=variations):
+            result = generate_variations(llm, topic, analysis, variations, result_path(topic),
+                                         label_prefix=label_prefix)
+        checkpoints.save(topic, create_inputs, 'create', result)
+    return result, save_result(topic, result)
+
+
+def read_topics(topics: list, topics_file: str = None) -> list:
+    """
+    Collect topics from argv and an optional file (one topic per line,
+    blank lines and lines starting with '#' are skipped). Duplicates are dropped.
+    """
+    collected = [t.strip() for t in topics]
+    if topics_file:
+        with open(topics_file, 'r', encoding='utf-8') as f:
+            collected.extend(line.strip() for line in f if not line.lstrip().startswith('#'))
+    return list(dict.fromkeys(t for t in collected if t))
+
+
+def run_batch(topics: list, llm, parallel: int = 2, max_posts: int = 5,
+              max_comments: int = 3, resume: bool = False, from_stage: str = None,
+              harvest_comments: int = 0, download_images: bool = False,
+              variations: int = 0) -> dict:
+    """
+    Run several topic pipelines concurrently.
+
+    All topics share the same LLM client (or LazyLLM) and the process-wide crawler service,
+    so the browser is launched once per batch. Each topic's result file is
+    written as soon as that topic finishes.
+
+    Returns:
+        A dict mapping each topic to its result file path, or to the exception
+        that stopped it.
+    """
+    outcomes = {}
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+        futures = {
+            pool.submit(run_topic, topic, llm, max_posts, max_comments, False,
+                        resume, from_stage, harvest_comments, download_images, variations): topic
+            for topic in topics
+        }
+        for future in as_completed(futures):
+            topic = futures[future]
+            try:
+                _, result_file = future.result()
+                outcomes[topic] = result_file
+                print(f"[done] {topic} -> {result_file}")
+            except Exception as e:
+                outcomes[topic] = e
+                print(f"[failed] {topic}: {e}")
+    return outcomes
+
+
+def print_llm_cache_stats(llm) -> None:
+    """
+    Print the LLM cache hit rate, if the LLM was created and has a cache.
+    """
+    if isinstance(llm, LazyLLM):
+        llm = llm.llm
+    cache = getattr(llm, 'cache', None)
+    if not hasattr(cache, 'stats'):
+        return
+    stats = cache.stats()
+    print(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses "
+          f"({stats['hit_rate']:.0%} hit rate)")
+
+
+def write_trace(topics: list, fmt: str = 'chrome') -> None:
+    """
+    Print the trace summary and export the trace to output/traces/ (under
+    REDNOTE_OUTPUT_DIR when set), if tracing is on.
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        return
+    trace_dir = os.path.join(os.getenv('REDNOTE_OUTPUT_DIR', DEFAULT_OUTPUT_DIR), "traces")
+    name = topics[0].replace(' ', '_') if len(topics) == 1 else 'batch'
+    trace_file = os.path.join(trace_dir, f"trace_{name}_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    tracer.export(trace_file, fmt)
+
+    print("\n" + "=" * 60)
+    print("TIMINGS")
+    print("=" * 60)
+    print(tracer.summary())
+    print(f"\nTrace saved to: {trace_file}")
+
+
+# Imports timed by --startup-time: each group is imported after the ones
+# before it, in the order a full run first needs them
+_STARTUP_SCRIPT = """
+import importlib, json, sys, time
+results = []
+for label, modules in json.loads(sys.argv[1]):
+    start = time.perf_counter()
+    error = None
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            break
+    results.append([label, time.perf_counter() - start, error])
+print(json.dumps(results))
+"""
+
+
+def measure_startup() -> str:
+    """
+    Time the imports of a run in a fresh interpreter, as on a cold start,
+    and return a report: interpreter start, the CLI itself, the configured
+    LLM provider, CrewAI with the agents and tasks, and the scraper stack.
+    """
+    load_dotenv()
+    provider = os.getenv('LLM_PROVIDER', 'openai').lower()
+    provider_module = PROVIDER_MODULES.get(provider, PROVIDER_MODULES['openai'])
+    groups = [
+        ('cli (src.main)', ['src.main']),
+        (f'llm provider ({provider_module})', [provider_module, 'src.llm_cache', 'src.llm_tracing']),
+        ('crew (crewai, agents, tasks)', ['crewai', 'src.agents', 'src.tasks']),
+        ('scraper (src.scraper)', ['src.scraper']),
+    ]
+
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-c', _STARTUP_SCRIPT, json.dumps(groups)],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        return f"Startup measurement failed:\n{proc.stderr.strip()}"
+
+    results = json.loads(proc.stdout.strip().splitlines()[-1])
+    rows = [('interpreter start', wall - sum(seconds for _, seconds, _ in results), None)]
+    rows += [tuple(result) for result in results]
+    lines = [f"{'Startup step':<44} {'Seconds':>8} {'Cumulative':>11}"]
+    lines.append('-' * len(lines[0]))
+    total = 0.0
+    for label, seconds, error in rows:
+        total += seconds
+        note = f"  (failed: {error})" if error else ''
+        lines.append(f"{label:<44} {seconds:>8.2f} {total:>11.2f}{note}")
+    lines.append('')
+    lines.append("A run restored from checkpoints stops after the CLI; "
+                 "one that skips scraping stops after CrewAI.")
+    return '\n'.join(lines)
+
+
+def int_at_least(minimum: int):
+    """
+    argparse type for integers >= ``minimum``.
+    """
+    def parse(text: str) -> int:
+        try:
+            value = int(text)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid integer: '{text}'")
+        if value < minimum:
+            raise argparse.ArgumentTypeError(f"must be an integer >= {minimum}, got {value}")
+        return value
+    return parse
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Scrape Rednote, analyze viral patterns and create new posts."
+    )
+    parser.add_argument('topics', nargs='*', help="Topics to run (prompted for when omitted)")
+    parser.add_argument('--topics-file', help="File with one topic per line")
+    parser.add_argument('--parallel', type=int_at_least(1), default=2,
+                        help="Number of topics processed at the same time in batch mode (default: 2)")
+    parser.add_argument('--max-posts', type=int_at_least(1), default=5, help="Posts to scrape per topic (default: 5)")
+    parser.add_argument('--max-comments', type=int_at_least(0), default=3,
+                        help="Top comments to keep per post (default: 3)")
+    parser.add_argument('--harvest-comments', type=int_at_least(0), default=0, metavar='N',
+                        help="Page through up to N comments per post into a JSONL file (default: off)")
+    parser.add_argument('--download-images', action='store_true',
+                        help="Download post images with thumbnails to output/images")
+    parser.add_argument('--variations', type=int_at_least(0), default=0, metavar='N',
+                        help="Write N post variations as parallel, streamed LLM requests instead of "
+                             "one Creator completion (default: off)")
+    parser.add_argument('--resume', action='store_true',
+                        help="Skip stages that already have a checkpoint from an earlier run")
+    parser.add_argument('--from-stage', choices=STAGES,
+                        help="Re-run this stage and the ones after it, reusing earlier checkpoints")
+    parser.add_argument('--no-llm-cache', action='store_true',
+                        help="Always call the LLM instead of reusing cached responses")
+    parser.add_argument('--trace', action='store_true',
+                        help="Time every stage and print a summary; the trace is saved to output/traces")
+    parser.add_argument('--trace-format', choices=('chrome', 'json'), default='chrome',
+                        help="Trace file format: Chrome trace events or plain JSON spans (default: chrome)")
+    parser.add_argument('--startup-time', action='store_true',
+                        help="Measure the cold-start import cost of each component and exit")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """
     Main execution function.
     """
+    args = parse_args(argv)
+
+    if args.startup_time:
+        print(measure_startup())
+        return
+
     print("=" * 60)
     print("Rednote Virality Agents - Content Creation System")
     print("=" * 60)
     print()
-    
+
     # Load environment variables
     load_dotenv()
-    
-    # Get user input
-    topic = input("Enter the topic you want to analyze and create content for: ").strip()
-    
-    if not topic:
-        print("Error: Topic cannot be empty.")
-        return
-    
-    print(f"\nStarting analysis for topic: '{topic}'")
-    print("This may take a few minutes...\n")
-    
+
+    topics = read_topics(args.topics, args.topics_file)
+    if not topics:
+        # Get user input
+        topic = input("Enter the topic you want to analyze and create content for: ").strip()
+        if not topic:
+            print("Error: Topic cannot be empty.")
+            return
+        topics = [topic]
+
+    if args.trace:
+        enable_tracing()
+
     try:
-        # Initialize LLM
-        llm = get_llm()
+        # The LLM is created when the first stage that needs it runs
+        llm = LazyLLM(use_cache=not args.no_llm_cache)
         print(f"Using LLM provider: {os.getenv('LLM_PROVIDER', 'openai')}\n")
-        
-        # Create agents
-        print("Creating agents...")
-        trend_scout = create_trend_scout(llm)
-        strategist = create_strategist(llm)
-        creator = create_creator(llm)
-        
-        # Create tasks
-        print("Setting up tasks...")
-        scraping_task = create_scraping_task(trend_scout, topic)
-        analysis_task = create_analysis_task(strategist, topic)
-        content_task = create_content_creation_task(creator, topic)
-        
-        # Set up task dependencies
-        analysis_task.context = [scraping_task]
-        content_task.context = [analysis_task]
-        
-        # Create crew
-        print("Assembling crew...\n")
-        crew = Crew(
-            agents=[trend_scout, strategist, creator],
-            tasks=[scraping_task, analysis_task, content_task],
-            process=Process.sequential,
-            verbose=True
-        )
-        
-        # Execute crew
-        print("=" * 60)
-        print("Starting crew execution...")
-        print("=" * 60)
-        print()
-        
-        result = crew.kickoff()
-        
+
+        if len(topics) > 1:
+            print(f"Running {len(topics)} topics, {args.parallel} at a time...\n")
+            outcomes = run_batch(topics, llm, args.parallel, args.max_posts, args.max_comments,
+                                 args.resume, args.from_stage, args.harvest_comments,
+                                 args.download_images, args.variations)
+            failed = [t for t, outcome in outcomes.items() if isinstance(outcome, Exception)]
+            print(f"\nBatch finished: {len(topics) - len(failed)} succeeded, {len(failed)} failed.")
+            print_llm_cache_stats(llm)
+            return
+
+        topic = topics[0]
+        print(f"\nStarting analysis for topic: '{topic}'")
+        print("This may take a few minutes...\n")
+
+        result, result_file = run_topic(topic, llm, args.max_posts, args.max_comments,
+                                        resume=args.resume, from_stage=args.from_stage,
+                                        harvest_comments=args.harvest_comments,
+                                        download_images=args.download_images,
+                                        variations=args.variations)
+
         # Display results
         print("\n" + "=" * 60)
         print("FINAL RESULTS")
         print("=" * 60)
         print(result)
         print("=" * 60)
-        
-        # Save results to file
-        output_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "output")
-        os.makedirs(output_dir, exist_ok=True)
-        result_file = os.path.join(output_dir, f"result_{topic.replace(' ', '_')}.txt")
-        
-        with open(result_file, 'w', encoding='utf-8') as f:
-            f.write(f"Topic: {topic}\n")
-            f.write("=" * 60 + "\n\n")
-            f.write(str(result))
-        
+
         print(f"\nResults also saved to: {result_file}")
-        
+        print_llm_cache_stats(llm)
+
+    except CheckpointError as e:
+        print(f"\nCheckpoint Error: {e}")
     except ValueError as e:
         print(f"\nConfiguration Error: {e}")
         print("\nPlease ensure:")
@@ -140,6 +559,8 @@ def main():
         print(f"\nError during execution: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        write_trace(topics, args.trace_format)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,144 @@
+"""
+Off-loop HTML parsing.
+
+Extracting a multi-megabyte page (lxml parse, state JSON decode, DOM walk)
+is CPU work that would otherwise stall every other fetch on the crawler's
+event loop. parse() runs an extraction function from src.extraction in a
+worker pool instead: only the HTML goes to the worker and only the
+extracted record comes back, so fetch I/O and parsing overlap. The CPU time
+spent in the extraction functions is added up in parse_stats(), wherever
+they ran.
+
+The default pool is processes, so pages are parsed on every core. Its
+workers are spawned and re-import the main module, so a script driving the
+scraper must keep its entry point under ``if __name__ == '__main__':``. If
+the process pool cannot be created or breaks (e.g. a worker fails to start
+because that guard is missing), parsing falls back to threads and says so
+on stderr. Pages are read from their state script with json.loads and a
+Python walk, which hold the GIL, so a thread pool does not parse pages in
+parallel; it only keeps the event loop responsive while a page is parsed.
+
+Configuration (environment variables):
+    REDNOTE_PARSE_EXECUTOR   "process" (default), "thread", or "inline" to parse on the event loop
+    REDNOTE_PARSE_WORKERS    pool size (default: number of CPUs)
+"""
+
+import asyncio
+import atexit
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+from src.tracing import count, span
+
+
+PARSE_EXECUTORS = ('process', 'thread', 'inline')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+_stats = {'calls': 0, 'cpu_seconds': 0.0}
+
+
+def create_parse_executor(kind: str, workers: int) -> Optional[Executor]:
+    """
+    Build the pool for ``kind`` (one of PARSE_EXECUTORS); None for "inline".
+    """
+    if kind not in PARSE_EXECUTORS:
+        raise ValueError(
+            f"Unknown parse executor '{kind}'. Use one of: {', '.join(PARSE_EXECUTORS)}"
+        )
+    if kind == 'inline':
+        return None
+    if kind == 'thread':
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='rednote-parse')
+    # Spawned rather than forked: the parent runs the crawler loop thread,
+    # which a forked child would inherit in an undefined state
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def get_parse_executor() -> Optional[Executor]:
+    """
+    Return the process-wide parse pool, creating it on first use, or None
+    when parsing runs inline.
+    """
+    global _executor
+    kind = os.getenv('REDNOTE_PARSE_EXECUTOR', 'process').lower()
+    if kind == 'inline':
+        return None
+    with _executor_lock:
+        if _executor is None:
+            workers = int(os.getenv('REDNOTE_PARSE_WORKERS', 0)) or os.cpu_count() or 1
+            try:
+                _executor = create_parse_executor(kind, workers)
+            except (OSError, NotImplementedError) as e:
+                # Platforms without working process semaphores can't run a process pool
+                if kind != 'process':
+                    raise
+                _warn_fallback(e)
+                _executor = create_parse_executor('thread', workers)
+            atexit.register(_executor.shutdown, wait=False, cancel_futures=True)
+        return _executor
+
+
+def _warn_fallback(error: Exception) -> None:
+    count('parse.pool_fallbacks')
+    print(f"[parse] process pool unavailable ({error}); parsing in threads instead", file=sys.stderr)
+
+
+def _fall_back_to_threads(broken: Executor, error: Exception) -> Executor:
+    """
+    Replace a broken process pool with a thread pool of the same size.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            workers = int(os.getenv('REDNOTE_PARSE_WORKERS', 0)) or os.cpu_count() or 1
+            _executor = create_parse_executor('thread', workers)
+            atexit.register(_executor.shutdown, wait=False, cancel_futures=True)
+            broken.shutdown(wait=False, cancel_futures=True)
+            _warn_fallback(error)
+        return _executor
+
+
+def _timed_call(fn: Callable, html, *args):
+    # Thread CPU time, so concurrent parses in a thread pool aren't counted twice
+    start = time.thread_time()
+    result = fn(html, *args)
+    return result, time.thread_time() - start
+
+
+async def parse(fn: Callable, html, *args):
+    """
+    Run ``fn(html, *args)`` in the parse pool and await its result.
+    ``fn`` must be a module-level function so a process pool can pickle it.
+    """
+    executor = get_parse_executor()
+    with span(f"parse.{fn.__name__}", 'parse') as parse_span:
+        if executor is None:
+            result, cpu_seconds = _timed_call(fn, html, *args)
+        else:
+            loop = asyncio.get_running_loop()
+            try:
+                result, cpu_seconds = await loop.run_in_executor(executor, _timed_call, fn, html, *args)
+            except BrokenProcessPool as e:
+                executor = _fall_back_to_threads(executor, e)
+                result, cpu_seconds = await loop.run_in_executor(executor, _timed_call, fn, html, *args)
+        parse_span.set(bytes=len(html or ''), cpu_seconds=round(cpu_seconds, 6))
+    _stats['calls'] += 1
+    _stats['cpu_seconds'] += cpu_seconds
+    count('parse.calls')
+    count('parse.cpu_seconds', cpu_seconds)
+    return result
+
+
+def parse_stats() -> dict:
+    """
+    Number of parse() calls and the CPU seconds their extraction took.
+    """
+    return dict(_stats)
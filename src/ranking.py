@@ -0,0 +1,61 @@
+"""
+Engagement ranking of search result cards.
+
+The search page yields hundreds of candidate posts with their like, collect
+and comment counts. Only the top K by engagement score get their detail page
+fetched, selected with a bounded min-heap so the candidate list is never
+sorted in full.
+"""
+
+import heapq
+import math
+import time
+from typing import Callable, Iterable, List, Optional
+
+
+# Weights per interaction: a collect or comment signals more intent than a like.
+LIKE_WEIGHT = 1.0
+COLLECT_WEIGHT = 2.0
+COMMENT_WEIGHT = 3.0
+
+# Engagement halves for every this many days since publication.
+RECENCY_HALF_LIFE_DAYS = 30.0
+
+
+def engagement_score(card: dict, now: Optional[float] = None,
+                     half_life_days: float = RECENCY_HALF_LIFE_DAYS) -> float:
+    """
+    Score a card by weighted engagement, log-scaled, decayed by age when the
+    publish time ('published_at', ms since epoch) is known.
+    """
+    raw = (
+        LIKE_WEIGHT * card.get('likes', 0)
+        + COLLECT_WEIGHT * card.get('collects', 0)
+        + COMMENT_WEIGHT * card.get('comment_count', 0)
+    )
+    score = math.log1p(max(0.0, raw))
+    published_at = card.get('published_at') or 0
+    if published_at and half_life_days:
+        now = time.time() if now is None else now
+        age_days = max(0.0, now - published_at / 1000) / 86400
+        score *= 0.5 ** (age_days / half_life_days)
+    return score
+
+
+def top_k(cards: Iterable[dict], k: int,
+          score_fn: Callable[[dict], float] = engagement_score) -> List[dict]:
+    """
+    Return the ``k`` highest-scoring cards, best first, in one pass over
+    ``cards`` and O(k) memory. Ties keep the order the cards arrived in.
+    """
+    if k <= 0:
+        return []
+    heap = []
+    for seq, card in enumerate(cards):
+        # -seq makes the earlier card the larger entry on equal scores
+        entry = (score_fn(card), -seq, card)
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+    return [card for _, _, card in sorted(heap, key=lambda e: e[:2], reverse=True)]
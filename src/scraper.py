@@ -0,0 +1,472 @@
+"""
+Rednote scraping pipeline behind RednoteScraperTool.
+
+scrape_rednote() searches a topic, ranks the search results by engagement,
+fetches the top posts' pages (or takes them from the post store), optionally
+downloads their images and harvests their comments, and writes the CSV the
+Strategist reads. It pulls in the whole scraper stack (browser driver,
+pandas, lxml, Pillow), so src.tools imports it only when the tool runs.
+
+Configuration (environment variables):
+    REDNOTE_OUTPUT_DIR   directory for the CSV and harvested comments (default: output)
+"""
+
+import asyncio
+import os
+from collections import namedtuple
+from typing import Optional
+
+import pandas as pd
+
+from src.analytics import build_comment_brief, build_stats_brief
+from src.cache import POST_TTL, SEARCH_TTL, get_page_cache
+from src.comments import CommentSink, harvest_comments
+from src.crawler import CrawlerService
+from src.dedup import (
+    NearDuplicateIndex, PersistentNearDuplicateIndex, dedup_texts, get_post_index, minhash, normalize
+)
+from src.extraction import BASE_URL, FEED_STATE_ID, extract_post, extract_search_cards, note_id_from_url
+from src.images import get_image_store
+from src.parsing import parse
+from src.ranking import top_k
+from src.store import POST_MAX_AGE, PostStore, cap_comments, get_post_store
+from src.throttle import BlockedError, get_fetch_scheduler
+from src.tracing import span
+
+
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "output")
+
+# Scrolling stops early once the search page has stopped growing, so this is
+# only a safety net for pages that keep loading forever.
+MAX_SCROLL_ROUNDS = 60
+
+# How long to wait for new results after each scroll before giving up (ms).
+SCROLL_SETTLE_MS = 2000
+
+
+def build_scroll_js(target: int) -> str:
+    """
+    Build the search-page scroll script.
+
+    Scrolls until at least ``target`` distinct /explore/ links have been seen,
+    or until a scroll adds no new links. The search feed is virtualised, so every
+    link seen while scrolling is copied into a hidden container at the end of the
+    body to make sure it is still present in the returned HTML, and the live
+    feed store is written to a JSON script for extract_search_feeds().
+    """
+    return f"""
+    const target = {target};
+    const seen = new Map();
+    const collect = () => {{
+        document.querySelectorAll('a[href*="/explore/"]').forEach(a => {{
+            const href = a.getAttribute('href');
+            const key = href.split('?')[0];
+            if (!seen.has(key)) seen.set(key, href);
+        }});
+        return seen.size;
+    }};
+
+    let count = collect();
+    for (let round = 0; round < {MAX_SCROLL_ROUNDS} && count < target; round++) {{
+        window.scrollTo(0, document.body.scrollHeight);
+        let grown = false;
+        for (let waited = 0; waited < {SCROLL_SETTLE_MS}; waited += 200) {{
+            await new Promise(resolve => setTimeout(resolve, 200));
+            if (collect() > count) {{ grown = true; break; }}
+        }}
+        if (!grown) break;
+        count = collect();
+    }}
+
+    const holder = document.createElement('div');
+    holder.id = 'rednote-collected-links';
+    holder.style.display = 'none';
+    seen.forEach(href => {{
+        const a = document.createElement('a');
+        a.setAttribute('href', href);
+        holder.appendChild(a);
+    }});
+    document.body.appendChild(holder);
+
+    // Copy the live feed store (cards loaded while scrolling included) into
+    // a JSON script so the note ids and engagement counts can be read directly.
+    try {{
+        const search = window.__INITIAL_STATE__ && window.__INITIAL_STATE__.search;
+        let feeds = search && search.feeds;
+        if (feeds && !Array.isArray(feeds)) feeds = feeds._rawValue || feeds._value || feeds.value;
+        if (Array.isArray(feeds)) {{
+            const script = document.createElement('script');
+            script.id = '{FEED_STATE_ID}';
+            script.type = 'application/json';
+            script.textContent = JSON.stringify(feeds).replace(/</g, '\\\\u003c');
+            document.body.appendChild(script);
+        }}
+    }} catch (e) {{}}
+    return document.body.innerHTML;
+    """
+
+
+# Candidates ranked per requested post, leaving room to skip reposts
+CANDIDATE_OVERSAMPLE = 3
+
+# Bounds on the number of search results loaded by scrolling: small runs
+# still rank a handful of cards, large ones stop scrolling at the cap
+MIN_CANDIDATES = 20
+MAX_CANDIDATES = 200
+
+# Titles shorter than this (after normalisation) are too generic to call duplicates
+MIN_DEDUP_TITLE_CHARS = 6
+
+# Outcome of a (possibly cached) page fetch
+PageResult = namedtuple('PageResult', ['success', 'html', 'error_message'])
+
+
+def candidate_count(max_posts: int, max_candidates: Optional[int] = None) -> int:
+    """
+    Number of search results to load and rank for ``max_posts`` posts.
+
+    Defaults to ``max_posts * CANDIDATE_OVERSAMPLE``, at least MIN_CANDIDATES;
+    either way it is capped at MAX_CANDIDATES but never below ``max_posts``.
+    """
+    if max_candidates is None:
+        max_candidates = max(MIN_CANDIDATES, max_posts * CANDIDATE_OVERSAMPLE)
+    return max(max_posts, min(max_candidates, MAX_CANDIDATES))
+
+
+def select_distinct_posts(cards: list, limit: int, index: PersistentNearDuplicateIndex) -> list:
+    """
+    Take up to ``limit`` cards in order, skipping near-duplicate titles of a
+    card already taken or of a different note in the persistent index.
+    Taken cards are added to the index.
+    """
+    taken = []
+    run_index = NearDuplicateIndex(index.threshold)
+    signatures = {}
+    for card in cards:
+        if len(taken) >= limit:
+            break
+        signature = minhash(card['title']) if len(normalize(card['title'])) >= MIN_DEDUP_TITLE_CHARS else None
+        if signature is not None:
+            if run_index.query(signature):
+                continue
+            if any(note_id != card['note_id'] for note_id in index.query(signature)):
+                continue
+            run_index.add(card['note_id'], signature)
+            signatures[card['note_id']] = signature
+        taken.append(card)
+
+    for note_id, signature in signatures.items():
+        if note_id:
+            index.add(note_id, signature)
+    return taken
+
+
+def drop_duplicate_comments(rows: list, seen: list = ()) -> None:
+    """
+    Remove exact and near-duplicate comments across all rows, keeping the
+    first occurrence, so copy-paste comments reach the LLM only once.
+    Comments of the ``seen`` rows count as earlier occurrences but those
+    rows are not changed.
+    """
+    def split(row):
+        if not row['comments'] or row['comments'] in ('No comments found', 'Content unavailable'):
+            return []
+        return row['comments'].split(' | ')
+
+    earlier = [comment for row in seen for comment in split(row)]
+    comments_by_row = [split(row) for row in rows]
+    keep = dedup_texts(earlier + [comment for comments in comments_by_row for comment in comments])
+    keep = iter(keep[len(earlier):])
+    for row, comments in zip(rows, comments_by_row):
+        if comments:
+            kept = [comment for comment in comments if next(keep)]
+            row['comments'] = ' | '.join(kept) if kept else 'No comments found'
+
+
+def is_unavailable(row: dict) -> bool:
+    """
+    Whether a row is a placeholder produced by unavailable_row().
+    """
+    return row['comments'] == 'Content unavailable'
+
+
+def unavailable_row(post_number: int, url: str, title: str = 'Content unavailable') -> dict:
+    """
+    Placeholder row for a post whose page could not be scraped.
+    """
+    return {
+        'post_number': post_number,
+        'url': url,
+        'note_id': note_id_from_url(url),
+        'title': title,
+        'image_url': 'Content unavailable',
+        'likes': 0,
+        'collects': 0,
+        'comment_count': 0,
+        'shares': 0,
+        'comments': 'Content unavailable'
+    }
+
+
+async def scrape_rednote(service: CrawlerService, topic: str, max_posts: int = 5,
+                         max_comments: int = 3, max_candidates: Optional[int] = None,
+                         max_concurrency: int = 3, harvest_comments: int = 0,
+                         download_images: bool = False) -> str:
+    """
+    Scrape the top posts for a topic on the crawler service's loop and
+    return the summary handed back to the agent.
+    """
+    # Construct search URL
+    search_url = f"{BASE_URL}/search_result?keyword={topic}"
+
+    # Prepare output directory
+    output_dir = os.getenv('REDNOTE_OUTPUT_DIR', DEFAULT_OUTPUT_DIR)
+    os.makedirs(output_dir, exist_ok=True)
+
+    scraped_data = []
+    failed = []
+
+    try:
+        # JavaScript code to scroll and load content
+        max_candidates = candidate_count(max_posts, max_candidates)
+        js_code = build_scroll_js(max_candidates)
+
+        # Crawl search results page
+        with span('search', 'scrape') as search_span:
+            result = await fetch_page(
+                service, search_url, SEARCH_TTL,
+                js_code=js_code,
+                wait_for="body"
+            )
+
+            if not result.success:
+                return f"Failed to crawl search page: {result.error_message}"
+
+            # Rank the candidate cards by engagement and keep the top posts,
+            # skipping reposts of posts already picked or seen in earlier runs
+            candidates = await parse(extract_search_cards, result.html, max_candidates)
+            ranked = top_k(candidates, max_posts * CANDIDATE_OVERSAMPLE)
+            selected = select_distinct_posts(ranked, max_posts, get_post_index())
+            post_urls = [card['url'] for card in selected]
+            search_span.set(candidates=len(candidates), selected=len(post_urls))
+
+        # Posts fetched recently, with at least as many comments as asked
+        # for now, are filled from the store; only new or stale posts get
+        # their detail page fetched.
+        store = get_post_store()
+        stored = store.get_fresh([note_id_from_url(url) for url in post_urls], POST_MAX_AGE, max_comments)
+        to_fetch = [
+            (i, post_url) for i, post_url in enumerate(post_urls, 1)
+            if note_id_from_url(post_url) not in stored
+        ]
+
+        # Scrape individual posts concurrently. The semaphore caps how many
+        # requests are in flight at once; gather() keeps results in post_number order.
+        semaphore = asyncio.Semaphore(max_concurrency)
+        with span('posts', 'scrape', fetched=len(to_fetch), from_store=len(stored)):
+            fetched = await asyncio.gather(*[
+                _scrape_post(service, semaphore, i, post_url, max_comments)
+                for i, post_url in to_fetch
+            ])
+
+        fetched_by_number = {row['post_number']: row for row in fetched}
+        for i, post_url in enumerate(post_urls, 1):
+            if i in fetched_by_number:
+                row = fetched_by_number[i]
+                (failed if is_unavailable(row) else scraped_data).append(row)
+            else:
+                row = dict(stored[note_id_from_url(post_url)], post_number=i, url=post_url)
+                row['comments'] = cap_comments(row['comments'], max_comments)
+                scraped_data.append(row)
+
+        # Copy-paste comments are dropped before the new rows are stored, so
+        # the store, the CSV exported from it and the summary agree. Rows
+        # from the store are already deduplicated and are left as they are.
+        new_rows = [row for row in scraped_data if row['post_number'] in fetched_by_number]
+        reused = [row for row in scraped_data if row['post_number'] not in fetched_by_number]
+        drop_duplicate_comments(new_rows, seen=reused)
+        store.upsert(new_rows, max_comments)
+
+        # Posts that could not be scraped are left out of the ranking, so the
+        # CSV neither has gaps nor serves a stale stored copy as current data
+        for i, row in enumerate(scraped_data, 1):
+            row['post_number'] = i
+        store.set_topic_ranking(topic, [row['note_id'] for row in scraped_data])
+
+        image_summary = ''
+        if download_images:
+            with span('images', 'scrape'):
+                image_summary = await _download_images(store, scraped_data)
+
+        # Page through each post's comment panel, streaming rows to JSONL
+        comments_path = None
+        if harvest_comments:
+            comments_path = os.path.join(output_dir, f"comments_{topic.replace(' ', '_')}.jsonl")
+            with span('comments', 'scrape') as comments_span, CommentSink(comments_path) as sink:
+                await asyncio.gather(*[
+                    _harvest_post_comments(service, semaphore, sink, row, harvest_comments)
+                    for row in scraped_data
+                ])
+                sink.flush()
+                comments_span.set(comments=sink.rows_written)
+
+    except Exception as e:
+        return f"Error during scraping process: {str(e)}"
+
+    # Save to CSV
+    if scraped_data:
+        csv_filename = f"scraped_data_{topic.replace(' ', '_')}.csv"
+        csv_path = os.path.join(output_dir, csv_filename)
+        with span('csv.export', 'scrape'):
+            store.export_csv(topic, csv_path, max_comments)
+
+        # Create summary
+        summary = f"Successfully scraped {len(scraped_data)} posts for topic '{topic}' "
+        summary += f"({len(fetched) - len(failed)} fetched, {len(stored)} from the post store).\n"
+        summary += f"Posts are the top {len(scraped_data)} of {len(candidates)} search results by engagement.\n"
+        if failed:
+            summary += f"{len(failed)} posts could not be scraped and are left out:\n"
+            for item in failed:
+                summary += f"  {item['url']} ({item['title']})\n"
+        summary += f"CSV file saved to: {csv_path}\n\n"
+
+        # Compact stats brief instead of every post's raw text
+        with span('stats.brief', 'scrape'):
+            summary += build_stats_brief(pd.DataFrame(scraped_data)) + "\n\n"
+            summary += image_summary
+            if comments_path:
+                summary += build_comment_brief(comments_path) + "\n"
+                summary += f"Comments saved to: {comments_path}\n\n"
+        summary += "Scraped posts:\n"
+        for item in scraped_data:
+            title = f"{item['title'][:60]}..." if len(item['title']) > 60 else item['title']
+            summary += f"  {item['post_number']}. {title} ({item['likes']} likes, {item['collects']} collects)\n"
+
+        cache = get_page_cache()
+        if cache is not None:
+            stats = cache.stats()
+            summary += f"\nPage cache: {stats['hits']} hits, {stats['misses']} misses\n"
+        scheduler = get_fetch_scheduler()
+        if scheduler.retries or scheduler.blocks:
+            summary += f"Fetch retries: {scheduler.retries}, login walls/captchas: {scheduler.blocks}\n"
+
+        return f"{summary}\n\nCSV file path: {csv_path}"
+    else:
+        return (f"No data scraped for topic '{topic}' ({len(failed)} posts failed). "
+                "Please check your cookies and network connection.")
+
+
+async def fetch_page(service: CrawlerService, url: str, ttl: float,
+                     slot: asyncio.Semaphore = None, **options) -> PageResult:
+    """
+    Crawl a URL, serving it from the page cache when a fresh copy exists.
+    ``slot`` is held while the page is being fetched (see FetchScheduler.fetch).
+    ``options`` are passed to AsyncWebCrawler.arun and are part of the cache key.
+    """
+    with span('fetch', 'crawler', url=url) as fetch_span:
+        cache = get_page_cache()
+        if cache is not None:
+            html = cache.get(url, options)
+            if html is not None:
+                fetch_span.set(cached=True, bytes=len(html))
+                return PageResult(True, html, '')
+
+        try:
+            result = await get_fetch_scheduler().fetch(url, lambda: service.fetch(url, **options), slot)
+        except BlockedError as e:
+            fetch_span.set(blocked=True)
+            return PageResult(False, '', str(e))
+
+        fetch_span.set(cached=False, success=result.success, bytes=len(result.html or ''))
+        if result.success and cache is not None:
+            cache.put(url, result.html, ttl, options)
+        return PageResult(result.success, result.html, result.error_message)
+
+
+async def _scrape_post(service: CrawlerService, semaphore: asyncio.Semaphore, i: int,
+                       post_url: str, max_comments: int = 3) -> dict:
+    """
+    Scrape a single post page and return its row.
+    Errors are turned into a placeholder row so one failed page
+    never cancels the other fetches.
+    """
+    try:
+        # The semaphore is only taken once a rate-limit token is in hand
+        post_result = await fetch_page(
+            service, post_url, POST_TTL, semaphore,
+            wait_for="body"
+        )
+
+        if not post_result.success:
+            return unavailable_row(i, post_url)
+
+        # Parsed in the parse pool, outside the semaphore so the next
+        # fetch can start while this page is being extracted
+        post = await parse(extract_post, post_result.html, max_comments)
+        comments = post['comments']
+
+        return {
+            'post_number': i,
+            'url': post_url,
+            'note_id': post['note_id'] or note_id_from_url(post_url),
+            'title': post['title'],
+            'image_url': post['image_url'],
+            'image_urls': post['image_urls'],
+            'likes': post['likes'],
+            'collects': post['collects'],
+            'comment_count': post['comment_count'],
+            'shares': post['shares'],
+            'comments': ' | '.join(comments) if comments else 'No comments found'
+        }
+
+    except Exception as e:
+        return unavailable_row(i, post_url, title=f'Error: {str(e)}')
+
+
+async def _harvest_post_comments(service: CrawlerService, semaphore: asyncio.Semaphore,
+                                 sink: CommentSink, row: dict, limit: int) -> int:
+    """
+    Harvest one post's comments into the sink. A post that fails part
+    way keeps the comments written so far.
+    """
+    try:
+        with span('comments.post', 'scrape', note_id=row['note_id']) as post_span:
+            written = await harvest_comments(service, sink, row, limit, semaphore)
+            post_span.set(comments=written)
+            return written
+    except Exception:
+        return 0
+
+
+async def _download_images(store: PostStore, rows: list) -> str:
+    """
+    Download the images of the scraped posts, record each post's local
+    cover image and the post it repeats (if any) in the store and return
+    a one-line summary.
+    """
+    images = get_image_store()
+    downloaded, reused = images.downloaded, images.reused
+    images_by_note = {}
+    for row in rows:
+        if not row['note_id'] or is_unavailable(row):
+            continue
+        urls = row.get('image_urls') or [row['image_url']]
+        urls = [url for url in urls if url.startswith(('http://', 'https://'))]
+        if urls:
+            images_by_note[row['note_id']] = urls
+
+    hashes_by_note = await images.download(images_by_note)
+    store.set_image_paths({
+        note_id: images.get(hashes[0])['path']
+        for note_id, hashes in hashes_by_note.items() if hashes
+    })
+    # Rows are in ranking order, so each repost points at the best-ranked original
+    duplicate_of = images.duplicate_notes({note_id: hashes for note_id, hashes in hashes_by_note.items() if hashes})
+    store.set_duplicates(duplicate_of)
+    unique = list(dict.fromkeys(h for hashes in hashes_by_note.values() for h in hashes))
+    reposts = sum(1 for original in duplicate_of.values() if original)
+    return (
+        f"Images: {images.downloaded - downloaded} downloaded, {images.reused - reused} already stored, "
+        f"{len(unique)} unique; {reposts} posts repeat the images of a higher-ranked post "
+        f"(saved under {images.root})\n\n"
+    )
@@ -0,0 +1,416 @@
+"""
+Local job server for topic pipelines.
+
+A long-lived process that accepts topic jobs over HTTP and runs them on a
+pool of worker threads. The workers share one LLM client and the
+process-wide crawler service, so the interpreter start, the imports and the
+browser launch are paid once rather than once per topic. Jobs are kept in a
+SQLite queue: they survive a restart, and jobs left running by a stopped
+server are queued again when it starts.
+
+Queued jobs with the same topic and options are merged into one run when a
+worker picks them up, and every merged job gets that run's result. A topic
+is never run by two workers at once; its queued jobs wait until the running
+one finishes.
+
+Endpoints (JSON in and out):
+    POST /jobs                {"topic": "护肤", "max_posts": 5, ...} -> 202 {"id": ..., "status": "queued"}
+    GET  /jobs                queue counts and the most recent jobs
+    GET  /jobs/<id>           status of one job
+    GET  /jobs/<id>/result    result text and file of a finished job (409 until then)
+
+Besides "topic", a job accepts the run_topic() options max_posts,
+max_comments, harvest_comments, download_images, variations, resume and
+from_stage.
+
+Usage:
+    python -m src.server --port 8700 --workers 3
+    curl -X POST localhost:8700/jobs -d '{"topic": "护肤"}'
+
+Configuration (environment variables):
+    REDNOTE_SERVER_DB        job database (default: output/jobs.db)
+    REDNOTE_SERVER_WORKERS   worker threads (default: 2)
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from src.checkpoint import STAGES
+
+
+DEFAULT_JOB_DB = os.path.join(os.path.dirname(os.path.dirname(__file__)), "output", "jobs.db")
+
+JOB_STATUSES = ('queued', 'running', 'done', 'failed')
+
+# Job options with their defaults and types, as taken by run_topic()
+JOB_OPTIONS = {
+    'max_posts': 5,
+    'max_comments': 3,
+    'harvest_comments': 0,
+    'download_images': False,
+    'variations': 0,
+    'resume': False,
+    'from_stage': None,
+}
+
+# Jobs listed by GET /jobs
+RECENT_JOBS = 50
+
+
+def parse_job(payload: dict) -> Tuple[str, dict]:
+    """
+    Validate a submitted job and return (topic, options) with defaults filled in.
+
+    Raises:
+        ValueError: If the topic is missing or an option is unknown or invalid.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Expected a JSON object")
+    topic = payload.get('topic')
+    if not isinstance(topic, str) or not topic.strip():
+        raise ValueError("'topic' must be a non-empty string")
+
+    unknown = set(payload) - set(JOB_OPTIONS) - {'topic'}
+    if unknown:
+        raise ValueError(f"Unknown option(s): {', '.join(sorted(unknown))}")
+
+    options = dict(JOB_OPTIONS)
+    for name in ('max_posts', 'max_comments', 'harvest_comments', 'variations'):
+        value = payload.get(name, options[name])
+        minimum = 1 if name == 'max_posts' else 0
+        if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+            raise ValueError(f"'{name}' must be an integer >= {minimum}")
+        options[name] = value
+    for name in ('download_images', 'resume'):
+        value = payload.get(name, options[name])
+        if not isinstance(value, bool):
+            raise ValueError(f"'{name}' must be true or false")
+        options[name] = value
+    from_stage = payload.get('from_stage')
+    if from_stage is not None and from_stage not in STAGES:
+        raise ValueError(f"'from_stage' must be one of: {', '.join(STAGES)}")
+    options['from_stage'] = from_stage
+    return topic.strip(), options
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue. Safe to share between threads.
+    """
+
+    def __init__(self, path: str = DEFAULT_JOB_DB):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                topic TEXT NOT NULL,
+                options TEXT NOT NULL,
+                -- topic and options; queued jobs with the same key share a run
+                run_key TEXT NOT NULL,
+                status TEXT NOT NULL,
+                run_id TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                result TEXT,
+                result_file TEXT,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+            CREATE INDEX IF NOT EXISTS idx_jobs_run_id ON jobs (run_id);
+            """
+        )
+        self._conn.commit()
+
+    def requeue_interrupted(self) -> int:
+        """
+        Queue again the jobs a previous server left running. Returns their number.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', run_id = NULL, started_at = NULL "
+                "WHERE status = 'running'"
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def submit(self, topic: str, options: dict) -> str:
+        """
+        Add a job to the queue and return its id.
+        """
+        job_id = uuid.uuid4().hex
+        options_json = json.dumps(options, sort_keys=True, ensure_ascii=False)
+        run_key = json.dumps([topic, options], sort_keys=True, ensure_ascii=False)
+        with self._available:
+            self._conn.execute(
+                "INSERT INTO jobs (id, topic, options, run_key, status, created_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?)",
+                (job_id, topic, options_json, run_key, time.time()),
+            )
+            self._conn.commit()
+            self._available.notify()
+        return job_id
+
+    def claim(self, timeout: float = None) -> Optional[Tuple[str, dict, List[str]]]:
+        """
+        Take the oldest queued job whose topic isn't running, together with
+        every queued job with the same topic and options, and mark them
+        running. Waits up to ``timeout`` seconds for one to become available.
+
+        Returns:
+            (topic, options, job ids), or None on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._available:
+            while True:
+                row = self._conn.execute(
+                    "SELECT id, topic, options, run_key FROM jobs "
+                    "WHERE status = 'queued' AND topic NOT IN "
+                    "(SELECT topic FROM jobs WHERE status = 'running') "
+                    "ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._available.wait(remaining)
+
+            run_id, topic, options, run_key = row
+            ids = [r[0] for r in self._conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' AND run_key = ? ORDER BY created_at",
+                (run_key,),
+            )]
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', run_id = ?, started_at = ? "
+                "WHERE status = 'queued' AND run_key = ?",
+                (run_id, time.time(), run_key),
+            )
+            self._conn.commit()
+        return topic, json.loads(options), ids
+
+    def finish(self, job_ids: List[str], result: str = None, result_file: str = None,
+               error: str = None) -> None:
+        """
+        Record the outcome of a run for all of its jobs: done with a result,
+        or failed with an error.
+        """
+        status = 'failed' if error is not None else 'done'
+        with self._available:
+            self._conn.executemany(
+                "UPDATE jobs SET status = ?, finished_at = ?, result = ?, result_file = ?, error = ? "
+                "WHERE id = ?",
+                [(status, time.time(), result, result_file, error, job_id) for job_id in job_ids],
+            )
+            self._conn.commit()
+            # The topic is free again; its waiting jobs can be claimed
+            self._available.notify_all()
+
+    def wake_all(self) -> None:
+        with self._available:
+            self._available.notify_all()
+
+    def get(self, job_id: str, with_result: bool = False) -> Optional[dict]:
+        columns = ['id', 'topic', 'options', 'status', 'run_id', 'created_at', 'started_at',
+                   'finished_at', 'result_file', 'error']
+        if with_result:
+            columns.append('result')
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(columns)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(columns, row))
+        job['options'] = json.loads(job['options'])
+        job['merged'] = job['run_id'] is not None and job['run_id'] != job['id']
+        return job
+
+    def recent(self, limit: int = RECENT_JOBS) -> List[dict]:
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute(
+                "SELECT id FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            )]
+        return [job for job in (self.get(job_id) for job_id in ids) if job]
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        counts.update(rows)
+        return counts
+
+
+class JobServer:
+    """
+    Runs queued jobs on ``workers`` threads that share one LLM and crawler,
+    and serves the HTTP API.
+    """
+
+    def __init__(self, queue: JobQueue, workers: int = 2, host: str = '127.0.0.1',
+                 port: int = 8700, use_llm_cache: bool = True):
+        # src.main is imported here so that `--help` stays instant
+        from src.main import LazyLLM
+
+        self.queue = queue
+        self.llm = LazyLLM(use_cache=use_llm_cache)
+        self.workers = max(1, workers)
+        self._stop = threading.Event()
+        self._threads = []
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def warm_up(self) -> None:
+        """
+        Create the LLM client and launch the browser before the first job.
+        """
+        try:
+            self.llm.get()
+        except Exception as e:
+            print(f"[server] LLM not created, continuing: {e}")
+        try:
+            from src.crawler import get_crawler_service
+            get_crawler_service().start()
+        except Exception as e:
+            print(f"[server] browser not launched, continuing: {e}")
+
+    def start_workers(self) -> None:
+        requeued = self.queue.requeue_interrupted()
+        if requeued:
+            print(f"[server] re-queued {requeued} interrupted job(s)")
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"rednote-worker-{i + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self) -> None:
+        from src.main import run_topic
+
+        while not self._stop.is_set():
+            claimed = self.queue.claim(timeout=1.0)
+            if claimed is None:
+                continue
+            topic, options, job_ids = claimed
+            merged = f" ({len(job_ids)} jobs merged)" if len(job_ids) > 1 else ''
+            print(f"[server] running '{topic}'{merged}")
+            try:
+                result, result_file = run_topic(topic, self.llm, verbose=False, **options)
+            except Exception as e:
+                traceback.print_exc()
+                self.queue.finish(job_ids, error=f"{type(e).__name__}: {e}")
+                print(f"[server] failed '{topic}': {e}")
+            else:
+                self.queue.finish(job_ids, result=str(result), result_file=result_file)
+                print(f"[server] done '{topic}' -> {result_file}")
+
+    def serve_forever(self) -> None:
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def stop(self) -> None:
+        """
+        Stop serving and let the workers exit after their current job.
+        """
+        self._stop.set()
+        self.queue.wake_all()
+        self._httpd.shutdown()
+
+
+def _make_handler(server: JobServer):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload: dict) -> None:
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if self.path.rstrip('/') != '/jobs':
+                return self._send(404, {'error': 'Not found'})
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                topic, options = parse_job(json.loads(self.rfile.read(length) or b'null'))
+            except ValueError as e:
+                return self._send(400, {'error': str(e)})
+            job_id = server.queue.submit(topic, options)
+            self._send(202, {'id': job_id, 'status': 'queued'})
+
+        def do_GET(self):
+            parts = [part for part in self.path.split('?')[0].split('/') if part]
+            if parts == ['jobs']:
+                return self._send(200, {'counts': server.queue.counts(), 'jobs': server.queue.recent()})
+            if len(parts) == 2 and parts[0] == 'jobs':
+                job = server.queue.get(parts[1])
+                return self._send(200, job) if job else self._send(404, {'error': 'Unknown job'})
+            if len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'result':
+                job = server.queue.get(parts[1], with_result=True)
+                if job is None:
+                    return self._send(404, {'error': 'Unknown job'})
+                if job['status'] != 'done':
+                    job.pop('result')
+                    return self._send(409, job)
+                return self._send(200, job)
+            self._send(404, {'error': 'Not found'})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve topic pipelines from a local job queue.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8700)
+    parser.add_argument('--workers', type=int, default=int(os.getenv('REDNOTE_SERVER_WORKERS', 2)),
+                        help="Topics run at the same time (default: 2)")
+    parser.add_argument('--db', default=os.getenv('REDNOTE_SERVER_DB', DEFAULT_JOB_DB),
+                        help="Job database (default: output/jobs.db)")
+    parser.add_argument('--no-warm', action='store_true',
+                        help="Don't create the LLM and launch the browser until the first job")
+    parser.add_argument('--no-llm-cache', action='store_true',
+                        help="Always call the LLM instead of reusing cached responses")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    server = JobServer(JobQueue(args.db), args.workers, args.host, args.port,
+                       use_llm_cache=not args.no_llm_cache)
+    if not args.no_warm:
+        server.warm_up()
+    server.start_workers()
+    print(f"[server] {server.workers} worker(s), serving at {server.url} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""
+Persistent store of scraped posts.
+
+Posts are kept in a SQLite file keyed by note id, together with the topics
+they were found under and when they were last fetched. The scraper only
+fetches detail pages for posts that are new or stale and fills the rest from
+here; the per-topic CSV is exported from the store. When the image stage
+runs, each post also records the local path of its downloaded cover image
+and, when its images repeat those of a higher-ranked post, that post's id.
+
+Configuration (environment variables):
+    REDNOTE_STORE_PATH        database file (default: output/posts.db)
+    REDNOTE_POST_MAX_AGE      seconds before a stored post is re-fetched (default: 604800)
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from src.analytics import COMMENT_SEPARATOR
+
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "output", "posts.db")
+
+POST_MAX_AGE = int(os.getenv('REDNOTE_POST_MAX_AGE', 7 * 24 * 60 * 60))
+
+# Post fields persisted alongside the note id
+POST_FIELDS = (
+    'url', 'title', 'image_url', 'likes', 'collects', 'comment_count', 'shares', 'comments',
+)
+
+
+# Comment values that are placeholders rather than comments
+NO_COMMENTS = 'No comments found'
+_PLACEHOLDERS = {NO_COMMENTS, 'Content unavailable'}
+
+
+def cap_comments(comments, max_comments: int):
+    """
+    Keep the first ``max_comments`` of a ' | '-joined comments value, as a
+    post stored with a higher comment cap is served to a run with a lower one.
+    """
+    if not isinstance(comments, str) or not comments or comments in _PLACEHOLDERS:
+        return comments
+    kept = comments.split(COMMENT_SEPARATOR)[:max_comments]
+    return COMMENT_SEPARATOR.join(kept) if kept else NO_COMMENTS
+
+
+class PostStore:
+    """
+    SQLite-backed post store with indexes on topic and fetch time.
+    Safe to share between threads.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS posts (
+                note_id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                title TEXT,
+                image_url TEXT,
+                likes INTEGER DEFAULT 0,
+                collects INTEGER DEFAULT 0,
+                comment_count INTEGER DEFAULT 0,
+                shares INTEGER DEFAULT 0,
+                comments TEXT,
+                fetched_at REAL NOT NULL,
+                max_comments INTEGER,
+                image_path TEXT,
+                duplicate_of TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_posts_fetched_at ON posts (fetched_at);
+
+            -- Which posts a topic's search returned; rank is the position in
+            -- the latest run (NULL for posts that dropped out of it)
+            CREATE TABLE IF NOT EXISTS topic_posts (
+                topic TEXT NOT NULL,
+                note_id TEXT NOT NULL,
+                rank INTEGER,
+                seen_at REAL NOT NULL,
+                PRIMARY KEY (topic, note_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_topic_posts_topic ON topic_posts (topic, rank);
+            """
+        )
+        # Stores created by earlier versions lack the later columns
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(posts)")}
+        for column, sql_type in (('max_comments', 'INTEGER'), ('image_path', 'TEXT'), ('duplicate_of', 'TEXT')):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE posts ADD COLUMN {column} {sql_type}")
+        self._conn.commit()
+
+    def get_fresh(self, note_ids: Iterable[str], max_age: float = POST_MAX_AGE,
+                  max_comments: int = 0) -> Dict[str, dict]:
+        """
+        Return stored posts fetched within ``max_age`` seconds, keyed by note id.
+        A post fetched with a lower comment cap than ``max_comments`` is
+        stale, since its stored comments may be cut short.
+        """
+        note_ids = [n for n in note_ids if n]
+        if not note_ids:
+            return {}
+        placeholders = ','.join('?' * len(note_ids))
+        columns = ('note_id',) + POST_FIELDS + ('fetched_at',)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(columns)} FROM posts "
+                f"WHERE note_id IN ({placeholders}) AND fetched_at >= ? AND COALESCE(max_comments, 0) >= ?",
+                (*note_ids, time.time() - max_age, max_comments),
+            ).fetchall()
+        return {row[0]: dict(zip(columns, row)) for row in rows}
+
+    def upsert(self, posts: Iterable[dict], max_comments: int = 0) -> int:
+        """
+        Insert or refresh posts (dicts with a 'note_id' and POST_FIELDS)
+        fetched with a cap of ``max_comments`` comments each.
+        A refreshed post keeps its image fields. Returns the number of posts written.
+        """
+        now = time.time()
+        values = [
+            (post['note_id'], *(post.get(field) for field in POST_FIELDS), now, max_comments)
+            for post in posts if post.get('note_id')
+        ]
+        updated = POST_FIELDS + ('fetched_at', 'max_comments')
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT INTO posts (note_id, {', '.join(updated)}) "
+                f"VALUES ({','.join('?' * (len(updated) + 1))}) "
+                f"ON CONFLICT (note_id) DO UPDATE SET "
+                f"{', '.join(f'{field} = excluded.{field}' for field in updated)}",
+                values,
+            )
+            self._conn.commit()
+        return len(values)
+
+    def set_image_paths(self, image_paths: Dict[str, str]) -> None:
+        """
+        Record the local cover image path of each post, keyed by note id.
+        """
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE posts SET image_path = ? WHERE note_id = ?",
+                [(path, note_id) for note_id, path in image_paths.items()],
+            )
+            self._conn.commit()
+
+    def set_duplicates(self, duplicate_of: Dict[str, str]) -> None:
+        """
+        Record, per note id, the post whose images this one repeats (None
+        for a post with images of its own).
+        """
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE posts SET duplicate_of = ? WHERE note_id = ?",
+                [(original, note_id) for note_id, original in duplicate_of.items()],
+            )
+            self._conn.commit()
+
+    def set_topic_ranking(self, topic: str, note_ids: List[str]) -> None:
+        """
+        Record the posts a topic's latest run returned, in order.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("UPDATE topic_posts SET rank = NULL WHERE topic = ?", (topic,))
+            self._conn.executemany(
+                "INSERT INTO topic_posts (topic, note_id, rank, seen_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (topic, note_id) DO UPDATE SET rank = excluded.rank, seen_at = excluded.seen_at",
+                [(topic, note_id, rank, now) for rank, note_id in enumerate(note_ids, 1) if note_id],
+            )
+            self._conn.commit()
+
+    def export_csv(self, topic: str, csv_path: str, max_comments: Optional[int] = None) -> int:
+        """
+        Write the topic's latest ranking to a CSV file and return the row count.
+        With ``max_comments``, each post's comments are cut to that many.
+        """
+        with self._lock:
+            df = pd.read_sql_query(
+                f"SELECT tp.rank AS post_number, p.note_id, "
+                f"{', '.join('p.' + field for field in POST_FIELDS)}, p.image_path, p.duplicate_of "
+                "FROM topic_posts tp JOIN posts p ON p.note_id = tp.note_id "
+                "WHERE tp.topic = ? AND tp.rank IS NOT NULL ORDER BY tp.rank",
+                self._conn,
+                params=(topic,),
+            )
+        if max_comments is not None:
+            df['comments'] = df['comments'].map(lambda comments: cap_comments(comments, max_comments))
+        df.to_csv(csv_path, index=False, encoding='utf-8-sig')
+        return len(df)
+
+
+_post_store = None
+_post_store_lock = threading.Lock()
+
+
+def get_post_store() -> PostStore:
+    """
+    Return the shared post store, opening it on first use.
+    """
+    global _post_store
+    with _post_store_lock:
+        if _post_store is None:
+            _post_store = PostStore(os.getenv('REDNOTE_STORE_PATH', DEFAULT_STORE_PATH))
+        return _post_store
@@ -4,24 +4,39 @@ Task definitions for the Rednote Virality Agents crew.
 
 from crewai import Task
 from src.agents import create_trend_scout, create_strategist, create_creator
+from src.variations import POST_REQUIREMENTS
 
 
-def create_scraping_task(trend_scout, topic: str) -> Task:
+def create_scraping_task(trend_scout, topic: str, max_posts: int = 5, max_comments: int = 3,
+                         harvest_comments: int = 0, download_images: bool = False) -> Task:
     """
     Task for Trend Scout to scrape Rednote posts.
+    With ``harvest_comments`` the scraper also pages through up to that many
+    comments per post into a JSONL file; with ``download_images`` it saves
+    every post image locally.
     """
+    tool_args = [f"max_posts={max_posts}", f"max_comments={max_comments}"]
+    if harvest_comments:
+        tool_args.append(f"harvest_comments={harvest_comments}")
+    if download_images:
+        tool_args.append("download_images=true")
+    tool_args = ', '.join(tool_args[:-1]) + ' and ' + tool_args[-1]
+    description = (
+        f"Search Xiaohongshu (Rednote) for posts related to the topic: '{topic}'. "
+        f"Use the Rednote Scraper tool to find and scrape the top {max_posts} viral posts "
+        f"(call it with {tool_args}). "
+        "For each post, collect:\n"
+        "- Post title\n"
+        "- Image URL\n"
+        f"- Top {max_comments} comments\n"
+        "\n"
+        "Save all the data to a CSV file and provide a summary of what was scraped, "
+        "including the CSV file path."
+    )
+    if harvest_comments:
+        description += " Include the harvested comment statistics and the comments file path."
     return Task(
-        description=(
-            f"Search Xiaohongshu (Rednote) for posts related to the topic: '{topic}'. "
-            "Use the Rednote Scraper tool to find and scrape the top 5 viral posts. "
-            "For each post, collect:\n"
-            "- Post title\n"
-            "- Image URL\n"
-            "- Top 3 comments\n"
-            "\n"
-            "Save all the data to a CSV file and provide a summary of what was scraped, "
-            "including the CSV file path."
-        ),
+        description=description,
         agent=trend_scout,
         expected_output=(
             "A summary text containing:\n"
@@ -32,23 +47,30 @@ def create_scraping_task(trend_scout, topic: str) -> Task:
     )
 
 
-def create_analysis_task(strategist, topic: str) -> Task:
+def create_analysis_task(strategist, topic: str, scraped_summary: str = None) -> Task:
     """
     Task for Strategist to analyze scraped data.
+    scraped_summary carries the Trend Scout's output when the scraping
+    stage was restored from a checkpoint instead of run in the same crew.
     """
+    description = (
+        f"Analyze the scraped Rednote data for the topic '{topic}'. "
+        "Use the pre-analysis statistics (keywords, emojis, hashtags, title patterns, "
+        "comment sentiment) and post list provided by the Trend Scout to identify:\n"
+        "1. Viral hooks - What makes these posts engaging?\n"
+        "2. Keyword patterns - Common words/phrases that appear in viral content\n"
+        "3. User sentiment - How do users react to these posts (based on comments)?\n"
+        "4. Content structure - What format/structure do viral posts follow?\n"
+        "5. Emotional triggers - What emotions do these posts evoke?\n"
+        "\n"
+        "Provide a comprehensive analysis explaining WHY these posts worked and "
+        "what patterns can be replicated for new content."
+    )
+    if scraped_summary:
+        description += f"\n\nScraped data from the Trend Scout:\n{scraped_summary}"
+
     return Task(
-        description=(
-            f"Analyze the scraped Rednote data for the topic '{topic}'. "
-            "Read the CSV file provided by the Trend Scout and identify:\n"
-            "1. Viral hooks - What makes these posts engaging?\n"
-            "2. Keyword patterns - Common words/phrases that appear in viral content\n"
-            "3. User sentiment - How do users react to these posts (based on comments)?\n"
-            "4. Content structure - What format/structure do viral posts follow?\n"
-            "5. Emotional triggers - What emotions do these posts evoke?\n"
-            "\n"
-            "Provide a comprehensive analysis explaining WHY these posts worked and "
-            "what patterns can be replicated for new content."
-        ),
+        description=description,
         agent=strategist,
         expected_output=(
             "A detailed text brief (2-3 paragraphs) explaining:\n"
@@ -60,24 +82,24 @@ def create_analysis_task(strategist, topic: str) -> Task:
     )
 
 
-def create_content_creation_task(creator, topic: str) -> Task:
+def create_content_creation_task(creator, topic: str, analysis: str = None) -> Task:
     """
     Task for Creator to write new post variations.
+    analysis carries the Strategist's brief when the analysis stage was
+    restored from a checkpoint instead of run in the same crew.
     """
+    description = (
+        f"Based on the Strategist's analysis, create 3 new post variations for the topic '{topic}' "
+        "in authentic Xiaohongshu (Little Red Book) style.\n\n"
+        f"{POST_REQUIREMENTS}\n"
+        "Make sure each variation is unique but follows the same successful patterns. "
+        "The content should feel authentic to Rednote users and have high viral potential."
+    )
+    if analysis:
+        description += f"\n\nThe Strategist's analysis:\n{analysis}"
+
     return Task(
-        description=(
-            f"Based on the Strategist's analysis, create 3 new post variations for the topic '{topic}' "
-            "in authentic Xiaohongshu (Little Red Book) style.\n\n"
-            "Each post must include:\n"
-            "1. A clickbait-style title with brackets, e.g., [Must See] or [Hot Topic]\n"
-            "2. Heavy use of emojis (✨🔥👇💕🌟💯 etc.)\n"
-            "3. Bullet points or numbered lists\n"
-            "4. Engaging, conversational tone\n"
-            "5. Relevant hashtags at the end\n"
-            "6. Content that follows the viral patterns identified by the Strategist\n\n"
-            "Make sure each variation is unique but follows the same successful patterns. "
-            "The content should feel authentic to Rednote users and have high viral potential."
-        ),
+        description=description,
         agent=creator,
         expected_output=(
             "Three complete post variations, each formatted as:\n"
@@ -0,0 +1,246 @@
+"""
+Request scheduling for the crawler.
+
+Every page fetch goes through a FetchScheduler, which combines:
+- a token-bucket rate limit per host,
+- retries with jittered exponential backoff for transient failures,
+- a circuit breaker that stops sending requests for a while once a login
+  wall or captcha shows up, so the cookie session is not flagged further.
+
+The default rate is meant to stay out of the way of the default three pages
+in flight (a real page takes 1-2 s to load, so three tabs fetch about two
+pages a second) while still capping bursts. Raising the scraper's
+max_concurrency beyond that only helps if REDNOTE_RATE_LIMIT is raised with
+it, at a higher risk of tripping the site's bot detection.
+
+Configuration (environment variables):
+    REDNOTE_RATE_LIMIT        requests per second per host (default: 2.0)
+    REDNOTE_RATE_BURST        bucket size, i.e. requests allowed back to back (default: 3)
+    REDNOTE_MAX_RETRIES       retries for transient failures (default: 3)
+    REDNOTE_BREAKER_COOLDOWN  seconds to pause after a login wall/captcha (default: 300)
+"""
+
+import asyncio
+import contextlib
+import os
+import random
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+from src.tracing import count
+
+
+# Markup and redirect targets that only Xiaohongshu's login wall and
+# captcha pages contain
+BLOCK_MARKERS = (
+    '/website-login/captcha',
+    'website-login/error',
+    'captcha-container',
+    'red-captcha',
+)
+
+# Wording of the login wall and captcha. Posts and comments can contain it
+# too, so it only counts in the page title or on a page without note data.
+BLOCK_TEXT_MARKERS = (
+    '请先登录',
+    '登录后查看',
+    '安全验证',
+)
+
+_STATE_MARKER = 'window.__INITIAL_STATE__'
+_TITLE_RE = re.compile(r'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+
+# HTTP statuses worth retrying
+TRANSIENT_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class BlockedError(Exception):
+    """Raised when the site answers with a login wall or captcha, or the breaker is open."""
+
+
+def looks_blocked(html: str) -> bool:
+    """
+    Whether a page is a login wall or captcha instead of real content.
+    """
+    if not html:
+        return False
+    if any(marker in html for marker in BLOCK_MARKERS):
+        return True
+    if _STATE_MARKER in html:
+        title = _TITLE_RE.search(html)
+        html = title.group(1) if title else ''
+    return any(marker in html for marker in BLOCK_TEXT_MARKERS)
+
+
+class TokenBucket:
+    """
+    Async token bucket: ``rate`` tokens per second, at most ``burst`` stored.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """
+    Opens when a block is detected and rejects requests until the cooldown
+    has passed. After that a single probe request is let through (half-open):
+    success closes the breaker, another block re-opens it.
+    """
+
+    def __init__(self, cooldown: float):
+        self.cooldown = cooldown
+        self.opened_at = None
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def before_request(self) -> None:
+        """
+        Raises:
+            BlockedError: If the breaker is open (or a probe is already in flight).
+        """
+        if self.opened_at is None:
+            return
+        remaining = self.opened_at + self.cooldown - time.monotonic()
+        if remaining > 0 or self._probing:
+            raise BlockedError(
+                f"Paused after a login wall or captcha; retrying in {max(0, int(remaining))}s. "
+                "Your xhs_cookies.json session may need refreshing."
+            )
+        self._probing = True
+
+    def record_success(self) -> None:
+        self.opened_at = None
+        self._probing = False
+
+    def record_block(self) -> None:
+        self.opened_at = time.monotonic()
+        self._probing = False
+
+    def record_failure(self) -> None:
+        """
+        A request failed for another reason; let the next one probe instead.
+        """
+        self._probing = False
+
+
+class FetchScheduler:
+    """
+    Wraps page fetches with per-host rate limiting, retries and a circuit breaker.
+    """
+
+    def __init__(self, rate: float = 2.0, burst: int = 3, max_retries: int = 3,
+                 base_delay: float = 1.0, max_delay: float = 30.0, cooldown: float = 300.0):
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = CircuitBreaker(cooldown)
+        self.retries = 0
+        self.blocks = 0
+        self._buckets = {}
+
+    def _bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return self._buckets[host]
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        # Full jitter keeps parallel retries from hitting the site in lockstep
+        return random.uniform(0, delay)
+
+    @staticmethod
+    def _is_transient(result) -> bool:
+        status = getattr(result, 'status_code', None)
+        return status is None or status in TRANSIENT_STATUSES
+
+    async def fetch(self, url: str, fetch_fn, slot=None):
+        """
+        Call ``fetch_fn()`` (a coroutine function returning a crawl result)
+        under the rate limit, retrying transient failures.
+
+        ``slot`` (e.g. the caller's concurrency semaphore) is held only while
+        a request is in flight: it is taken after the rate-limit token, and
+        given back during backoff, so callers waiting for a token don't keep
+        the slot from requests that are ready to go.
+
+        Returns:
+            The crawl result. A final unsuccessful result is returned as-is.
+
+        Raises:
+            BlockedError: If the page is a login wall/captcha or the breaker is open.
+        """
+        attempt = 0
+        while True:
+            self.breaker.before_request()
+            await self._bucket(url).acquire()
+            try:
+                async with slot or contextlib.nullcontext():
+                    result = await fetch_fn()
+            except Exception:
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                if result.success and looks_blocked(result.html):
+                    self.blocks += 1
+                    count('fetch.blocks')
+                    self.breaker.record_block()
+                    raise BlockedError(
+                        f"Login wall or captcha returned for {url}. "
+                        "Your xhs_cookies.json session may need refreshing."
+                    )
+                if result.success:
+                    self.breaker.record_success()
+                    return result
+                self.breaker.record_failure()
+                if attempt >= self.max_retries or not self._is_transient(result):
+                    return result
+
+            self.retries += 1
+            count('fetch.retries')
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_fetch_scheduler() -> FetchScheduler:
+    """
+    Return the process-wide scheduler, so limits hold across concurrent scrapes.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = FetchScheduler(
+                rate=float(os.getenv('REDNOTE_RATE_LIMIT', 2.0)),
+                burst=int(os.getenv('REDNOTE_RATE_BURST', 3)),
+                max_retries=int(os.getenv('REDNOTE_MAX_RETRIES', 3)),
+                cooldown=float(os.getenv('REDNOTE_BREAKER_COOLDOWN', 300)),
+            )
+        return _scheduler
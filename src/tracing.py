@@ -0,0 +1,317 @@
+"""
+Run tracing: nested timing spans and counters.
+
+Code marks the work it does with ``with span('name'):`` and bumps counters
+with ``count('name', n)``. Spans nest through a context variable, so a span
+opened on the crawler's event loop is attributed to the tool call that
+submitted it, and concurrent asyncio tasks each keep their own parent.
+LangChain calls are timed by src.llm_tracing.TracingCallbackHandler, with
+their token usage, under the crew task that made them.
+
+Tracing is off unless enable() is called (``--trace`` on the CLI). While
+off, span() hands back one shared no-op object and count() returns at
+once, so the instrumentation costs next to nothing.
+
+A finished run can be exported as a Chrome trace (chrome://tracing or
+https://ui.perfetto.dev) or as plain JSON, and summarised as a table.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+
+_current_span: ContextVar = ContextVar('rednote_current_span', default=None)
+
+
+class Span:
+    """
+    One timed unit of work. Use as a context manager; set() attaches
+    attributes (sizes, counts, token usage) that end up in the export.
+    """
+
+    __slots__ = ('tracer', 'id', 'parent', 'name', 'category', 'start', 'end',
+                 'track', 'attrs', '_token')
+
+    def __init__(self, tracer: 'Tracer', name: str, category: str, attrs: dict):
+        self.tracer = tracer
+        self.id = next(tracer._ids)
+        self.parent = _current_span.get()
+        self.name = name
+        self.category = category
+        self.start = None
+        self.end = None
+        self.track = None
+        self.attrs = attrs
+        self._token = None
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def begin(self) -> 'Span':
+        self.start = time.perf_counter()
+        self.track = self.tracer._track()
+        self._token = _current_span.set(self)
+        return self
+
+    def finish(self, error: BaseException = None) -> None:
+        self.end = time.perf_counter()
+        if error is not None:
+            self.attrs['error'] = f"{type(error).__name__}: {error}"
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Finished from another context (e.g. a crew task callback)
+            _current_span.set(self.parent)
+        self.tracer._record(self)
+
+    def __enter__(self) -> 'Span':
+        return self.begin()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.finish(exc)
+
+    @property
+    def path(self) -> tuple:
+        """
+        Names from the root span down to this one.
+        """
+        names, node = [], self
+        while node is not None:
+            names.append(node.name)
+            node = node.parent
+        return tuple(reversed(names))
+
+
+class _NoopSpan:
+    """
+    Stand-in returned while tracing is disabled.
+    """
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def begin(self) -> '_NoopSpan':
+        return self
+
+    def finish(self, error: BaseException = None) -> None:
+        pass
+
+    def __enter__(self) -> '_NoopSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """
+    Collects finished spans and counters. Safe to share between threads.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._spans: List[Span] = []
+        self._counters: Dict[str, float] = {}
+        self._tracks = {}
+        self._track_names = {}
+
+    def _track(self) -> int:
+        # One track per thread, and per asyncio task on an event loop thread,
+        # so that concurrent spans never overlap on the same track
+        thread = threading.current_thread()
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = (thread.ident, id(task) if task is not None else None)
+        with self._lock:
+            if key not in self._tracks:
+                self._tracks[key] = len(self._tracks) + 1
+                name = thread.name if task is None else f"{thread.name} / {task.get_name()}"
+                self._track_names[self._tracks[key]] = name
+            return self._tracks[key]
+
+    def _record(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def add_span(self, name: str, category: str, start: float, end: float, **attrs) -> Span:
+        """
+        Record an already finished span (times from time.perf_counter()),
+        as a child of the current span.
+        """
+        span = Span(self, name, category, attrs)
+        span.start, span.end = start, end
+        span.track = self._track()
+        self._record(span)
+        return span
+
+    @property
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return sorted(self._spans, key=lambda s: s.start)
+
+    @property
+    def counters(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._counters)
+
+    def to_dict(self) -> dict:
+        return {
+            'started_at': self.started_at,
+            'spans': [
+                {
+                    'id': span.id,
+                    'parent_id': span.parent.id if span.parent is not None else None,
+                    'name': span.name,
+                    'category': span.category,
+                    'start_ms': round((span.start - self._origin) * 1000, 3),
+                    'duration_ms': round((span.end - span.start) * 1000, 3),
+                    'track': self._track_names.get(span.track, ''),
+                    'attrs': span.attrs,
+                }
+                for span in self.spans
+            ],
+            'counters': self.counters,
+        }
+
+    def to_chrome_trace(self) -> dict:
+        pid = os.getpid()
+        events = [
+            {'ph': 'M', 'name': 'thread_name', 'pid': pid, 'tid': track, 'args': {'name': name}}
+            for track, name in self._track_names.items()
+        ]
+        end = self._origin
+        for span in self.spans:
+            end = max(end, span.end)
+            events.append({
+                'ph': 'X', 'name': span.name, 'cat': span.category, 'pid': pid, 'tid': span.track,
+                'ts': round((span.start - self._origin) * 1e6, 1),
+                'dur': round((span.end - span.start) * 1e6, 1),
+                'args': span.attrs,
+            })
+        for name, value in self.counters.items():
+            events.append({
+                'ph': 'C', 'name': name, 'pid': pid, 'tid': 0,
+                'ts': round((end - self._origin) * 1e6, 1), 'args': {'value': value},
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export(self, path: str, fmt: str = 'chrome') -> str:
+        """
+        Write the trace as 'chrome' (trace event format) or 'json' and return the path.
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        data = self.to_chrome_trace() if fmt == 'chrome' else self.to_dict()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+        return path
+
+    def summary(self) -> str:
+        """
+        Render spans aggregated by their path of span names (in first-seen
+        order, indented by nesting), LLM usage per crew task and the
+        counters as a text table.
+        """
+        spans = self.spans
+        if not spans and not self.counters:
+            return "No trace data recorded."
+
+        rows = {}
+        for span in spans:
+            row = rows.setdefault(span.path, {'calls': 0, 'total': 0.0, 'max': 0.0})
+            duration = span.end - span.start
+            row['calls'] += 1
+            row['total'] += duration
+            row['max'] = max(row['max'], duration)
+
+        lines = [f"{'Span':<40} {'Calls':>6} {'Total s':>9} {'Mean ms':>9} {'Max ms':>9}"]
+        lines.append('-' * len(lines[0]))
+        for path, row in rows.items():
+            label = ('  ' * (len(path) - 1) + path[-1])[:40]
+            lines.append(
+                f"{label:<40} {row['calls']:>6} {row['total']:>9.2f} "
+                f"{row['total'] / row['calls'] * 1000:>9.1f} {row['max'] * 1000:>9.1f}"
+            )
+
+        usage = {}
+        for span in spans:
+            if span.category != 'llm':
+                continue
+            task = span.parent
+            while task is not None and task.category != 'task':
+                task = task.parent
+            entry = usage.setdefault(task.name if task else '(no task)', [0, 0.0, 0, 0])
+            entry[0] += 1
+            entry[1] += span.end - span.start
+            entry[2] += span.attrs.get('prompt_tokens', 0)
+            entry[3] += span.attrs.get('completion_tokens', 0)
+        if usage:
+            lines.append('')
+            lines.append(f"{'LLM usage by task':<40} {'Calls':>6} {'Total s':>9} {'Prompt':>9} {'Output':>9}")
+            lines.append('-' * len(lines[0]))
+            for name, (calls, total, prompt, completion) in usage.items():
+                lines.append(f"{name[:40]:<40} {calls:>6} {total:>9.2f} {prompt:>9} {completion:>9}")
+
+        counters = self.counters
+        if counters:
+            lines.append('')
+            lines.append('Counters:')
+            for name in sorted(counters):
+                value = counters[name]
+                text = f"{value:.3f}" if isinstance(value, float) and not value.is_integer() else f"{value:,.0f}"
+                lines.append(f"  {name:<38} {text:>12}")
+        return '\n'.join(lines)
+
+
+_tracer: Optional[Tracer] = None
+
+
+def enable() -> Tracer:
+    """
+    Turn tracing on for the rest of the process and return the tracer.
+    """
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    """
+    Return the active tracer, or None while tracing is disabled.
+    """
+    return _tracer
+
+
+def span(name: str, category: str = 'app', **attrs):
+    """
+    Context manager timing the enclosed block as a child of the current span.
+    """
+    if _tracer is None:
+        return _NOOP_SPAN
+    return Span(_tracer, name, category, attrs)
+
+
+def count(name: str, value: float = 1) -> None:
+    """
+    Add ``value`` to a run counter (no-op while tracing is disabled).
+    """
+    if _tracer is not None:
+        _tracer.count(name, value)
@@ -0,0 +1,256 @@
+"""
+Parallel post variations for the create stage.
+
+The Creator agent writes all of its variations in one long completion, and
+nothing is visible until the whole completion is done. With ``--variations N``
+the create stage sends N separate LLM requests at once instead, one per
+variation. Each request gets its own angle, which pairs a post format with a
+point taken from the Strategist's brief. Wall time is then about that of a
+single variation.
+
+Tokens are shown as they arrive. Each finished line is printed to the
+console and appended to output/result_<topic>.txt, prefixed with its
+variation ("[v2] ..."). When all variations are done, the result file is
+rewritten with the variations in order. Requests go through the LLM's
+cache, so a cached variation comes back at once, in one piece.
+
+Configuration (environment variables):
+    REDNOTE_VARIATION_CONCURRENCY   variation requests in flight at once (default: 8)
+"""
+
+import asyncio
+import os
+import re
+import threading
+from typing import List, Optional
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from src.tracing import span
+
+
+VARIATION_CONCURRENCY = int(os.getenv('REDNOTE_VARIATION_CONCURRENCY', 8))
+
+# What every post must contain, whether the Creator agent writes the
+# variations in one go or they are generated in parallel
+POST_REQUIREMENTS = (
+    "Each post must include:\n"
+    "1. A clickbait-style title with brackets, e.g., [Must See] or [Hot Topic]\n"
+    "2. Heavy use of emojis (✨🔥👇💕🌟💯 etc.)\n"
+    "3. Bullet points or numbered lists\n"
+    "4. Engaging, conversational tone\n"
+    "5. Relevant hashtags at the end\n"
+    "6. Content that follows the viral patterns identified by the Strategist\n"
+)
+
+# The Creator's persona: the Creator agent's backstory, and the system
+# prompt of every parallel variation request
+CREATOR_BACKSTORY = (
+    "You are a master copywriter specializing in Xiaohongshu (Little Red Book) content. "
+    "You understand the unique aesthetic and style of Rednote posts: bullet points, "
+    "emojis like ✨🔥👇💕, bracketed titles like [Must See], and the perfect balance "
+    "of informative and engaging content. You create content that feels authentic to "
+    "the platform and has high viral potential."
+)
+
+# Post formats, cycled through so that variations differ in shape as well
+# as in the point of the brief they build on
+POST_FORMATS = (
+    "a personal story told in the first person",
+    "a step-by-step tutorial",
+    "a ranked list of favourite picks",
+    "a common-mistakes / myth-busting post",
+    "a before-and-after comparison",
+    "a budget-friendly guide",
+    "a question to readers that invites them to comment",
+    "a quick checklist worth saving for later",
+)
+
+# Brief points shorter than this are headings rather than ideas
+MIN_POINT_CHARS = 20
+MAX_POINT_CHARS = 240
+
+_LIST_ITEM_RE = re.compile(r'^\s*(?:[-*•]|\d+[.)、])\s+')
+_SENTENCE_RE = re.compile(r'(?<=[.!?。！？])\s*')
+
+
+def brief_points(analysis: str) -> List[str]:
+    """
+    Distinct points of the Strategist's brief: its list items, or its
+    sentences when the brief is written as plain paragraphs.
+    """
+    analysis = (analysis or '').replace('**', '')
+    points = [_LIST_ITEM_RE.sub('', line) for line in analysis.splitlines() if _LIST_ITEM_RE.match(line)]
+    if not points:
+        points = _SENTENCE_RE.split(analysis)
+    points = [' '.join(point.split()) for point in points]
+    points = [point[:MAX_POINT_CHARS] for point in points if len(point) >= MIN_POINT_CHARS]
+    return list(dict.fromkeys(points))
+
+
+def pick_angles(analysis: str, n: int) -> List[str]:
+    """
+    One angle per variation: a post format paired with a point of the brief.
+    """
+    points = brief_points(analysis)
+    angles = []
+    for i in range(n):
+        angle = f"Write it as {POST_FORMATS[i % len(POST_FORMATS)]}"
+        if points:
+            angle += f", built around this point from the Strategist's brief: {points[i % len(points)]}"
+        angles.append(angle)
+    return angles
+
+
+def build_variation_messages(topic: str, analysis: Optional[str], angle: str) -> list:
+    prompt = (
+        f"Create one new post for the topic '{topic}' in authentic Xiaohongshu "
+        "(Little Red Book) style, following the Strategist's analysis.\n\n"
+        f"{POST_REQUIREMENTS}\n"
+        f"Angle for this post: {angle}.\n\n"
+        "Reply with the post only: the bracketed title on the first line, then the "
+        "content, then the hashtags."
+    )
+    if analysis:
+        prompt += f"\n\nThe Strategist's analysis:\n{analysis}"
+    return [SystemMessage(content=CREATOR_BACKSTORY), HumanMessage(content=prompt)]
+
+
+class StreamEcho:
+    """
+    Prints streamed text line by line, each line prefixed with the label of
+    the stream it belongs to, and appends the same lines to a file.
+    Meant to be used from one event loop.
+    """
+
+    def __init__(self, path: str, header: str = '', echo: bool = True):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.echo = echo
+        self._partial = {}
+        self._file = open(path, 'w', encoding='utf-8')
+        self._file.write(header)
+
+    def write(self, label: str, text: str) -> None:
+        *lines, rest = (self._partial.pop(label, '') + text).split('\n')
+        for line in lines:
+            self._emit(label, line)
+        if rest:
+            self._partial[label] = rest
+
+    def end(self, label: str) -> None:
+        """
+        Emit what is left of a finished stream's last line.
+        """
+        rest = self._partial.pop(label, '')
+        if rest:
+            self._emit(label, rest)
+
+    def _emit(self, label: str, line: str) -> None:
+        line = f"[{label}] {line}"
+        if self.echo:
+            print(line, flush=True)
+        self._file.write(line + '\n')
+        self._file.flush()
+
+    def close(self) -> None:
+        for label in list(self._partial):
+            self.end(label)
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _TokenHandler(AsyncCallbackHandler):
+    def __init__(self, stream: StreamEcho, label: str):
+        self.stream = stream
+        self.label = label
+        self.tokens = 0
+
+    async def on_llm_new_token(self, token: str, **kwargs) -> None:
+        if token:
+            self.tokens += 1
+            self.stream.write(self.label, token)
+
+
+async def _generate_one(llm, semaphore: asyncio.Semaphore, stream: StreamEcho, label: str,
+                        messages: list) -> str:
+    handler = _TokenHandler(stream, label)
+    with span(f"variation.{label}", 'variation') as variation_span:
+        async with semaphore:
+            # ainvoke rather than astream so the LLM cache is consulted;
+            # stream=True makes a cache miss stream its tokens to the handler
+            message = await llm.ainvoke(messages, config={'callbacks': [handler]}, stream=True)
+        text = message.content if isinstance(message.content, str) else str(message.content)
+        if not handler.tokens:
+            # Served from the cache (or by a model that doesn't stream)
+            stream.write(label, text)
+        stream.end(label)
+        variation_span.set(streamed_tokens=handler.tokens, chars=len(text))
+    return text.strip()
+
+
+async def generate_variations_async(llm, topic: str, analysis: Optional[str], n: int,
+                                    stream_path: str, echo: bool = True, label_prefix: str = '',
+                                    concurrency: int = VARIATION_CONCURRENCY) -> str:
+    """
+    Generate ``n`` variations concurrently, streaming them to the console
+    and ``stream_path``, and return them joined in order. A variation whose
+    request failed is replaced by a note, unless all of them failed.
+
+    Raises:
+        ValueError: If ``n`` is less than 1.
+        RuntimeError: If every variation failed.
+    """
+    if n < 1:
+        raise ValueError(f"Number of variations must be at least 1, got {n}")
+    labels = [f"{label_prefix}v{i}" for i in range(1, n + 1)]
+    header = f"Topic: {topic}\n" + "=" * 60 + f"\n\nStreaming {n} post variations...\n\n"
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    with StreamEcho(stream_path, header, echo) as stream:
+        results = await asyncio.gather(*[
+            _generate_one(llm, semaphore, stream, label, build_variation_messages(topic, analysis, angle))
+            for label, angle in zip(labels, pick_angles(analysis, n))
+        ], return_exceptions=True)
+
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if len(errors) == len(results):
+        raise RuntimeError(f"All {n} variations failed: {errors[0]}") from errors[0]
+    sections = []
+    for i, result in enumerate(results, 1):
+        body = f"(Generation failed: {result})" if isinstance(result, BaseException) else result
+        sections.append(f"--- Post Variation {i} ---\n{body}")
+    return '\n\n'.join(sections)
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """
+    The event loop every variation request runs on, started on first use.
+    The LLM is shared between topics (batch and server workers) and its
+    async HTTP client binds to the first loop it is used on, so all calls
+    have to go through the same loop.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='rednote-variations', daemon=True).start()
+        return _loop
+
+
+def generate_variations(llm, topic: str, analysis: Optional[str], n: int, stream_path: str,
+                        echo: bool = True, label_prefix: str = '') -> str:
+    """
+    Blocking wrapper around generate_variations_async() for the crew
+    threads; the work runs on the shared variations loop.
+    """
+    coro = generate_variations_async(llm, topic, analysis, n, stream_path, echo, label_prefix)
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
@@ -0,0 +1,82 @@
+import json
+
+import pandas as pd
+
+from src.analytics import (
+    build_comment_brief, build_stats_brief, comment_sentiment, keyword_frequencies, split_comments
+)
+
+
+def posts() -> pd.DataFrame:
+    return pd.DataFrame({
+        'title': ["【早八】通勤妆容分享✨", "【早八】3分钟通勤妆！", "学生党平价护肤？", "通勤包里的平价好物🔥🔥"],
+        'comments': ["好喜欢这个 | 求链接", "No comments found", "踩雷了，太贵 | 学到了谢谢", "Content unavailable"],
+        'likes': [100, 300, 50, 20],
+        'collects': [10, 30, 5, 2],
+        'comment_count': [4, 8, 2, 0],
+    })
+
+
+def test_keywords_count_once_per_text_and_drop_redundant_trigrams():
+    texts = pd.Series(["通勤妆容 通勤通勤", "通勤包 love it", "平价通勤 LOVE", "the and the", None])
+    counts = keyword_frequencies(texts)
+    assert counts['通勤'] == 3
+    assert counts['love'] == 2
+    assert 'the' not in counts
+    # Terms in a single text are not keywords
+    assert '通勤妆' not in counts and '勤妆' not in counts
+
+    # 好物推 only ever extends 好物 into the next word
+    counts = keyword_frequencies(pd.Series(["好物推荐", "今天的好物推荐来了"]))
+    assert counts.to_dict() == {'好物': 2, '物推': 2, '推荐': 2}
+
+
+def test_split_comments_drops_placeholders():
+    comments = split_comments(pd.Series(["a | b", "No comments found", None, " c ", "Content unavailable"]))
+    assert comments.tolist() == ['a', 'b', 'c']
+
+
+def test_comment_sentiment_labels():
+    sentiment = comment_sentiment(pd.Series(["好喜欢，谢谢👍", "踩雷了太贵", "求链接", "Not bad, actually GOOD"]))
+    assert sentiment['label'].tolist() == ['positive', 'negative', 'neutral', 'neutral']
+    assert sentiment[['positive', 'negative']].values.tolist() == [[3, 0], [0, 2], [0, 0], [1, 1]]
+
+
+def test_stats_brief():
+    brief = build_stats_brief(posts())
+    lines = brief.splitlines()
+    assert lines[0] == "Pre-analysis of 4 posts and 4 comments:"
+    assert "- Engagement (median): 75 likes, 8 collects, 3 comments" in lines
+    assert "- Title patterns: 50% use brackets, 25% contain numbers, 25% exclamations, 25% questions" in lines
+    assert "- Bracketed phrases: 早八 (2)" in lines
+    assert any(line.startswith("- Top keywords: 通勤 (3)") for line in lines)
+    assert "most used: 🔥 (2), ✨ (1)" in brief
+    assert "- Comment sentiment: 50% positive, 25% negative, 25% neutral" in lines
+    assert '  Most negative: "踩雷了，太贵"' in lines
+
+
+def test_stats_brief_without_posts_or_engagement():
+    assert build_stats_brief(pd.DataFrame()) == "No posts to analyze."
+    brief = build_stats_brief(pd.DataFrame({'title': ["一个标题"], 'comments': ["No comments found"]}))
+    assert "Engagement" not in brief
+    assert "Comment sentiment" not in brief
+
+
+def test_comment_brief_reads_the_file_in_chunks(tmp_path):
+    path = tmp_path / 'comments.jsonl'
+    rows = [{'note_id': f"{i % 3:024x}", 'content': text, 'likes': likes}
+            for i, (text, likes) in enumerate([("好喜欢", 3), ("踩雷了", 40), ("", 99), ("求链接", 7), ("绝了谢谢", 12)])]
+    path.write_text('\n'.join(json.dumps(row, ensure_ascii=False) for row in rows) + '\n', encoding='utf-8')
+
+    brief = build_comment_brief(str(path), chunksize=2)
+    assert brief.splitlines() == [
+        "Harvested 4 comments across 2 posts:",
+        "- Comment sentiment: 50% positive, 25% negative, 25% neutral",
+        '- Most liked (40 likes): "踩雷了"',
+    ]
+
+
+def test_comment_brief_of_an_empty_harvest(tmp_path):
+    path = tmp_path / 'comments.jsonl'
+    path.write_text(json.dumps({'note_id': 'a', 'content': ' ', 'likes': 1}) + '\n', encoding='utf-8')
+    assert build_comment_brief(str(path)) == "No comments harvested."
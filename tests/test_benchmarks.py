@@ -0,0 +1,67 @@
+import asyncio
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+import pytest
+
+import src.cache as cache
+import src.crawler as crawler
+import src.dedup as dedup
+import src.extraction as extraction
+import src.store as store
+import src.throttle as throttle
+from benchmarks.fake_server import FakeRednoteServer
+from benchmarks.run import parse_args, scrape_once
+from src.throttle import FetchScheduler
+
+
+class ServerCrawler:
+    """Stands in for AsyncWebCrawler, answering from a FakeRednoteServer."""
+
+    server = None
+
+    def __init__(self, verbose=False):
+        self.crawler_strategy = SimpleNamespace(kill_session=self._kill_session)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def _kill_session(self, session_id):
+        pass
+
+    async def arun(self, url, cookies=None, session_id=None, **options):
+        parsed = urlparse(url)
+        status, body = await asyncio.to_thread(self.server.respond, f"{parsed.path}?{parsed.query}")
+        return SimpleNamespace(success=status == 200, html=body, status_code=status, error_message='')
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    fake = FakeRednoteServer(num_notes=20, comments_per_note=3, page_kb=4)
+    monkeypatch.setattr(ServerCrawler, 'server', fake)
+    monkeypatch.setattr(crawler, 'AsyncWebCrawler', ServerCrawler)
+    monkeypatch.setattr(extraction, 'BASE_URL', fake.url)
+    monkeypatch.setenv('REDNOTE_OUTPUT_DIR', str(tmp_path / 'output'))
+    monkeypatch.setenv('REDNOTE_STORE_PATH', str(tmp_path / 'posts.db'))
+    monkeypatch.setenv('REDNOTE_DEDUP_PATH', str(tmp_path / 'dedup.db'))
+    monkeypatch.setenv('REDNOTE_CACHE', 'off')
+    monkeypatch.setattr(store, '_post_store', None)
+    monkeypatch.setattr(dedup, '_post_index', None)
+    monkeypatch.setattr(cache, '_page_cache', None)
+    monkeypatch.setattr(throttle, '_scheduler', FetchScheduler(rate=1000, burst=100, max_retries=0))
+    yield fake
+    fake.stop()
+
+
+def test_every_page_served_is_timed_once(server):
+    args = parse_args(['_scrape_once', '--posts', '4', '--concurrency', '2', '--candidates', '20'])
+    result = scrape_once(args)
+
+    assert result['error'] is None
+    assert result['posts_scraped'] == 4
+    # The browser warm-up request is made before timing starts
+    assert result['pages_fetched'] == server.requests - 1 == 1 + 4
+    assert result['page_latency_ms']['p50'] is not None
@@ -0,0 +1,52 @@
+import base64
+import os
+import time
+
+from src.cache import PageCache
+
+
+def page(size: int = 4000) -> str:
+    # Random text, so compression can't shrink pages below the size cap
+    return base64.b64encode(os.urandom(size)).decode('ascii')
+
+
+def test_pages_are_keyed_by_url_and_options(tmp_path):
+    cache = PageCache(str(tmp_path))
+    cache.put('http://site/a', '<html>a</html>', ttl=60)
+    cache.put('http://site/a', '<html>scrolled</html>', ttl=60, options={'js_code': 'scroll()'})
+
+    assert cache.get('http://site/a') == '<html>a</html>'
+    assert cache.get('http://site/a', {'js_code': 'scroll()'}) == '<html>scrolled</html>'
+    assert cache.get('http://site/b') is None
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 1
+    assert PageCache.make_key('u', {'a': 1, 'b': 2}) == PageCache.make_key('u', {'b': 2, 'a': 1})
+
+
+def test_expired_pages_are_misses(tmp_path):
+    cache = PageCache(str(tmp_path))
+    cache.put('http://site/a', 'old', ttl=-1)
+    assert cache.get('http://site/a') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_least_recently_used_pages_are_evicted(tmp_path):
+    cache = PageCache(str(tmp_path))
+    cache.put('http://site/a', page(), ttl=60)
+    one_page = cache.stats()['bytes']
+    cache.max_bytes = int(one_page * 2.5)
+    time.sleep(0.01)
+    cache.put('http://site/b', page(), ttl=60)
+    time.sleep(0.01)
+    assert cache.get('http://site/a') is not None
+    time.sleep(0.01)
+    cache.put('http://site/c', page(), ttl=60)
+
+    assert cache.get('http://site/b') is None
+    assert cache.get('http://site/a') is not None
+    assert cache.get('http://site/c') is not None
+    assert cache.stats()['bytes'] <= cache.max_bytes
+
+
+def test_cache_persists_across_instances(tmp_path):
+    PageCache(str(tmp_path)).put('http://site/a', '护肤 page', ttl=60)
+    assert PageCache(str(tmp_path)).get('http://site/a') == '护肤 page'
@@ -0,0 +1,116 @@
+import itertools
+import json
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+import src.main as main
+from src.checkpoint import STAGES, CheckpointError, CheckpointStore, task_output_text
+
+
+INPUTS = {'max_posts': 5, 'max_comments': 3}
+
+
+@pytest.fixture
+def checkpoints(tmp_path, monkeypatch):
+    store = CheckpointStore(str(tmp_path / 'checkpoints'))
+    monkeypatch.setattr(main, 'CheckpointStore', lambda: store)
+    monkeypatch.setenv('REDNOTE_OUTPUT_DIR', str(tmp_path / 'output'))
+    return store
+
+
+def test_checkpoints_follow_the_output_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('REDNOTE_OUTPUT_DIR', str(tmp_path / 'out'))
+    store = CheckpointStore()
+    store.save('护肤', INPUTS, 'scrape', 'posts')
+
+    assert store.root == str(tmp_path / 'out' / 'checkpoints')
+    assert CheckpointStore().load('护肤', INPUTS, 'scrape') == 'posts'
+
+
+@pytest.fixture
+def no_llm(monkeypatch):
+    def get_llm(use_cache=True):
+        raise AssertionError("the LLM should not be needed")
+    monkeypatch.setattr(main, 'get_llm', get_llm)
+    return main.LazyLLM()
+
+
+def test_save_load_and_discard(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    path = store.save('护肤 tips', INPUTS, 'scrape', 'scraped')
+
+    assert store.load('护肤 tips', INPUTS, 'scrape') == 'scraped'
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f)['inputs'] == INPUTS
+    # Other inputs are a different run
+    assert store.load('护肤 tips', dict(INPUTS, max_posts=6), 'scrape') is None
+
+    store.discard('护肤 tips', INPUTS, ['scrape', 'analyze'])
+    assert store.load('护肤 tips', INPUTS, 'scrape') is None
+    with pytest.raises(ValueError):
+        store.load('护肤 tips', INPUTS, 'publish')
+
+
+def test_corrupt_checkpoint_counts_as_missing(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    path = store.save('t', INPUTS, 'scrape', 'scraped')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"output": ')
+    assert store.load('t', INPUTS, 'scrape') is None
+
+
+def test_first_missing_with_stage_inputs(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    assert store.first_missing('t', INPUTS) == 0
+    store.save('t', INPUTS, 'scrape', 's')
+    store.save('t', INPUTS, 'analyze', 'a')
+    store.save('t', INPUTS, 'create', 'c')
+    assert store.first_missing('t', INPUTS) == len(STAGES)
+
+    # The create stage of a variations run is keyed by its own inputs
+    create_inputs = {'create': dict(INPUTS, variations=4)}
+    assert store.first_missing('t', INPUTS, create_inputs) == STAGES.index('create')
+
+
+def test_task_output_text():
+    class Output:
+        raw = 'raw text'
+
+    assert task_output_text(Output()) == 'raw text'
+    assert task_output_text('plain') == 'plain'
+
+
+def test_resume_restores_every_stage_without_the_llm(checkpoints, no_llm):
+    for stage in STAGES:
+        checkpoints.save('t', INPUTS, stage, f"{stage} output")
+
+    result, result_file = main.run_topic('t', no_llm, verbose=False, resume=True)
+
+    assert result == 'create output'
+    with open(result_file, encoding='utf-8') as f:
+        assert f.read().endswith('create output')
+    assert no_llm.llm is None
+
+
+def test_from_stage_without_earlier_checkpoints(checkpoints, no_llm):
+    checkpoints.save('t', INPUTS, 'scrape', 'scraped')
+    with pytest.raises(CheckpointError, match="No checkpoint for stage 'analyze'"):
+        main.run_topic('t', no_llm, verbose=False, from_stage='create')
+
+
+def test_variations_reuse_scrape_and_analysis(checkpoints):
+    checkpoints.save('t', INPUTS, 'scrape', 'scraped')
+    checkpoints.save('t', INPUTS, 'analyze', 'Posts that open with a question get more comments.')
+    checkpoints.save('t', INPUTS, 'create', 'crew posts')
+    llm = GenericFakeChatModel(messages=itertools.cycle([AIMessage(content="[Hot] post")]))
+
+    result, _ = main.run_topic('t', llm, verbose=False, resume=True, variations=2)
+
+    assert result.count('--- Post Variation') == 2
+    variation_inputs = dict(INPUTS, variations=2)
+    assert checkpoints.load('t', variation_inputs, 'create') == result
+    # The crew's own create checkpoint is untouched, and a rerun is fully restored
+    assert checkpoints.load('t', INPUTS, 'create') == 'crew posts'
+    assert checkpoints.first_missing('t', INPUTS, {'create': variation_inputs}) == len(STAGES)
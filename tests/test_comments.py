@@ -0,0 +1,117 @@
+import asyncio
+import contextlib
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import src.throttle as throttle
+from src.comments import CommentSink, harvest_comments, iter_comments
+from src.extraction import COMMENT_BATCH_ID, extract_comment_batch
+from src.throttle import FetchScheduler
+
+
+def batch_page(comments, done=False):
+    batch = json.dumps({'comments': comments, 'done': done}, ensure_ascii=False).replace('<', '\\u003c')
+    return (f'<html><body><script id="{COMMENT_BATCH_ID}" type="application/json">'
+            f'{batch}</script></body></html>')
+
+
+def comment(i, parent=''):
+    return {'id': f"c{i}", 'parent_id': parent, 'content': f"评论 {i}", 'author': 'user', 'likes': '1.2万', 'time': 't'}
+
+
+class FakeService:
+    """Serves one comment batch per round, like the harvesting script would."""
+
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.calls = []
+        self.sessions = 0
+
+    @contextlib.asynccontextmanager
+    async def session(self):
+        self.sessions += 1
+        yield f"session-{self.sessions}"
+
+    async def fetch(self, url, session=None, **options):
+        self.calls.append((session, options))
+        return SimpleNamespace(success=True, html=self.pages.pop(0), status_code=200, error_message='')
+
+
+@pytest.fixture(autouse=True)
+def scheduler(monkeypatch):
+    monkeypatch.setattr(throttle, '_scheduler', FetchScheduler(rate=1000, burst=100, max_retries=0))
+
+
+def test_extract_comment_batch():
+    comments, done = extract_comment_batch(batch_page([comment(1), {'id': 'c2', 'content': '  '}], done=True))
+    assert comments == [{'comment_id': 'c1', 'parent_id': '', 'content': '评论 1', 'author': 'user',
+                         'likes': 12000, 'time': 't'}]
+    assert done is True
+    assert extract_comment_batch(batch_page([comment('<b>')]))[0][0]['content'] == '评论 <b>'
+    assert extract_comment_batch('<html></html>') == ([], True)
+    assert extract_comment_batch(None) == ([], True)
+
+
+def test_comments_stream_in_one_session_until_done():
+    service = FakeService([
+        batch_page([comment(1), comment(2, parent='c1')]),
+        batch_page([comment(2, parent='c1'), comment(3)]),
+        batch_page([], done=True),
+    ])
+
+    async def collect():
+        return [c async for c in iter_comments(service, 'http://site/explore/n1', limit=10)]
+
+    comments = asyncio.run(collect())
+
+    assert [c['comment_id'] for c in comments] == ['c1', 'c2', 'c3']
+    assert comments[1]['parent_id'] == 'c1'
+    assert service.sessions == 1
+    assert {session for session, _ in service.calls} == {'session-1'}
+    # Only the first round navigates; later rounds run the script in the open page
+    assert 'wait_for' in service.calls[0][1] and 'js_only' not in service.calls[0][1]
+    assert all(options['js_only'] for _, options in service.calls[1:])
+
+
+def test_comments_stop_at_the_limit():
+    service = FakeService([batch_page([comment(i) for i in range(3)]),
+                           batch_page([comment(i) for i in range(3, 6)])])
+
+    async def collect():
+        return [c async for c in iter_comments(service, 'http://site/explore/n1', limit=4, batch_size=3)]
+
+    assert [c['comment_id'] for c in asyncio.run(collect())] == ['c0', 'c1', 'c2', 'c3']
+    assert len(service.calls) == 2
+
+
+def test_failed_round_raises():
+    service = FakeService([])
+
+    async def fetch(url, session=None, **options):
+        return SimpleNamespace(success=False, html='', status_code=500, error_message='boom')
+    service.fetch = fetch
+
+    async def collect():
+        return [c async for c in iter_comments(service, 'http://site/explore/n1', limit=5)]
+
+    with pytest.raises(RuntimeError, match='boom'):
+        asyncio.run(collect())
+
+
+def test_harvest_streams_into_a_bounded_sink(tmp_path):
+    path = str(tmp_path / 'comments' / 'run.jsonl')
+    service = FakeService([batch_page([comment(i) for i in range(5)], done=True)])
+
+    with CommentSink(path, max_buffered=2) as sink:
+        count = asyncio.run(harvest_comments(service, sink, {'note_id': 'n1', 'url': 'http://site/explore/n1'}, 10))
+        # Two full buffers were flushed, the last row waits for close()
+        assert (count, sink.rows_written, len(sink._buffer)) == (5, 4, 1)
+    assert sink.rows_written == 5
+
+    with open(path, encoding='utf-8') as f:
+        rows = [json.loads(line) for line in f]
+    assert [row['comment_id'] for row in rows] == [f"c{i}" for i in range(5)]
+    assert {row['note_id'] for row in rows} == {'n1'}
+    assert rows[0]['content'] == '评论 0'
@@ -0,0 +1,131 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import src.crawler as crawler
+from src.crawler import MAX_CONSECUTIVE_FAILURES, CrawlerService, load_cookies
+
+
+class FakeCrawler:
+    """Stands in for AsyncWebCrawler: records launches, closes and sessions."""
+
+    instances = []
+
+    def __init__(self, verbose=False):
+        self.closed = False
+        self.success = True
+        self.active = 0
+        self.max_active = 0
+        self.sessions = []
+        self.killed = []
+        self.crawler_strategy = SimpleNamespace(kill_session=self._kill_session)
+        FakeCrawler.instances.append(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.closed = True
+
+    async def _kill_session(self, session_id):
+        self.killed.append(session_id)
+
+    async def arun(self, url, cookies=None, session_id=None, **options):
+        assert cookies == {'a1': 'token'}
+        self.sessions.append(session_id)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(options.get('delay', 0))
+        finally:
+            self.active -= 1
+        return SimpleNamespace(success=self.success, html=f"<html>{url}</html>", error_message='')
+
+
+@pytest.fixture
+def service_factory(tmp_path, monkeypatch):
+    cookies = tmp_path / 'xhs_cookies.json'
+    cookies.write_text(json.dumps([{'name': 'a1', 'value': 'token'}]), encoding='utf-8')
+    monkeypatch.setattr(crawler, 'AsyncWebCrawler', FakeCrawler)
+    FakeCrawler.instances = []
+    services = []
+
+    def make(**kwargs):
+        service = CrawlerService(cookies_path=str(cookies), **kwargs)
+        services.append(service)
+        return service
+
+    yield make
+    for service in services:
+        service.close()
+
+
+def test_missing_or_broken_cookies(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_cookies(str(tmp_path / 'missing.json'))
+    broken = tmp_path / 'broken.json'
+    broken.write_text('[{"name": "a1"}]', encoding='utf-8')
+    with pytest.raises(ValueError):
+        load_cookies(str(broken))
+
+
+def test_one_browser_and_bounded_sessions(service_factory):
+    service = service_factory(pool_size=2)
+
+    async def crawl():
+        return await asyncio.gather(*(service.fetch(f"http://site/{i}", delay=0.02) for i in range(6)))
+
+    results = service.run(crawl())
+
+    assert [r.html for r in results] == [f"<html>http://site/{i}</html>" for i in range(6)]
+    assert len(FakeCrawler.instances) == 1
+    browser = FakeCrawler.instances[0]
+    assert browser.max_active == 2
+    # Warm sessions are reused rather than reopened
+    assert len(set(browser.sessions)) == 2
+    assert service.pages_fetched == 6
+
+
+def test_sessions_are_recycled_after_max_pages_or_an_error(service_factory):
+    service = service_factory(pool_size=1, max_pages_per_session=2)
+
+    async def crawl():
+        for i in range(3):
+            await service.fetch(f"http://site/{i}")
+        with pytest.raises(RuntimeError):
+            async with service.session() as session:
+                await service.fetch('http://site/3', session=session)
+                raise RuntimeError('parse failed')
+        await service.fetch('http://site/4')
+
+    service.run(crawl())
+
+    browser = FakeCrawler.instances[0]
+    assert browser.sessions == ['rednote-1', 'rednote-1', 'rednote-2', 'rednote-2', 'rednote-3']
+    assert browser.killed == ['rednote-1', 'rednote-2']
+
+
+def test_repeated_failures_restart_the_browser(service_factory):
+    service = service_factory(pool_size=2)
+    service.start()
+    old = FakeCrawler.instances[0]
+    old.success = False
+
+    async def crawl():
+        async with service.session() as held:
+            for i in range(MAX_CONSECUTIVE_FAILURES):
+                assert not (await service.fetch(f"http://site/{i}")).success
+            # A session from the old browser keeps it open until it comes back
+            assert len(FakeCrawler.instances) == 2 and not old.closed
+            assert held['crawler'] is old
+        assert old.closed
+        return await service.fetch('http://site/ok')
+
+    assert service.run(crawl()).success
+    new = FakeCrawler.instances[1]
+    assert new.sessions and not new.closed
+
+    service.close()
+    assert new.closed
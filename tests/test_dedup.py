@@ -0,0 +1,93 @@
+from src.dedup import (
+    NearDuplicateIndex, PersistentNearDuplicateIndex, dedup_texts, minhash, normalize, shingles, similarity
+)
+from src.scraper import drop_duplicate_comments, select_distinct_posts
+
+
+TITLE = "【早八通勤】五分钟搞定的平价淡妆教程，学生党必看✨"
+REPOST = "早八通勤！五分钟搞定的平价淡妆教程 学生党必看🔥🔥"
+OTHER = "秋冬干皮保湿面霜测评，这三款真的不踩雷"
+
+
+def test_normalize_and_shingles():
+    assert normalize("  Hello, 世界!! ✨ ") == "hello世界"
+    assert shingles("ab") == {"ab"}
+    assert shingles("!!") == set()
+    assert shingles("abcde") == {"abc", "bcd", "cde"}
+
+
+def test_minhash_estimates_similarity():
+    assert minhash("") is None
+    assert similarity(minhash(TITLE), minhash(TITLE)) == 1.0
+    # Punctuation and emoji don't count, so a repost is (nearly) identical
+    assert similarity(minhash(TITLE), minhash(REPOST)) >= 0.8
+    assert similarity(minhash(TITLE), minhash(OTHER)) < 0.2
+
+
+def test_index_finds_near_duplicates_only():
+    index = NearDuplicateIndex(threshold=0.8)
+    index.add('a', minhash(TITLE))
+    index.add('b', minhash(OTHER))
+    assert index.query(minhash(REPOST)) == ['a']
+    assert index.query(minhash("完全不相关的一条笔记标题内容")) == []
+
+
+def test_persistent_index_survives_reopening(tmp_path):
+    path = str(tmp_path / 'dedup.db')
+    index = PersistentNearDuplicateIndex(path, kind='post')
+    index.add('a', minhash(TITLE))
+    index.add('a', minhash(OTHER))
+
+    reopened = PersistentNearDuplicateIndex(path, kind='post')
+    assert reopened.query(minhash(REPOST)) == ['a']
+    assert reopened.query(minhash(OTHER)) == []
+    assert PersistentNearDuplicateIndex(path, kind='comment').query(minhash(TITLE)) == []
+
+
+def test_dedup_texts_keeps_first_occurrence():
+    texts = ["求链接求链接谢谢姐妹", "", TITLE, "求链接求链接，谢谢姐妹！", REPOST, OTHER, ""]
+    assert dedup_texts(texts) == [True, True, True, False, False, True, True]
+
+
+def test_select_distinct_posts_skips_reposts(tmp_path):
+    index = PersistentNearDuplicateIndex(str(tmp_path / 'dedup.db'))
+    cards = [
+        {'note_id': 'n1', 'title': TITLE},
+        {'note_id': 'n2', 'title': REPOST},
+        {'note_id': 'n3', 'title': '好物'},
+        {'note_id': 'n4', 'title': '好物'},
+        {'note_id': 'n5', 'title': OTHER},
+    ]
+    taken = select_distinct_posts(cards, 3, index)
+    # Titles too short to compare are never treated as duplicates
+    assert [card['note_id'] for card in taken] == ['n1', 'n3', 'n4']
+
+    # A later run skips a different note that reposts n1, but not n1 itself
+    later = select_distinct_posts([{'note_id': 'n6', 'title': REPOST}, cards[0], cards[4]], 5, index)
+    assert [card['note_id'] for card in later] == ['n1', 'n5']
+
+
+def test_drop_duplicate_comments_across_posts():
+    rows = [
+        {'comments': "太实用了吧我马上去试试 | 求链接求链接谢谢姐妹"},
+        {'comments': "Content unavailable"},
+        {'comments': "求链接求链接，谢谢姐妹！"},
+        {'comments': "No comments found"},
+        {'comments': "这个色号到底是多少呀 | 太实用了吧，我马上去试试"},
+    ]
+    drop_duplicate_comments(rows)
+    assert [row['comments'] for row in rows] == [
+        "太实用了吧我马上去试试 | 求链接求链接谢谢姐妹",
+        "Content unavailable",
+        "No comments found",
+        "No comments found",
+        "这个色号到底是多少呀",
+    ]
+
+
+def test_comments_of_seen_rows_count_but_are_kept():
+    seen = [{'comments': "求链接求链接谢谢姐妹 | 这个色号到底是多少呀"}]
+    rows = [{'comments': "求链接求链接，谢谢姐妹！ | 太实用了吧我马上去试试"}, {'comments': None}]
+    drop_duplicate_comments(rows, seen=seen)
+    assert [row['comments'] for row in rows] == ["太实用了吧我马上去试试", None]
+    assert seen[0]['comments'] == "求链接求链接谢谢姐妹 | 这个色号到底是多少呀"
@@ -0,0 +1,214 @@
+import json
+
+import pytest
+
+from benchmarks.fake_server import FakeRednoteServer, synthetic_note_id
+from src.extraction import (
+    FEED_STATE_ID, UNAVAILABLE, extract_page, extract_post, extract_search_cards, find_initial_state, parse_count
+)
+
+
+def bs4_extract(html: str, max_comments: int = 3) -> dict:
+    """
+    The BeautifulSoup lookups extract_page() replaced, as the scraper ran them.
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    title = UNAVAILABLE
+    for selector in ['.title', '#detail-title', 'h1', '[class*="title"]', 'title']:
+        elem = soup.select_one(selector)
+        if elem:
+            title = elem.get_text(strip=True)
+            if title:
+                break
+    if not title or title == UNAVAILABLE:
+        meta_title = soup.find('meta', property='og:title')
+        if meta_title:
+            title = meta_title.get('content', UNAVAILABLE)
+
+    image_url = UNAVAILABLE
+    og_image = soup.find('meta', property='og:image')
+    if og_image:
+        image_url = og_image.get('content', UNAVAILABLE)
+    else:
+        img = soup.find('img')
+        if img and img.get('src'):
+            image_url = img.get('src')
+            if not image_url.startswith('http'):
+                image_url = f"https://www.xiaohongshu.com{image_url}"
+
+    comments = []
+    for selector in ['[class*="comment"]', '[class*="Comment"]', '.comment-item', '[data-testid*="comment"]']:
+        for elem in soup.select(selector)[:max_comments]:
+            text = elem.get_text(strip=True)
+            if text and len(text) > 5:
+                comments.append(text)
+        if len(comments) >= max_comments:
+            break
+    if not comments:
+        for elem in soup.find_all(['div', 'span', 'p'])[:20]:
+            text = elem.get_text(strip=True)
+            if text and 10 < len(text) < 200 and text not in comments:
+                comments.append(text)
+                if len(comments) >= max_comments:
+                    break
+    return {'title': title, 'image_url': image_url, 'comments': comments[:max_comments]}
+
+
+PAGES = {
+    'class title and comment items': """
+        <html><head><title>Tab title</title>
+        <meta property="og:image" content="https://img.example/cover.jpg"></head>
+        <body><div class="note"><span class="title main">  早八通勤妆 </span>
+        <div class="comments-container">
+          <div class="comment-item"><span class="name">a</span><span class="content">好喜欢这个颜色啊</span></div>
+          <div class="comment-item"><span class="content">学到了谢谢分享</span></div>
+        </div></div></body></html>
+    """,
+    'detail-title id and data-testid comments': """
+        <html><body><img src="/static/first.png">
+        <div id="detail-title">平价好物合集</div>
+        <ul><li data-testid="note-comment">这个色号是多少呀</li>
+            <li data-testid="note-comment">ok</li>
+            <li data-testid="note-comment">已经收藏了，周末去买</li></ul>
+        </body></html>
+    """,
+    'h1 and CamelCase comment classes': """
+        <html><body><h1>Weekend <b>skincare</b> routine</h1>
+        <div class="NoteCommentItem">Great tips, thank you!</div>
+        <div class="NoteCommentItem">Where is the serum from?</div></body></html>
+    """,
+    'substring title class, og:title ignored when a title exists': """
+        <html><head><meta property="og:title" content="OG title"></head>
+        <body><p class="note-title-text">秋冬护肤清单</p>
+        <div><span>这是一段足够长的正文内容用于测试</span></div></body></html>
+    """,
+    'empty title falls back to og:title; generic text as comments': """
+        <html><head><meta property="og:title" content="OG only title"></head>
+        <body><div class="title"></div>
+        <div><p>Short</p><p>This paragraph is long enough to count.</p></div>
+        <span>Another sentence that could be a comment.</span></body></html>
+    """,
+}
+
+
+@pytest.mark.parametrize('name', PAGES)
+def test_dom_extraction_matches_beautifulsoup(name):
+    pytest.importorskip('bs4')
+    html = PAGES[name]
+    record = extract_page(html, max_comments=3)
+    assert {key: record[key] for key in ('title', 'image_url', 'comments')} == bs4_extract(html)
+
+
+def test_dom_extraction_of_empty_or_broken_pages():
+    for html in ('', None, '<html></html>'):
+        record = extract_page(html)
+        assert record['title'] == UNAVAILABLE
+        assert record['comments'] == []
+
+
+def test_post_links_prefer_explore_paths():
+    html = """
+        <a href="/user/profile/1">profile</a>
+        <a href="/explore/aaa?xsec_token=t">a</a>
+        <a href="https://www.xiaohongshu.com/explore/bbb">b</a>
+        <a href="/explore/aaa?xsec_token=t">a again</a>
+        <a href="/Explore-more">loose</a>
+    """
+    links = extract_page(html, max_comments=0, max_links=5)['links']
+    assert [link.rsplit('/', 1)[-1] for link in links] == ['aaa?xsec_token=t', 'bbb', 'Explore-more']
+
+    cards = extract_search_cards(html, 2)
+    assert [card['note_id'] for card in cards] == ['aaa', 'bbb']
+    assert cards[0]['likes'] == 0
+
+
+def test_post_without_state_uses_the_dom():
+    post = extract_post(PAGES['class title and comment items'], max_comments=1)
+    assert post['title'] == '早八通勤妆'
+    assert post['image_url'] == 'https://img.example/cover.jpg'
+    # '[class*="comment"]' matches the container first, as it always has
+    assert post['comments'] == ['a好喜欢这个颜色啊学到了谢谢分享']
+    assert (post['note_id'], post['likes']) == ('', 0)
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('1.2万', 12000),
+    ('3k', 3000),
+    ('10w+', 100000),
+    ('2.5W', 25000),
+    ('1亿', 100000000),
+    ('1,234', 1234),
+    ('  87 ', 87),
+    (42, 42),
+    (3.9, 3),
+    (None, 0),
+    ('', 0),
+    ('赞', 0),
+])
+def test_parse_count(value, expected):
+    assert parse_count(value) == expected
+
+
+@pytest.fixture(scope='module')
+def fake_site():
+    with FakeRednoteServer(num_notes=12, comments_per_note=5, page_kb=64) as server:
+        yield server
+
+
+def test_search_cards_come_from_the_state(fake_site):
+    cards = extract_search_cards(fake_site.search_page(), 10)
+
+    assert [card['note_id'] for card in cards] == [synthetic_note_id(i) for i in range(10)]
+    first = cards[0]
+    assert first['url'].endswith(f"/explore/{first['note_id']}?xsec_token=tok0&xsec_source=pc_search")
+    assert first['image_url'] == f"{fake_site.url}/img/{first['note_id']}-0.jpg"
+    assert first['title'].startswith('【')
+    assert first['likes'] > 0 and first['published_at'] > 0
+
+
+def test_scrolled_feed_dump_wins_over_the_initial_state():
+    feeds = [{'id': 'n2', 'noteCard': {'displayTitle': 'loaded later', 'interactInfo': {'likedCount': '1.5万'}}},
+             {'id': 'n2', 'noteCard': {'displayTitle': 'duplicate'}}]
+    html = (
+        '<script>window.__INITIAL_STATE__={"search":{"feeds":[{"id":"n1","noteCard":{"displayTitle":"first"}}]}}'
+        f'</script><script id="{FEED_STATE_ID}" type="application/json">{json.dumps(feeds)}</script>'
+    )
+    cards = extract_search_cards(html, 10)
+    assert [(card['note_id'], card['title'], card['likes']) for card in cards] == [('n2', 'loaded later', 15000)]
+
+
+def test_post_comes_from_the_state(fake_site):
+    note_id = synthetic_note_id(3)
+    page = fake_site.note_page(note_id)
+    post = extract_post(page, max_comments=3)
+
+    state = find_initial_state(page)['note']['noteDetailMap'][note_id]
+    note = state['note']
+    assert post['note_id'] == note_id
+    assert post['title'] == note['title']
+    assert post['image_urls'] == [image['urlDefault'] for image in note['imageList']]
+    assert post['comments'] == [comment['content'] for comment in state['comments']['list'][:3]]
+    assert post['likes'] == parse_count(note['interactInfo']['likedCount'])
+    assert post['collects'] == parse_count(note['interactInfo']['collectedCount'])
+
+
+def test_state_with_vue_refs_and_undefined():
+    html = (
+        '<html><head><title>t</title></head><body><script>window.__INITIAL_STATE__='
+        '{"note":{"currentNoteId":{"_value":"abc"},"noteDetailMap":{"_rawValue":{"abc":{"note":'
+        '{"noteId":"abc","title":"","desc":"desc used as title","imageList":[{"infoList":[{"url":"http://i/1"}]}],'
+        '"interactInfo":{"likedCount":"2k"},"time":undefined},"comments":{"list":[]}}}}}};</script>'
+        '<div data-testid="comment">a comment from the DOM</div></body></html>'
+    )
+    post = extract_post(html)
+    assert (post['note_id'], post['title'], post['image_url']) == ('abc', 'desc used as title', 'http://i/1')
+    assert post['likes'] == 2000 and post['published_at'] == 0
+    # An empty comment list in the state is kept; the DOM is not guessed at
+    assert post['comments'] == []
+
+
+def test_max_comments_zero_reads_no_comments(fake_site):
+    page = fake_site.note_page(synthetic_note_id(3))
+    assert extract_post(page, max_comments=0)['comments'] == []
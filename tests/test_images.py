@@ -0,0 +1,123 @@
+import asyncio
+import io
+import os
+
+import pytest
+from PIL import Image, ImageEnhance
+
+from benchmarks.fake_server import FakeRednoteServer, synthetic_note_id
+from src.images import ImageStore, dhash, hamming
+from src.store import PostStore
+
+
+@pytest.fixture
+def server():
+    with FakeRednoteServer(num_notes=5) as server:
+        yield server
+
+
+def jpeg(image: Image.Image, quality: int = 90) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def served_image(server, note: int, index: int) -> Image.Image:
+    return Image.open(io.BytesIO(server.image(synthetic_note_id(note), index)))
+
+
+def test_fake_server_serves_note_images(server):
+    status, body = server.respond(f"/img/{synthetic_note_id(0)}-2.jpg")
+    assert status == 200
+    assert Image.open(io.BytesIO(body)).format == 'JPEG'
+    assert server.respond(f"/img/{synthetic_note_id(0)}-2.jpg")[1] == body
+    assert server.respond(f"/img/{synthetic_note_id(99)}-0.jpg")[0] == 404
+
+
+def test_identical_content_is_stored_once(tmp_path, server):
+    store = ImageStore(str(tmp_path))
+    url = f"{server.url}/img/{synthetic_note_id(0)}-0.jpg"
+    # The same bytes behind a second URL, as when a CDN serves one image under two names
+    mirror = f"{server.url}/img/{synthetic_note_id(0)}-0.jpg?imageView2"
+
+    hashes = asyncio.run(store.download({'a': [url], 'b': [mirror]}))
+
+    assert hashes['a'] == hashes['b']
+    assert store.downloaded == 2
+    files = [name for _, _, names in os.walk(tmp_path / 'full') for name in names]
+    assert files == [f"{hashes['a'][0]}.jpg"]
+
+
+def test_thumbnail_is_written_and_downscaled(tmp_path):
+    store = ImageStore(str(tmp_path), thumbnail_size=32)
+    sha256 = store.add('http://example.com/big.png', jpeg(Image.new('RGB', (300, 150), 'red')))
+
+    image = store.get(sha256)
+    assert (image['width'], image['height']) == (300, 150)
+    with Image.open(image['thumb_path']) as thumb:
+        assert thumb.format == 'JPEG'
+        assert thumb.size == (32, 16)
+
+
+def test_url_index_skips_known_urls(tmp_path, server):
+    urls = [f"{server.url}/img/{synthetic_note_id(1)}-{i}.jpg" for i in range(3)]
+    first = asyncio.run(ImageStore(str(tmp_path)).download({'n': urls}))
+    requests = server.requests
+
+    # A new store on the same directory reads the index back from disk
+    store = ImageStore(str(tmp_path))
+    assert store.lookup_url(urls[1]) == first['n'][1]
+    again = asyncio.run(store.download({'n': urls, 'm': urls[:1]}))
+
+    assert again == {'n': first['n'], 'm': first['n'][:1]}
+    assert server.requests == requests
+    assert (store.downloaded, store.reused) == (0, 3)
+
+
+def test_oversized_images_are_skipped(tmp_path, server, monkeypatch):
+    # Served images are 96x128; Pillow refuses anything over twice the limit
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1000)
+    urls = {note: [f"{server.url}/img/{synthetic_note_id(note)}-0.jpg"] for note in range(2)}
+    store = ImageStore(str(tmp_path))
+
+    assert asyncio.run(store.download(urls)) == {0: [], 1: []}
+    assert store.downloaded == 0
+
+
+def test_near_identical_images_are_grouped(tmp_path, server):
+    original = served_image(server, 2, 0)
+    edited = ImageEnhance.Brightness(original).enhance(1.1).resize((192, 256))
+    other = served_image(server, 3, 0)
+    assert hamming(dhash(original), dhash(edited)) <= 6
+
+    store = ImageStore(str(tmp_path))
+    a = store.add('http://cdn/a.jpg', jpeg(original))
+    b = store.add('http://cdn/b.jpg', jpeg(edited, quality=60))
+    c = store.add('http://cdn/c.jpg', jpeg(other))
+
+    assert a != b
+    assert store.near_duplicates([a, b, c]) == [[a, b]]
+    assert store.near_duplicates([a, c]) == []
+
+
+def test_reposts_are_recorded_with_the_post(tmp_path, server):
+    images = ImageStore(str(tmp_path / 'images'))
+    original = served_image(server, 4, 0)
+    first = images.add('http://cdn/1.jpg', jpeg(original))
+    repost = images.add('http://cdn/2.jpg', jpeg(original.resize((48, 64)), quality=70))
+    unrelated = images.add('http://cdn/3.jpg', jpeg(served_image(server, 1, 1)))
+
+    duplicate_of = images.duplicate_notes({'top': [first], 'other': [unrelated], 'copy': [unrelated, repost]})
+    assert duplicate_of == {'top': None, 'other': None, 'copy': 'other'}
+
+    posts = PostStore(str(tmp_path / 'posts.db'))
+    posts.upsert({'note_id': note_id, 'url': f"http://site/{note_id}", 'title': note_id}
+                 for note_id in duplicate_of)
+    posts.set_topic_ranking('t', list(duplicate_of))
+    posts.set_duplicates(duplicate_of)
+    csv_path = tmp_path / 't.csv'
+    posts.export_csv('t', str(csv_path))
+
+    lines = csv_path.read_text(encoding='utf-8-sig').splitlines()
+    assert lines[0].endswith(',image_path,duplicate_of')
+    assert lines[3].endswith(',,other')
@@ -0,0 +1,70 @@
+import time
+
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import Generation
+
+import src.llm_cache as llm_cache
+from src.llm_cache import SQLiteLLMCache, get_llm_cache
+
+
+def test_identical_requests_are_served_from_the_cache(tmp_path):
+    cache = SQLiteLLMCache(str(tmp_path))
+    llm = FakeMessagesListChatModel(responses=[AIMessage(content='第一'), AIMessage(content='second')],
+                                    cache=cache)
+
+    assert llm.invoke('analyze 护肤').content == '第一'
+    assert llm.invoke('analyze 护肤').content == '第一'
+    assert llm.invoke('analyze 穿搭').content == 'second'
+    assert cache.stats() == {'hits': 1, 'misses': 2, 'hit_rate': 1 / 3, 'entries': 2}
+
+    # A new process reads the same database
+    restarted = FakeMessagesListChatModel(responses=[AIMessage(content='fresh')],
+                                          cache=SQLiteLLMCache(str(tmp_path)))
+    assert restarted.invoke('analyze 护肤').content == '第一'
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = SQLiteLLMCache(str(tmp_path), ttl=-1)
+    cache.update('prompt', 'model', [Generation(text='old')])
+    assert cache.lookup('prompt', 'model') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = SQLiteLLMCache(str(tmp_path))
+    cache.update('a', 'model', [Generation(text='x' * 1000)])
+    one_entry = cache._store.totals()[1]
+    cache.max_bytes = int(one_entry * 2.5)
+    time.sleep(0.01)
+    cache.update('b', 'model', [Generation(text='y' * 1000)])
+    time.sleep(0.01)
+    assert cache.lookup('a', 'model')[0].text == 'x' * 1000
+    time.sleep(0.01)
+    cache.update('c', 'model', [Generation(text='z' * 1000)])
+
+    assert cache.lookup('b', 'model') is None
+    assert cache.lookup('a', 'model') is not None
+    assert cache.lookup('c', 'model') is not None
+    # The model is part of the key
+    assert cache.lookup('a', 'other model') is None
+
+
+def test_unreadable_entries_are_dropped_as_misses(tmp_path):
+    cache = SQLiteLLMCache(str(tmp_path))
+    cache._store.put(cache._key('prompt', 'model'), '{"not": "a generation"', 22, ttl=60)
+
+    assert cache.lookup('prompt', 'model') is None
+    assert cache.stats() == {'hits': 0, 'misses': 1, 'hit_rate': 0.0, 'entries': 0}
+
+
+def test_cache_can_be_turned_off(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, '_llm_cache', None)
+    monkeypatch.setenv('LLM_CACHE', 'off')
+    assert get_llm_cache() is None
+
+    monkeypatch.setenv('LLM_CACHE', 'on')
+    monkeypatch.setenv('LLM_CACHE_DIR', str(tmp_path))
+    cache = get_llm_cache()
+    assert cache.path == str(tmp_path / 'llm.db')
+    assert get_llm_cache() is cache
@@ -0,0 +1,115 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import src.main as main
+from src.checkpoint import STAGES, CheckpointStore
+from src.main import LazyLLM, parse_args, read_topics, run_batch, run_topic, save_result
+
+
+@pytest.fixture
+def topics_file(tmp_path):
+    path = tmp_path / 'topics.txt'
+    path.write_text('护肤\n\n# skipped\n穿搭\nbroken topic\n护肤\n', encoding='utf-8')
+    return str(path)
+
+
+@pytest.fixture
+def fake_run_topic(monkeypatch, tmp_path):
+    monkeypatch.setenv('REDNOTE_OUTPUT_DIR', str(tmp_path / 'output'))
+    llms = []
+
+    def run_topic(topic, llm, *args):
+        llms.append(llm)
+        if topic == 'broken topic':
+            raise RuntimeError('search page failed')
+        result = f"posts about {topic}"
+        return result, save_result(topic, result)
+
+    monkeypatch.setattr(main, 'run_topic', run_topic)
+    return llms
+
+
+def test_topics_come_from_argv_and_the_file(topics_file):
+    assert read_topics([' 美食 ', '护肤'], topics_file) == ['美食', '护肤', '穿搭', 'broken topic']
+
+
+def test_a_failed_topic_does_not_stop_the_batch(topics_file, fake_run_topic, tmp_path):
+    llm = object()
+    outcomes = run_batch(read_topics([], topics_file), llm, parallel=2)
+
+    assert sorted(outcomes) == ['broken topic', '护肤', '穿搭']
+    assert isinstance(outcomes['broken topic'], RuntimeError)
+    for topic in ('护肤', '穿搭'):
+        assert outcomes[topic] == str(tmp_path / 'output' / f"result_{topic}.txt")
+        assert f"posts about {topic}" in (tmp_path / 'output' / f"result_{topic}.txt").read_text(encoding='utf-8')
+    # Every topic shares the one client
+    assert fake_run_topic == [llm] * 3
+
+
+def test_batch_summary(topics_file, fake_run_topic, capsys):
+    main.main(['--topics-file', topics_file, '--parallel', '3'])
+
+    out = capsys.readouterr().out
+    assert 'Running 3 topics, 3 at a time' in out
+    assert '[failed] broken topic: search page failed' in out
+    assert 'Batch finished: 2 succeeded, 1 failed.' in out
+    assert len({id(llm) for llm in fake_run_topic}) == 1
+    assert isinstance(fake_run_topic[0], LazyLLM) and fake_run_topic[0].llm is None
+
+
+@pytest.mark.parametrize('argv', [['--max-posts', '0'], ['--parallel', '-1'], ['--max-comments', '-1'],
+                                  ['--max-posts', 'five']])
+def test_counts_out_of_range_are_rejected(argv, capsys):
+    with pytest.raises(SystemExit):
+        parse_args(argv)
+    assert argv[0] in capsys.readouterr().err
+
+
+def test_zero_comments_is_allowed():
+    args = parse_args(['--max-comments', '0', '--max-posts', '1', '--parallel', '1'])
+    assert (args.max_comments, args.max_posts, args.parallel) == (0, 1, 1)
+
+
+def test_importing_the_cli_loads_no_heavy_modules():
+    heavy = ['crewai', 'langchain_openai', 'langchain_google_genai', 'langchain_core',
+             'crawl4ai', 'pandas', 'lxml', 'src.agents', 'src.tasks', 'src.scraper']
+    script = f"import json, sys, src.main; print(json.dumps([m for m in {heavy!r} if m in sys.modules]))"
+    proc = subprocess.run([sys.executable, '-c', script], cwd=main.ROOT, capture_output=True, text=True,
+                          env=dict(os.environ, PYTHONPATH=main.ROOT))
+    assert proc.returncode == 0, proc.stderr
+    assert json.loads(proc.stdout) == []
+
+
+def test_lazy_llm_builds_the_client_once_on_first_use(monkeypatch):
+    calls = []
+    monkeypatch.setattr(main, 'get_llm', lambda use_cache: calls.append(use_cache) or object())
+
+    llm = LazyLLM(use_cache=False)
+    assert calls == [] and llm.llm is None
+
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(llm.get())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == [False]
+    assert all(client is llm.llm for client in clients)
+
+
+def test_restored_run_never_creates_the_llm(monkeypatch, tmp_path):
+    monkeypatch.setenv('REDNOTE_OUTPUT_DIR', str(tmp_path / 'output'))
+    checkpoints = CheckpointStore(str(tmp_path / 'checkpoints'))
+    monkeypatch.setattr(main, 'CheckpointStore', lambda: checkpoints)
+    monkeypatch.setattr(main, 'get_llm', lambda use_cache: pytest.fail('LLM created'))
+    inputs = {'max_posts': 5, 'max_comments': 3}
+    for stage in STAGES:
+        checkpoints.save('护肤', inputs, stage, f"{stage} output")
+
+    result, _ = run_topic('护肤', LazyLLM(), verbose=False, resume=True)
+    assert result == 'create output'
@@ -0,0 +1,77 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import src.parsing as parsing
+from benchmarks.fake_server import FakeRednoteServer, synthetic_note_id
+from src.extraction import extract_post, parse_count
+from src.parsing import create_parse_executor, parse, parse_stats
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Use a fresh pool per test and shut it down afterwards."""
+    monkeypatch.setattr(parsing, '_executor', None)
+    yield
+    if parsing._executor is not None:
+        parsing._executor.shutdown(wait=True)
+
+
+@pytest.fixture(scope='module')
+def note_page():
+    with FakeRednoteServer(num_notes=1, page_kb=64) as server:
+        return server.note_page(synthetic_note_id(0))
+
+
+@pytest.mark.parametrize('kind', ['inline', 'thread', 'process'])
+def test_every_executor_gives_the_inline_result(kind, note_page, pool, monkeypatch):
+    monkeypatch.setenv('REDNOTE_PARSE_EXECUTOR', kind)
+    monkeypatch.setenv('REDNOTE_PARSE_WORKERS', '2')
+    before = parse_stats()
+
+    result = asyncio.run(parse(extract_post, note_page, 3))
+
+    assert result == extract_post(note_page, 3)
+    assert result['title']
+    assert (parsing._executor is None) == (kind == 'inline')
+    after = parse_stats()
+    assert after['calls'] == before['calls'] + 1
+    assert after['cpu_seconds'] > before['cpu_seconds']
+
+
+def test_unknown_executor_is_rejected():
+    with pytest.raises(ValueError, match='Unknown parse executor'):
+        create_parse_executor('fork', 1)
+
+
+def test_process_pool_is_the_default(pool, monkeypatch):
+    monkeypatch.delenv('REDNOTE_PARSE_EXECUTOR', raising=False)
+    monkeypatch.setenv('REDNOTE_PARSE_WORKERS', '1')
+    assert isinstance(parsing.get_parse_executor(), ProcessPoolExecutor)
+
+
+def test_broken_process_pool_falls_back_to_threads(pool, monkeypatch, capsys):
+    class BrokenPool(Executor):
+        def submit(self, fn, *args, **kwargs):
+            raise BrokenProcessPool('worker failed to start')
+
+    broken = BrokenPool()
+    monkeypatch.setattr(parsing, '_executor', broken)
+
+    assert asyncio.run(parse(parse_count, '1.2万')) == 12000
+    assert isinstance(parsing._executor, ThreadPoolExecutor)
+    assert asyncio.run(parse(parse_count, '3k')) == 3000
+    assert 'parsing in threads instead' in capsys.readouterr().err
+
+
+def test_process_pool_that_cannot_start_falls_back_to_threads(pool, monkeypatch, capsys):
+    monkeypatch.setenv('REDNOTE_PARSE_EXECUTOR', 'process')
+
+    def no_semaphores(*args, **kwargs):
+        raise OSError('sem_open is not implemented')
+    monkeypatch.setattr(parsing, 'ProcessPoolExecutor', no_semaphores)
+
+    assert isinstance(parsing.get_parse_executor(), ThreadPoolExecutor)
+    assert 'sem_open' in capsys.readouterr().err
@@ -0,0 +1,51 @@
+import math
+import random
+
+from src.ranking import engagement_score, top_k
+
+
+NOW = 1_700_000_000.0
+DAY_MS = 86_400_000
+
+
+def card(name, likes=0, collects=0, comments=0, age_days=None):
+    published_at = int(NOW * 1000 - age_days * DAY_MS) if age_days is not None else 0
+    return {'name': name, 'likes': likes, 'collects': collects, 'comment_count': comments,
+            'published_at': published_at}
+
+
+def test_score_weights_collects_and_comments_over_likes():
+    assert engagement_score(card('a', likes=10), NOW) == math.log1p(10)
+    assert engagement_score(card('b', collects=10), NOW) == math.log1p(20)
+    assert engagement_score(card('c', comments=10), NOW) == math.log1p(30)
+    assert engagement_score({}, NOW) == 0.0
+
+
+def test_score_halves_every_half_life():
+    fresh = engagement_score(card('a', likes=100, age_days=0), NOW)
+    month = engagement_score(card('a', likes=100, age_days=30), NOW)
+    assert fresh == math.log1p(100)
+    assert math.isclose(month, fresh / 2)
+    # Unknown publish times and future timestamps are not decayed
+    assert engagement_score(card('a', likes=100), NOW) == fresh
+    assert engagement_score(card('a', likes=100, age_days=-2), NOW) == fresh
+    assert engagement_score(card('a', likes=100, age_days=30), NOW, half_life_days=0) == fresh
+
+
+def test_top_k_matches_a_full_sort():
+    rng = random.Random(7)
+    cards = [card(str(i), likes=rng.randint(0, 50), collects=rng.randint(0, 5)) for i in range(500)]
+    expected = sorted(cards, key=lambda c: engagement_score(c), reverse=True)[:20]
+    assert top_k(cards, 20) == expected
+
+
+def test_top_k_keeps_arrival_order_on_ties():
+    cards = [card('a', likes=5), card('b', likes=9), card('c', likes=5), card('d', likes=5)]
+    assert [c['name'] for c in top_k(cards, 3)] == ['b', 'a', 'c']
+
+
+def test_top_k_edge_cases():
+    cards = [card('a', likes=1), card('b', likes=2)]
+    assert top_k(cards, 0) == []
+    assert [c['name'] for c in top_k(iter(cards), 10)] == ['b', 'a']
+    assert [c['name'] for c in top_k(cards, 1, score_fn=lambda c: -c['likes'])] == ['a']
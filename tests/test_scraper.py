@@ -0,0 +1,189 @@
+import asyncio
+import csv
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+import pytest
+
+import src.cache as cache
+import src.dedup as dedup
+import src.scraper as scraper
+import src.store as store
+import src.throttle as throttle
+from benchmarks.fake_server import FakeRednoteServer, synthetic_note_id
+from src.extraction import extract_post, extract_search_cards
+from src.ranking import top_k
+from src.scraper import MAX_CANDIDATES, MIN_CANDIDATES, build_scroll_js, candidate_count, scrape_rednote
+from src.store import get_post_store
+from src.throttle import FetchScheduler
+
+
+class FakeService:
+    """
+    Answers fetches from a FakeRednoteServer without a browser or sockets.
+    Note pages can be delayed, fail or raise, and the number of fetches in
+    flight at once is recorded.
+    """
+
+    def __init__(self, server, failing=(), raising=(), delays=None):
+        self.server = server
+        self.failing = set(failing)
+        self.raising = set(raising)
+        self.delays = delays or {}
+        self.fetched = []
+        self.options = []
+        self.active = 0
+        self.max_active = 0
+
+    async def fetch(self, url, session=None, **options):
+        parsed = urlparse(url)
+        note_id = parsed.path.strip('/').split('/')[-1]
+        self.fetched.append(url)
+        self.options.append(options)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delays.get(note_id, 0))
+        finally:
+            self.active -= 1
+        if note_id in self.raising:
+            raise RuntimeError('browser tab crashed')
+        if note_id in self.failing:
+            return SimpleNamespace(success=False, html='', status_code=404, error_message='not found')
+        status, body = self.server.respond(f"{parsed.path}?{parsed.query}")
+        return SimpleNamespace(success=status == 200, html=body, status_code=status, error_message='')
+
+
+@pytest.fixture
+def server():
+    fake = FakeRednoteServer(num_notes=4, comments_per_note=3, page_kb=4)
+    yield fake
+    fake.stop()
+
+
+def ranked_note_ids(server, limit):
+    return [card['note_id'] for card in top_k(extract_search_cards(server.search_page(), limit), limit)]
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setenv('REDNOTE_OUTPUT_DIR', str(tmp_path / 'output'))
+    monkeypatch.setenv('REDNOTE_STORE_PATH', str(tmp_path / 'posts.db'))
+    monkeypatch.setenv('REDNOTE_DEDUP_PATH', str(tmp_path / 'dedup.db'))
+    monkeypatch.setenv('REDNOTE_CACHE', 'off')
+    monkeypatch.setattr(store, '_post_store', None)
+    monkeypatch.setattr(dedup, '_post_index', None)
+    monkeypatch.setattr(cache, '_page_cache', None)
+    monkeypatch.setattr(throttle, '_scheduler', FetchScheduler(rate=1000, burst=100, max_retries=0))
+
+
+def read_csv(tmp_path, topic):
+    with open(tmp_path / 'output' / f"scraped_data_{topic}.csv", encoding='utf-8-sig') as f:
+        return list(csv.DictReader(f))
+
+
+def test_failed_posts_are_left_out_of_the_csv(server, tmp_path):
+    failing = synthetic_note_id(1)
+    # A copy stored by an earlier run with fewer comments is stale now
+    get_post_store().upsert([{'note_id': failing, 'url': 'http://old', 'title': 'stale title'}], max_comments=0)
+
+    summary = asyncio.run(scrape_rednote(FakeService(server, failing=[failing]), 'topic', max_posts=4))
+
+    rows = read_csv(tmp_path, 'topic')
+    assert [row['post_number'] for row in rows] == ['1', '2', '3']
+    assert failing not in {row['note_id'] for row in rows}
+    assert 'stale title' not in {row['title'] for row in rows}
+    assert "Successfully scraped 3 posts" in summary
+    assert "1 posts could not be scraped" in summary and failing in summary
+
+
+def test_candidate_count_follows_max_posts():
+    assert candidate_count(5) == MIN_CANDIDATES
+    assert candidate_count(30) == 90
+    assert candidate_count(100) == MAX_CANDIDATES
+    # An explicit count is capped too, but never below the posts asked for
+    assert candidate_count(5, 1000) == MAX_CANDIDATES
+    assert candidate_count(300, 50) == 300
+
+
+def test_concurrent_fetches_keep_the_ranking_order(server, tmp_path):
+    ranked = ranked_note_ids(server, 4)
+    # The best-ranked post is the slowest to load, so pages finish in reverse
+    delays = {note_id: 0.02 * (len(ranked) - i) for i, note_id in enumerate(ranked)}
+    service = FakeService(server, delays=delays)
+
+    asyncio.run(scrape_rednote(service, 'topic', max_posts=4, max_concurrency=4))
+
+    rows = read_csv(tmp_path, 'topic')
+    assert [row['note_id'] for row in rows] == ranked
+    assert [row['post_number'] for row in rows] == ['1', '2', '3', '4']
+    assert service.max_active == 4
+
+
+def test_semaphore_caps_fetches_in_flight(server):
+    delays = {synthetic_note_id(i): 0.02 for i in range(4)}
+    service = FakeService(server, delays=delays)
+
+    asyncio.run(scrape_rednote(service, 'topic', max_posts=4, max_concurrency=2))
+
+    assert len(service.fetched) == 5
+    assert service.max_active == 2
+
+
+def test_one_crashed_fetch_does_not_sink_the_others(server, tmp_path):
+    ranked = ranked_note_ids(server, 4)
+    service = FakeService(server, raising=[ranked[0]], delays={ranked[0]: 0.01})
+
+    summary = asyncio.run(scrape_rednote(service, 'topic', max_posts=4))
+
+    assert [row['note_id'] for row in read_csv(tmp_path, 'topic')] == ranked[1:]
+    assert 'browser tab crashed' in summary
+
+
+def test_scroll_script_stops_at_the_target():
+    script = build_scroll_js(37)
+    assert 'const target = 37;' in script
+    # Scrolling also stops once a scroll adds no new links
+    assert 'if (!grown) break;' in script
+
+
+def test_counts_reach_the_search_page_extraction_and_the_store(server, tmp_path, monkeypatch):
+    # Keep every comment, so the counts below are the caps alone
+    monkeypatch.setattr(scraper, 'dedup_texts', lambda texts: [True] * len(texts))
+    service = FakeService(server)
+    asyncio.run(scrape_rednote(service, 'topic', max_posts=3, max_comments=2))
+
+    assert f"const target = {MIN_CANDIDATES};" in service.options[0]['js_code']
+    rows = read_csv(tmp_path, 'topic')
+    assert len(rows) == 3
+    assert all(len(row['comments'].split(' | ')) == 2 for row in rows)
+    note_ids = [row['note_id'] for row in rows]
+    assert sorted(get_post_store().get_fresh(note_ids, max_comments=2)) == sorted(note_ids)
+    assert get_post_store().get_fresh(note_ids, max_comments=3) == {}
+
+    # Fewer comments are served from the store; more re-fetch the pages
+    fetched = len(service.fetched)
+    asyncio.run(scrape_rednote(service, 'topic', max_posts=3, max_comments=1))
+    assert len(service.fetched) == fetched + 1
+    assert all(' | ' not in row['comments'] for row in read_csv(tmp_path, 'topic'))
+    asyncio.run(scrape_rednote(service, 'topic', max_posts=3, max_comments=0))
+    assert {row['comments'] for row in read_csv(tmp_path, 'topic')} == {'No comments found'}
+    fetched += 1
+    asyncio.run(scrape_rednote(service, 'topic', max_posts=3, max_comments=3))
+    assert len(service.fetched) == fetched + 1 + 4
+    assert all(len(row['comments'].split(' | ')) == 3 for row in read_csv(tmp_path, 'topic'))
+
+
+def test_duplicate_comments_are_dropped_before_the_store(server, tmp_path):
+    ranked = ranked_note_ids(server, 4)
+    served = [extract_post(server.note_page(note_id), 3)['comments'] for note_id in ranked]
+    # The stand-in server draws comments from a short list of phrases
+    assert len({c for comments in served for c in comments}) < sum(map(len, served))
+
+    asyncio.run(scrape_rednote(FakeService(server), 'topic', max_posts=4, max_comments=3))
+
+    rows = read_csv(tmp_path, 'topic')
+    comments = [c for row in rows for c in row['comments'].split(' | ') if c != 'No comments found']
+    assert len(comments) == len(set(comments))
+    stored = get_post_store().get_fresh(ranked, max_comments=3)
+    assert {row['note_id']: row['comments'] for row in rows} == {n: p['comments'] for n, p in stored.items()}
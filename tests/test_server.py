@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import src.main as main
+from src.server import JOB_OPTIONS, JobQueue, JobServer, parse_job
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / 'jobs.db'))
+
+
+def options(**overrides):
+    return dict(JOB_OPTIONS, **overrides)
+
+
+def test_parse_job_fills_defaults_and_validates():
+    assert parse_job({'topic': ' 护肤 ', 'variations': 3}) == ('护肤', options(variations=3))
+    for payload, message in [
+        ([], 'JSON object'),
+        ({'topic': '  '}, 'topic'),
+        ({'topic': 't', 'max_post': 3}, 'Unknown option'),
+        ({'topic': 't', 'max_posts': 0}, 'max_posts'),
+        ({'topic': 't', 'max_comments': True}, 'max_comments'),
+        ({'topic': 't', 'resume': 'yes'}, 'resume'),
+        ({'topic': 't', 'from_stage': 'publish'}, 'from_stage'),
+    ]:
+        with pytest.raises(ValueError, match=message):
+            parse_job(payload)
+
+
+def test_claim_merges_jobs_with_the_same_topic_and_options(queue):
+    a = queue.submit('护肤', options())
+    b = queue.submit('穿搭', options())
+    c = queue.submit('护肤', options())
+    d = queue.submit('护肤', options(max_posts=10))
+
+    topic, claimed_options, ids = queue.claim(timeout=0)
+    assert (topic, claimed_options, ids) == ('护肤', options(), [a, c])
+    assert queue.get(a)['merged'] is False
+    assert queue.get(c)['merged'] is True and queue.get(c)['run_id'] == a
+
+    # 护肤 is running, so its other job waits and 穿搭 goes first
+    assert queue.claim(timeout=0)[2] == [b]
+    assert queue.claim(timeout=0) is None
+
+    queue.finish([a, c], result='posts', result_file='/tmp/result.txt')
+    assert queue.claim(timeout=0)[2] == [d]
+    done = queue.get(c, with_result=True)
+    assert (done['status'], done['result'], done['result_file']) == ('done', 'posts', '/tmp/result.txt')
+    assert queue.counts() == {'queued': 0, 'running': 2, 'done': 2, 'failed': 0}
+
+
+def test_claim_waits_for_the_running_topic_to_finish(queue):
+    first = queue.submit('护肤', options())
+    queue.claim(timeout=0)
+    second = queue.submit('护肤', options(resume=True))
+
+    claimed = []
+    waiter = threading.Thread(target=lambda: claimed.append(queue.claim(timeout=5)))
+    waiter.start()
+    time.sleep(0.1)
+    assert claimed == []
+
+    queue.finish([first], error='RuntimeError: boom')
+    waiter.join(5)
+    assert claimed[0][2] == [second]
+    assert queue.get(first)['status'] == 'failed'
+    assert queue.get(first)['error'] == 'RuntimeError: boom'
+
+
+def test_interrupted_jobs_are_requeued(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    queue = JobQueue(path)
+    job_id = queue.submit('护肤', options())
+    queue.claim(timeout=0)
+
+    restarted = JobQueue(path)
+    assert restarted.requeue_interrupted() == 1
+    assert restarted.get(job_id)['status'] == 'queued'
+    assert restarted.claim(timeout=0)[2] == [job_id]
+
+
+def test_recent_lists_newest_first(queue):
+    ids = [queue.submit(f"topic {i}", options()) for i in range(3)]
+    assert [job['id'] for job in queue.recent(limit=2)] == ids[:0:-1]
+    assert queue.get('missing') is None
+
+
+def request(url, payload=None):
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data), timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_http_api_runs_jobs(queue, monkeypatch):
+    release = threading.Event()
+    runs = []
+
+    def run_topic(topic, llm, verbose=True, **kwargs):
+        runs.append((topic, kwargs))
+        release.wait(5)
+        return f"posts about {topic}", f"/tmp/result_{topic}.txt"
+
+    monkeypatch.setattr(main, 'run_topic', run_topic)
+    server = JobServer(queue, workers=1, port=0)
+    server.start_workers()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        status, job = request(f"{server.url}/jobs", {'topic': '护肤', 'max_posts': 3})
+        assert (status, job['status']) == (202, 'queued')
+        assert request(f"{server.url}/jobs", {'topic': ''})[0] == 400
+        assert request(f"{server.url}/jobs/{job['id']}/result")[0] == 409
+
+        release.set()
+        for _ in range(50):
+            status, body = request(f"{server.url}/jobs/{job['id']}/result")
+            if status == 200:
+                break
+            time.sleep(0.1)
+        assert (status, body['result']) == (200, 'posts about 护肤')
+        assert runs == [('护肤', options(max_posts=3))]
+        assert request(f"{server.url}/jobs")[1]['counts']['done'] == 1
+        assert request(f"{server.url}/jobs/unknown")[0] == 404
+    finally:
+        release.set()
+        server.stop()
@@ -0,0 +1,62 @@
+import sqlite3
+import time
+
+from src.store import PostStore
+
+
+def post(note_id: str, **fields) -> dict:
+    return dict({'note_id': note_id, 'url': f"http://site/explore/{note_id}", 'title': note_id,
+                 'likes': 10, 'comments': 'a | b | c'}, **fields)
+
+
+def test_fresh_posts_are_returned(tmp_path):
+    store = PostStore(str(tmp_path / 'posts.db'))
+    store.upsert([post('a'), post('b')], max_comments=3)
+
+    fresh = store.get_fresh(['a', 'b', 'c'], max_age=60, max_comments=3)
+    assert sorted(fresh) == ['a', 'b']
+    assert fresh['a']['comments'] == 'a | b | c'
+    assert store.get_fresh(['a'], max_age=-1, max_comments=3) == {}
+
+
+def test_posts_fetched_with_fewer_comments_are_stale(tmp_path):
+    store = PostStore(str(tmp_path / 'posts.db'))
+    store.upsert([post('a')], max_comments=3)
+    store.upsert([post('b')], max_comments=10)
+
+    assert sorted(store.get_fresh(['a', 'b'], max_comments=2)) == ['a', 'b']
+    assert sorted(store.get_fresh(['a', 'b'], max_comments=10)) == ['b']
+
+    # Re-fetching with the larger cap makes the post fresh again
+    store.upsert([post('a', comments='a | b | c | d')], max_comments=10)
+    assert store.get_fresh(['a'], max_comments=10)['a']['comments'] == 'a | b | c | d'
+
+
+def test_old_store_is_migrated(tmp_path):
+    path = str(tmp_path / 'posts.db')
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE posts (note_id TEXT PRIMARY KEY, url TEXT NOT NULL, title TEXT, image_url TEXT, "
+        "likes INTEGER DEFAULT 0, collects INTEGER DEFAULT 0, comment_count INTEGER DEFAULT 0, "
+        "shares INTEGER DEFAULT 0, comments TEXT, fetched_at REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO posts (note_id, url, fetched_at) VALUES ('old', 'http://site/old', ?)", (time.time(),))
+    conn.commit()
+    conn.close()
+
+    store = PostStore(path)
+    # The comment cap of a legacy row is unknown, so it only serves runs without comments
+    assert list(store.get_fresh(['old'], max_comments=0)) == ['old']
+    assert store.get_fresh(['old'], max_comments=1) == {}
+
+
+def test_export_keeps_topic_ranking(tmp_path):
+    store = PostStore(str(tmp_path / 'posts.db'))
+    store.upsert([post('a'), post('b'), post('c')], max_comments=3)
+    store.set_topic_ranking('t', ['b', 'a', 'c'])
+    store.set_topic_ranking('t', ['c', 'b'])
+
+    csv_path = tmp_path / 't.csv'
+    assert store.export_csv('t', str(csv_path)) == 2
+    rows = csv_path.read_text(encoding='utf-8-sig').splitlines()[1:]
+    assert [row.split(',')[:2] for row in rows] == [['1', 'c'], ['2', 'b']]
@@ -0,0 +1,102 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.fake_server import FakeRednoteServer, synthetic_note_id
+from src.throttle import BlockedError, FetchScheduler, looks_blocked
+
+
+def ok(html: str = '<html></html>'):
+    return SimpleNamespace(success=True, html=html, status_code=200, error_message='')
+
+
+def test_note_text_mentioning_login_is_not_a_block():
+    with FakeRednoteServer(num_notes=1, page_kb=4) as server:
+        page = server.note_page(synthetic_note_id(0))
+    page = page.replace('今天来分享一下我的心得', '评论区说请先登录才能看，其实不用，安全验证也没遇到')
+
+    assert not looks_blocked(page)
+
+
+@pytest.mark.parametrize('html', [
+    '<html><head><title>安全验证 - 小红书</title></head><body>'
+    '<script>window.__INITIAL_STATE__={}</script></body></html>',
+    '<html><body><div class="login-box">登录后查看更多内容</div></body></html>',
+    '<html><body><div id="app"></div><script>location.href="/website-login/captcha?redirect=x"</script></body></html>',
+])
+def test_login_walls_and_captchas_are_blocks(html):
+    assert looks_blocked(html)
+
+
+def test_block_opens_the_breaker():
+    scheduler = FetchScheduler(rate=100, cooldown=60)
+
+    async def fetch_wall():
+        return ok('<div class="red-captcha"></div>')
+
+    async def run():
+        with pytest.raises(BlockedError):
+            await scheduler.fetch('http://site/a', fetch_wall)
+        with pytest.raises(BlockedError):
+            await scheduler.fetch('http://site/b', fetch_wall)
+
+    asyncio.run(run())
+    assert scheduler.blocks == 1
+    assert scheduler.breaker.is_open
+
+
+def test_slot_is_taken_after_the_rate_token():
+    # One token up front, then one every 0.1 s: the second request waits
+    # for its token without holding the only slot
+    scheduler = FetchScheduler(rate=10, burst=1)
+    events = []
+
+    async def run():
+        slot = asyncio.Semaphore(1)
+
+        async def fetch(name):
+            events.append(f"{name} in flight, slot free: {not slot.locked()}")
+            return ok()
+
+        async def waiting_request():
+            await scheduler.fetch('http://site/2', lambda: fetch('paced'), slot)
+
+        async def cache_hit_needing_the_slot():
+            await asyncio.sleep(0.02)
+            async with slot:
+                events.append('other work got the slot')
+
+        await scheduler.fetch('http://site/1', lambda: fetch('first'), slot)
+        await asyncio.gather(waiting_request(), cache_hit_needing_the_slot())
+
+    asyncio.run(run())
+    assert events == [
+        'first in flight, slot free: False',
+        'other work got the slot',
+        'paced in flight, slot free: False',
+    ]
+
+
+def test_backoff_releases_the_slot():
+    scheduler = FetchScheduler(rate=1000, burst=10, max_retries=1, base_delay=0.05)
+    held_during_backoff = []
+
+    async def run():
+        slot = asyncio.Semaphore(1)
+        attempts = []
+
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                asyncio.get_running_loop().call_later(0.01, lambda: held_during_backoff.append(slot.locked()))
+                return SimpleNamespace(success=False, html='', status_code=503, error_message='busy')
+            return ok()
+
+        scheduler._backoff = lambda attempt: 0.05
+        result = await scheduler.fetch('http://site/x', flaky, slot)
+        assert result.success
+
+    asyncio.run(run())
+    assert held_during_backoff == [False]
+    assert scheduler.retries == 1
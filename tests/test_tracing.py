@@ -0,0 +1,139 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage
+
+import src.tracing as tracing
+from src.llm_tracing import TracingCallbackHandler
+from src.main import write_trace
+from src.tracing import Tracer, count, span
+
+
+@pytest.fixture
+def tracer(monkeypatch):
+    tracer = Tracer()
+    monkeypatch.setattr(tracing, '_tracer', tracer)
+    return tracer
+
+
+def by_name(tracer):
+    return {s.name: s for s in tracer.spans}
+
+
+def test_disabled_tracing_records_nothing(monkeypatch):
+    monkeypatch.setattr(tracing, '_tracer', None)
+    with span('work') as s:
+        s.set(bytes=1)
+        count('pages')
+    assert s is tracing._NOOP_SPAN
+    assert tracing.get_tracer() is None
+
+
+def test_spans_nest_and_record_errors(tracer):
+    with span('run', 'app', topic='t'):
+        with span('search', 'scrape') as search:
+            search.set(candidates=3)
+            count('pages', 2)
+            count('pages')
+        with pytest.raises(RuntimeError):
+            with span('post', 'scrape'):
+                raise RuntimeError('boom')
+
+    spans = by_name(tracer)
+    assert spans['search'].path == ('run', 'search')
+    assert spans['search'].attrs == {'candidates': 3}
+    assert spans['post'].attrs['error'] == 'RuntimeError: boom'
+    assert spans['run'].attrs == {'topic': 't'}
+    assert tracer.counters == {'pages': 3}
+
+
+def test_concurrent_tasks_and_the_crawler_loop_keep_their_parent(tracer):
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    async def fetch(name):
+        with span(f"fetch.{name}"):
+            await asyncio.sleep(0.01)
+
+    async def scrape():
+        with span('posts'):
+            await asyncio.gather(fetch('a'), fetch('b'))
+
+    try:
+        with span('tool'):
+            # Submitted from this thread, run on the loop thread
+            asyncio.run_coroutine_threadsafe(scrape(), loop).result(5)
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+        loop.close()
+
+    spans = by_name(tracer)
+    assert spans['fetch.a'].path == ('tool', 'posts', 'fetch.a')
+    assert spans['fetch.b'].path == ('tool', 'posts', 'fetch.b')
+    # Overlapping tasks get tracks of their own
+    assert spans['fetch.a'].track != spans['fetch.b'].track != spans['tool'].track
+
+
+def test_chrome_and_json_export(tracer, tmp_path):
+    with span('run'):
+        with span('fetch', 'crawler', url='http://site/a'):
+            count('crawler.bytes', 1024)
+
+    with open(tracer.export(str(tmp_path / 'trace.json')), encoding='utf-8') as f:
+        chrome = json.load(f)
+    phases = {}
+    for event in chrome['traceEvents']:
+        phases.setdefault(event['ph'], []).append(event)
+    assert [e['name'] for e in phases['X']] == ['run', 'fetch']
+    fetch = phases['X'][1]
+    assert fetch['cat'] == 'crawler' and fetch['args'] == {'url': 'http://site/a'}
+    assert fetch['ts'] >= phases['X'][0]['ts'] and fetch['dur'] >= 0
+    assert phases['M'][0]['args']['name'] == threading.current_thread().name
+    assert [(e['name'], e['args']['value']) for e in phases['C']] == [('crawler.bytes', 1024)]
+
+    with open(tracer.export(str(tmp_path / 'trace-plain.json'), 'json'), encoding='utf-8') as f:
+        plain = json.load(f)
+    run, fetch = plain['spans']
+    assert fetch['parent_id'] == run['id'] and run['parent_id'] is None
+    assert run['duration_ms'] >= fetch['duration_ms']
+    assert plain['counters'] == {'crawler.bytes': 1024}
+
+
+def test_trace_is_written_under_the_output_dir(tracer, tmp_path, monkeypatch):
+    monkeypatch.setenv('REDNOTE_OUTPUT_DIR', str(tmp_path))
+    with span('run'):
+        pass
+
+    write_trace(['护肤 tips'], 'json')
+    [trace_file] = (tmp_path / 'traces').iterdir()
+    assert trace_file.name.startswith('trace_护肤_tips_')
+    assert json.loads(trace_file.read_text(encoding='utf-8'))['spans'][0]['name'] == 'run'
+
+
+def test_llm_calls_are_traced_under_their_task(tracer):
+    response = AIMessage(content='ok', usage_metadata={'input_tokens': 12, 'output_tokens': 3, 'total_tokens': 15})
+    llm = FakeMessagesListChatModel(responses=[response, response], callbacks=[TracingCallbackHandler()])
+
+    with span('task.analyze', 'task'):
+        llm.invoke('hello')
+        llm.invoke('again')
+
+    llm_spans = [s for s in tracer.spans if s.category == 'llm']
+    assert [s.path for s in llm_spans] == [('task.analyze', 'llm')] * 2
+    assert llm_spans[0].attrs == {'prompt_tokens': 12, 'completion_tokens': 3}
+    assert tracer.counters == {'llm.calls': 2, 'llm.prompt_tokens': 24, 'llm.completion_tokens': 6}
+
+    summary = tracer.summary()
+    assert 'LLM usage by task' in summary
+    usage = summary.split('LLM usage by task')[1].splitlines()[2].split()
+    assert (usage[0], usage[1], usage[3:]) == ('task.analyze', '2', ['24', '6'])
+    assert '  llm ' in summary
+
+
+def test_empty_summary(tracer):
+    assert tracer.summary() == "No trace data recorded."
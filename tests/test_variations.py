@@ -0,0 +1,114 @@
+import asyncio
+import itertools
+import threading
+
+import pytest
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from src.main import parse_args
+from src.variations import brief_points, generate_variations, pick_angles
+
+
+class LoopBoundChatModel(GenericFakeChatModel):
+    """
+    Streams canned replies and, like a real provider's async HTTP client,
+    fails when used from a loop other than the first one.
+    """
+
+    bound_loop: object = None
+
+    async def _astream(self, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        if self.bound_loop is None:
+            self.bound_loop = loop
+        elif self.bound_loop is not loop:
+            raise RuntimeError("client is attached to a different event loop")
+        async for chunk in super()._astream(*args, **kwargs):
+            yield chunk
+
+
+def make_llm():
+    return LoopBoundChatModel(messages=itertools.cycle([AIMessage(content="[Must See] Title\n✨ body\n#tag")]))
+
+
+def test_generate_variations_from_two_threads_shares_one_loop(tmp_path):
+    llm = make_llm()
+    results, errors = {}, []
+
+    def run(name):
+        try:
+            results[name] = generate_variations(llm, name, "Posts that ask a question get more comments.",
+                                                3, str(tmp_path / f"{name}.txt"), echo=False)
+        except Exception as e:
+            errors.append(e)
+
+    first = threading.Thread(target=run, args=('first',))
+    first.start()
+    first.join()
+    second = threading.Thread(target=run, args=('second',))
+    second.start()
+    second.join()
+
+    assert errors == []
+    for name in ('first', 'second'):
+        assert results[name].count('--- Post Variation') == 3
+        assert '(Generation failed' not in results[name]
+        streamed = (tmp_path / f"{name}.txt").read_text(encoding='utf-8')
+        assert '[v1] [Must See] Title' in streamed
+        assert '[v3] #tag' in streamed
+
+
+def test_failed_variation_is_replaced_by_a_note(tmp_path):
+    class Flaky(GenericFakeChatModel):
+        async def _astream(self, messages, *args, **kwargs):
+            if 'step-by-step' in messages[-1].content:
+                raise RuntimeError("rate limited")
+            async for chunk in super()._astream(messages, *args, **kwargs):
+                yield chunk
+
+    llm = Flaky(messages=itertools.cycle([AIMessage(content="[Hot] post")]))
+    result = generate_variations(llm, 'x', None, 3, str(tmp_path / 'x.txt'), echo=False)
+
+    assert "--- Post Variation 2 ---\n(Generation failed: rate limited)" in result
+    assert result.count('[Hot] post') == 2
+
+
+def test_brief_points_prefers_list_items():
+    brief = (
+        "**Viral hooks**: posts open with a relatable morning problem.\n"
+        "1. Keyword patterns: 早八 and 平价 appear in most titles.\n"
+        "- Short\n"
+        "- Users reward honest before/after photos in the comments."
+    )
+    assert brief_points(brief) == [
+        "Keyword patterns: 早八 and 平价 appear in most titles.",
+        "Users reward honest before/after photos in the comments.",
+    ]
+
+
+def test_brief_points_falls_back_to_sentences():
+    brief = "Posts that open with a question get more comments. Short one. 标题里用数字的帖子点赞更多，平均高出三成的互动量。"
+    assert brief_points(brief) == [
+        "Posts that open with a question get more comments.",
+        "标题里用数字的帖子点赞更多，平均高出三成的互动量。",
+    ]
+
+
+def test_pick_angles_are_distinct():
+    angles = pick_angles("Posts that open with a question get more comments.", 5)
+    assert len(set(angles)) == 5
+    assert all("open with a question" in angle for angle in angles)
+    assert pick_angles("", 2) == ["Write it as a personal story told in the first person",
+                                  "Write it as a step-by-step tutorial"]
+
+
+def test_variation_count_must_be_positive(tmp_path, capsys):
+    with pytest.raises(ValueError, match='at least 1'):
+        generate_variations(make_llm(), 'topic', None, 0, str(tmp_path / 'out.txt'), echo=False)
+
+    assert parse_args(['--variations', '0']).variations == 0
+    with pytest.raises(SystemExit):
+        parse_args(['--variations', '-1'])
+    assert 'must be an integer >= 0' in capsys.readouterr().err